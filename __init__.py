@@ -22,40 +22,59 @@ bl_info = {
     "category": "Import-Export"
 }
 
-if "bpy" in locals():
+try:
+    import bpy
+except ImportError:
+    # imported by a formatting pool process (see emit.py), which runs plain
+    # python and only needs the modules that don't use bpy
+    bpy = None
+
+if bpy is None:
+    pass
+elif "utils" in locals():
     import imp
     imp.reload(utils)
     imp.reload(basicprops)
+    imp.reload(registry)
+    imp.reload(uicache)
     imp.reload(assets)
     imp.reload(animgroups)
     imp.reload(animstrips)
     imp.reload(export)
+    imp.reload(watch)
 else:
     from . import (
             utils, 
             basicprops,
+            registry,
+            uicache,
             assets,
             animgroups, 
             animstrips,
-            export
+            export,
+            watch
             )
 
-import bpy
-
 def register():
     basicprops.register()
+    registry.register()
+    uicache.register()
     assets.register()
     animgroups.register()
     animstrips.register()
     export.register()
+    watch.register()
     bpy.utils.register_module(__name__)
  
 def unregister():
     basicprops.unregister()
+    registry.unregister()
+    uicache.unregister()
     assets.unregister()
     animgroups.unregister()
     animstrips.unregister()
     export.unregister()
+    watch.unregister()
     bpy.utils.unregister_module(__name__)
     
 if __name__ == "__main__":
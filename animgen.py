@@ -12,122 +12,60 @@
 
 import bpy
 import os
-from .utils import deci, cross_mkdir
+from .utils import cross_mkdir
 from collections import Counter
+from .animgroups import get_membership
+from .ir import ClipIR, AnimationIR, dump
+from .emit import PoolWriter, write_animation
 
-class AnimGen:
+# Reads animation groups into AnimationIR, emit.py aggregates and writes them
+class AnimGen(PoolWriter):
     filepath = None
+    irpath = None # dump the IR of every animation as json here when set
 
     def __init__(self, filepath):
         self.filepath = cross_mkdir(os.path.join(filepath, "animations"))
 
     def write(self, scene, node):
         if node.type == 'ARMATURE' and len(scene.gp3d_animations.groups) > 0:
-            temp_props = list()
-            ctr_items = list()
-            ctr_lists = list()
-            for grp in scene.gp3d_animations.groups:
-                temp = Aggregator.AnimProp()
-                temp.name = grp.name
-                temp_props.append(temp)
-                ctr_items += list(grp.strips)
-                ctr_lists.append(list(grp.strips))
-                
-            ctr = Counter(ctr_items)
-            common = ctr.most_common()
-            common_strips = [s[0] for s in common]
-            for lst, temp in zip(ctr_lists, temp_props):
-                temp.strips = [s for s in common_strips if s in lst]
-                
-            animfile = os.path.join(self.filepath, scene.name + ".animation")
-            agg = Aggregator()
-            agg.process(temp_props)
-            agg.write(scene.frame_end, node.animation_data.nla_tracks, animfile)
-
-
-class Aggregator:
-    class AnimProp:
-        name = None
-        strips = None
-        parent = None
-
-        def __init__(self):
-            self.name = None
-            self.strips = list()
-            self.parent = None
-
-        def copy(self):
-            new = Aggregator.AnimProp()
-            new.name = self.name
-            new.strips = self.strips.copy()
-            new.parent = self.parent
-            return new
-
-    finalprops = None
-
-    def __init__(self):
-        self.finalprops = list()
-
-    def process(self, temp_props):
-        base = Aggregator.AnimProp()
-        index = 0
-        while True:
-            strip = None
-            diff = False
-
-            for prop in list(temp_props): #iterate copy to freely remove while iterating
-                if index >= len(prop.strips):
-                    copy = base.copy()
-                    copy.name = prop.name
-                    self.finalprops.append(copy)
-                    base.strips.clear()
-                    base.parent = prop.name
-                    temp_props.remove(prop)
-                elif strip is None:
-                    strip = prop.strips[index]
-                elif strip.name != prop.strips[index].name:
-                    copy = base.copy()
-                    copy.name = prop.name
-                    copy.strips += prop.strips[index:]
-                    self.finalprops.append(copy)
-                    temp_props.remove(prop)
-
-            if len(temp_props) == 0:
-                break
-            if diff is False and strip is not None:
-                base.strips.append(strip)
-            index += 1
-
-    def write(self, frm_count, tracks, animfile):
-        str_result = ""
-        for prop in self.finalprops:
-            if prop.parent:
-                str_anim = "animation {0} : {1}{{\n".format(prop.name, prop.parent)
-            else:
-                str_anim = "animation {0} {{\n".format(prop.name)
-            if prop.parent is None:
-                str_anim += "\tframeCount = {0}\n".format(frm_count)
-            str_anim += self.write_props(prop, tracks)
-            str_anim += "}\n"
-            str_result += str_anim
-        # write 
-        f = open(animfile, 'w', encoding = 'utf-8')
-        f.write(str_result)
-        f.close()
-
-    def write_props(self, prop, tracks):
-        str_clip = ""
-        for strip in prop.strips:
-            real_strip = tracks[strip.track].strips[strip.name]
-            clipdata = real_strip.action.gp3d_clipdata
-            str_clip += "\tclip {0} {{\n".format(strip.name)
-            str_clip += "\t\tbegin = {0}\n".format(real_strip.frame_start)
-            str_clip += "\t\tend = {0}\n".format(real_strip.frame_end)
-
-            rpt = "INDEFINITE" if clipdata.indefinite else deci(clipdata.repeatCount)
-            str_clip += "\t\trepeatCount = {0}\n".format(rpt)
-            str_clip += "\t\tspeed = {0}\n".format(deci(clipdata.speed))
-            str_clip += "\t\tloopBlendTime = {0}\n"\
-                    .format(deci(clipdata.loopBlendTime))
-            str_clip += "\t}\n"
-        return str_clip
+            for conflict in get_membership(node, scene).conflicts:
+                print("Warning: {0}: {1}".format(scene.name, conflict))
+            ir = self.extract(scene, node)
+            if self.irpath:
+                dump(ir, os.path.join(self.irpath, scene.name + ".animation.json"))
+            self.submit(write_animation, ir, self.filepath)
+
+    # strips shared by more groups come first so groups can inherit them.
+    # StripGroup compares by name, so strips are counted by name and the
+    # first listed strip of a name stands for all. Ties keep the order they
+    # are first listed in, which a Counter doesn't on blender 2.7x's python.
+    def extract(self, scene, node):
+        ctr = Counter()
+        first = dict() # {strip name: first listed strip}
+        order = list() # names as first listed, dicts are unordered before 3.6
+        for grp in scene.gp3d_animations.groups:
+            for strip in grp.strips:
+                ctr[strip.name] += 1
+                if strip.name not in first:
+                    first[strip.name] = strip
+                    order.append(strip.name)
+        position = {name: index for index, name in enumerate(order)}
+        common = sorted(order, key = lambda name: (-ctr[name], position[name]))
+
+        tracks = node.animation_data.nla_tracks
+        groups = list()
+        for grp in scene.gp3d_animations.groups:
+            names = set(strip.name for strip in grp.strips)
+            clips = [self.to_clip(tracks, first[name]) for name in common
+                    if name in names]
+            groups.append((grp.name, clips))
+        return AnimationIR(name = scene.name, frame_count = scene.frame_end,
+                groups = groups)
+
+    def to_clip(self, tracks, strip):
+        real_strip = tracks[strip.track].strips[strip.name]
+        clipdata = real_strip.action.gp3d_clipdata
+        return ClipIR(name = strip.name, track = strip.track,
+                begin = real_strip.frame_start, end = real_strip.frame_end,
+                indefinite = clipdata.indefinite, repeat = clipdata.repeatCount,
+                speed = clipdata.speed, blend = clipdata.loopBlendTime)
@@ -11,6 +11,7 @@
 # 3. This license clause must be left present in all files of this software.
 
 from .utils import HomeTab, make_names_unique
+from .uicache import cache
 
 import bpy
 from bpy.props import *
@@ -47,10 +48,9 @@ class AnimGroup(bpy.types.PropertyGroup):
     strip_index = IntProperty(min=-1, default=-1)
 
 
-def getStrips(self, context):
+def listStrips(obj):
     items = []
-    obj = context.active_object
-    anim_data = obj.animation_data
+    anim_data = obj.animation_data if obj else None
     if anim_data:
         for track in anim_data.nla_tracks:
             strips = track.strips
@@ -58,6 +58,11 @@ def getStrips(self, context):
                 items.append((strip.name, strip.name, "Track: %s" % track.name))
     return items
 
+# the same list is returned until the strips change, blender needs the
+# items kept alive and can skip rebuilding the enum
+def getStrips(self, context):
+    return cache.get(context, "strips", listStrips)
+
 
 class Animation(bpy.types.PropertyGroup):
     groups = CollectionProperty(type=AnimGroup)
@@ -83,21 +88,85 @@ def unregister():
     del bpy.types.Bone.gp3d_groupname
 
 
-def display(bone, group, flag):
-    bone.select = flag
-    for child in bone.children:
-        if child.gp3d_groupname == "":
-            display(child, group, flag)
+# bone to group membership of an armature, rebuilt only when its bones or
+# the scene's animation groups change
+class Membership:
+    signature = None
+    owner = None # {bone.name: group.name}
+    members = None # {group.name: [bone.name]}, root first
+    conflicts = None # [str]
+
+    def __init__(self, armature, groups):
+        self.signature = membership_signature(armature, groups)
+        self.owner = dict()
+        self.members = dict()
+        self.conflicts = list()
+        bones = armature.data.bones
+
+        for group in groups:
+            members = self.members.setdefault(group.name, list())
+            if group.boneroot == "":
+                continue
+            root = bones.get(group.boneroot, None)
+            if root is None:
+                self.conflicts.append("Group {0}: bone root {1} not found"
+                        .format(group.name, group.boneroot))
+                continue
+            if root.gp3d_groupname != group.name:
+                self.conflicts.append("Group {0}: bone root {1} is set to group {2}"
+                        .format(group.name, root.name, root.gp3d_groupname))
+
+            # iterative walk, deep rigs hit the recursion limit
+            stack = [root]
+            while stack:
+                bone = stack.pop()
+                owner = self.owner.get(bone.name, None)
+                if owner is not None:
+                    self.conflicts.append("Bone {0} is in groups {1} and {2}"
+                            .format(bone.name, owner, group.name))
+                    continue
+                self.owner[bone.name] = group.name
+                members.append(bone.name)
+                for child in bone.children:
+                    if child.gp3d_groupname == "":
+                        stack.append(child)
+                    else:
+                        self.conflicts.append("Group {0} is nested in group {1}"
+                                .format(child.gp3d_groupname, group.name))
+
+# everything Membership reads: reparenting a bone or setting its group
+# changes the members without adding or removing bones
+def membership_signature(armature, groups):
+    return (tuple((bone.name, bone.parent.name if bone.parent else None,
+                    bone.gp3d_groupname) for bone in armature.data.bones),
+            tuple((group.name, group.boneroot) for group in groups))
+
+memberships = dict() # {(scene.name, armature.name): Membership}
+
+def get_membership(armature, scene):
+    groups = scene.gp3d_animations.groups
+    key = (scene.name, armature.name)
+    membership = memberships.get(key, None)
+    if membership is None or membership.signature != membership_signature(armature,
+            groups):
+        membership = memberships[key] = Membership(armature, groups)
+    return membership
+
+def invalidate_membership():
+    memberships.clear()
 
 
 def toggleDisplay(context, flag):
     animations = context.scene.gp3d_animations
     group = animations.groups[animations.index]
-    bone = context.active_object.data.bones.get(group.boneroot, None)
+    bones = context.active_object.data.bones
+    bone = bones.get(group.boneroot, None)
 
     bpy.ops.pose.select_all(action='DESELECT')
     group.visible = flag
-    display(bone, group.anim_id, flag)
+    membership = get_membership(context.active_object, context.scene)
+    for name in membership.members.get(group.name, ()):
+        bones[name].select = flag
 
     # set active
     context.active_object.data.bones.active = bone
@@ -109,6 +178,7 @@ def disown(armature, animgroup):
     if bone:
         bone.gp3d_groupname = ""
     animgroup.boneroot = ""
+    invalidate_membership()
 
 
 # Bone leaves AnimGroup
@@ -117,6 +187,7 @@ def orphan(scene, bone):
     if animgroup:
         animgroup.boneroot = ""
     bone.gp3d_groupname = ""
+    invalidate_membership()
 
 
 # get current selected group
@@ -215,6 +286,7 @@ class Set(bpy.types.Operator):
 
         animgroup.boneroot = bone.name
         bone.gp3d_groupname = animgroup.name
+        invalidate_membership()
         toggleDisplay(context, True)
         return {'FINISHED'}
 
@@ -243,6 +315,26 @@ class Unset(bpy.types.Operator):
         return {'FINISHED'}
 
 
+class ValidateAnimGroups(bpy.types.Operator):
+    "Report bones claimed by more than one animation group and nested groups"
+    bl_label = "Validate Animation Groups"
+    bl_idname = "gp3d.validate_animgroups"
+
+    @classmethod
+    def poll(self, context):
+        obj = context.active_object
+        return obj is not None and obj.type == 'ARMATURE'
+
+    def execute(self, context):
+        membership = get_membership(context.active_object, context.scene)
+        for conflict in membership.conflicts:
+            self.report({'WARNING'}, conflict)
+        if len(membership.conflicts) == 0:
+            self.report({'INFO'}, "No conflicts in {0} animation groups"
+                    .format(len(membership.members)))
+        return {'FINISHED'}
+
+
 class MoveAnimGroup(bpy.types.Operator):
     "Move group one step upwards/downwards in animation groups list"
     bl_label = "Move AnimGroup"
@@ -393,6 +485,7 @@ class AnimGroupPanel(HomeTab, bpy.types.Panel):
         row = layout.row(align=True)
         row.operator("gp3d.set_animgroup", text="Set")
         row.operator("gp3d.unset_animgroup", text="Unset")
+        row.operator("gp3d.validate_animgroups", text="", icon='ERROR')
         layout.separator()
 
         # Strips
@@ -1,5 +1,6 @@
 import bpy
 from bpy.props import *
+from .uicache import cache
 
 class ClipData(bpy.types.PropertyGroup):
     indefinite = BoolProperty(default = False, 
@@ -19,15 +20,35 @@ def unregister():
     bpy.utils.unregister_class(ClipData)
     del bpy.types.Action.gp3d_clipdata
 
+# (track.name, strip.name) of the active strip or None
+def find_active_strip(obj):
+    anim_data = obj.animation_data if obj else None
+    if anim_data:
+        for track in anim_data.nla_tracks:
+            for strip in track.strips:
+                if strip.active:
+                    return (track.name, strip.name)
+    return None
+
+def lookup_strip(obj, names):
+    if names is None or obj.animation_data is None:
+        return None
+    track = obj.animation_data.nla_tracks.get(names[0], None)
+    return track.strips.get(names[1], None) if track else None
+
 def get_active_strip(context):
     obj = context.active_object
     if obj:
-        anim_data = context.active_object.animation_data
-        if anim_data:
-            for track in anim_data.nla_tracks:
-                for strip in track.strips:
-                    if strip.active:
-                        return strip.action
+        names = cache.get(context, "active_strip", find_active_strip)
+        strip = lookup_strip(obj, names)
+        # clicking a strip doesn't tag the object, so neither a missing nor
+        # an inactive cached strip can be trusted, check again
+        if strip is None or not strip.active:
+            names = find_active_strip(obj)
+            cache.set("active_strip", names)
+            strip = lookup_strip(obj, names)
+        if strip:
+            return strip.action
     return None
 
 class AnimStripsPanel(bpy.types.Panel):
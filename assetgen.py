@@ -14,46 +14,55 @@ import os
 import bpy
 import subprocess
 import shutil
-import glob
 from mathutils import Vector
 from math import radians, degrees
 from .utils import cross_mkdir
+from .stats import NULL_STATS
+from .output import commit_file, remove_file
 
 class AssetGen:
     filepath = None
     temp = None
     matpath = None
+    stats = NULL_STATS
+    changed = None # gpb and material files that changed
+    textures = None # TextureStage rewriting the sampler paths when set
 
-    def __init__(self, filepath):
+    # temp can be given so parallel workers don't share a folder
+    def __init__(self, filepath, temp = None, stats = NULL_STATS):
         self.filepath = cross_mkdir(os.path.join(filepath, 'gpb'))
-        self.temp = cross_mkdir(os.path.join(filepath, 'temp'))
+        self.temp = cross_mkdir(temp or os.path.join(filepath, 'temp'))
         self.matpath = cross_mkdir(os.path.join(filepath, 'materials'))
+        self.stats = stats
+        self.changed = list()
 
     def clean_up(self):
         shutil.rmtree(self.temp)
 
     def write(self, overrides, scene):
         try:
-            bpy.ops.export_scene.fbx(overrides, filepath = self.temp + '/',
-                    axis_forward='Y',
-                    axis_up='Z',
-                    apply_unit_scale=False,
-                    use_mesh_modifiers=True,
-                    add_leaf_bones=False,
-                    use_armature_deform_only=True,
-                    bake_anim=True,
-                    bake_anim_use_all_bones=True,
-                    bake_anim_use_nla_strips=False,
-                    bake_anim_use_all_actions=False,
-                    batch_mode='SCENE',
-                    use_batch_own_dir=False)
+            with self.stats.stage("fbx_export", scene.name):
+                bpy.ops.export_scene.fbx(overrides, filepath = self.temp + '/',
+                        axis_forward='Y',
+                        axis_up='Z',
+                        apply_unit_scale=False,
+                        use_mesh_modifiers=True,
+                        add_leaf_bones=False,
+                        use_armature_deform_only=True,
+                        bake_anim=True,
+                        bake_anim_use_all_bones=True,
+                        bake_anim_use_nla_strips=False,
+                        bake_anim_use_all_actions=False,
+                        batch_mode='SCENE',
+                        use_batch_own_dir=False)
         except:
             self.report({'ERROR'},
                 "FBX exporter version it not compatible. Aborting exporting of assets.")
             return
 
+        # the encoder writes into temp, only changed files are moved out
         fbxfile = os.path.join(self.temp, scene.name + '.fbx')
-        gpbfile = os.path.join(self.filepath, scene.name)
+        gpbfile = os.path.join(self.temp, scene.name)
 
         # command to run encoder
         cmd = [ 'gameplay-encoder', '-v', '0', '-m' ]
@@ -67,21 +76,35 @@ class AssetGen:
         cmd += [ fbxfile, gpbfile ]
             
         try:
-            ret = subprocess.run(cmd, stdout = subprocess.PIPE, stderr = subprocess.STDOUT)        
+            with self.stats.stage("encoder", scene.name):
+                ret = subprocess.run(cmd, stdout = subprocess.PIPE,
+                        stderr = subprocess.STDOUT)
+            output = ret.stdout.decode('utf-8', 'replace')
+            self.stats.add("encoder_output", scene.name, output)
             ret.check_returncode()
-            print(ret.stdout)
+            print(output)
         except FileNotFoundError as err:
             print('Error: ', err)
-            print(ret.stdout)
             print('Is the Gameplay encoder in your path?')
         except subprocess.CalledProcessError as err:
             print('There was a problem running the Gameplay encoder.')
             print(err)
         else:
-            # move material files            
-            for f in glob.glob(os.path.join(self.filepath, "*.material")):
-                targmat = os.path.join(self.matpath, os.path.basename(f))
-                if os.path.exists(targmat):
-                    os.remove(targmat)
-                shutil.move(f, self.matpath)
-                
+            with self.stats.stage("materials", scene.name):
+                if self.textures:
+                    self.textures.rewrite(gpbfile + ".material")
+                self.commit(gpbfile + ".gpb", self.filepath)
+                self.commit(gpbfile + ".material", self.matpath)
+
+    def commit(self, source, folder):
+        if os.path.exists(source):
+            target = os.path.join(folder, os.path.basename(source))
+            if commit_file(source, target):
+                self.changed.append(target)
+
+    # the scene has nothing left to export, its old files are stale
+    def remove(self, scene):
+        for target in (os.path.join(self.filepath, scene.name + ".gpb"),
+                os.path.join(self.matpath, scene.name + ".material")):
+            if remove_file(target):
+                self.changed.append(target)
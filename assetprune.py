@@ -0,0 +1,58 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+def descendants(obj):
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        yield obj
+        stack += obj.children
+
+class AssetPrune:
+    referenced = None # {(scene.name, obj.name)} of assets used by instances
+    orphans = None # [(scene.name, obj.name)] root objects nothing instances
+
+    def __init__(self):
+        self.referenced = set()
+        self.orphans = list()
+
+    # collect assets instanced from GAME_SCENE and ASSET_GROUP scenes through
+    # the same asset_list lookup SceneGen uses
+    def build(self, scenes, asset_list, dedup = None):
+        for scene in scenes:
+            if scene.gp3d_scenetype in ('GAME_SCENE', 'ASSET_GROUP'):
+                for obj in scene.objects:
+                    if obj.type != 'MESH':
+                        continue
+                    name = dedup.resolve(obj.data.name) if dedup else obj.data.name
+                    source = asset_list.get(name, None)
+                    if source:
+                        self.referenced.add((source.scene, source.objname))
+
+        for scene in scenes:
+            if scene.gp3d_scenetype == 'ASSETS':
+                for obj in scene.objects:
+                    if obj.parent is None and not self.is_reachable(scene, obj):
+                        self.orphans.append((scene.name, obj.name))
+        self.orphans.sort()
+        return self
+
+    # a root is kept when it or a skinned child is referenced
+    def is_reachable(self, scene, root):
+        if root.type not in ('MESH', 'ARMATURE'):
+            return True
+        return any((scene.name, obj.name) in self.referenced
+                for obj in descendants(root))
+
+    def is_orphan(self, scene, obj):
+        return obj.parent is None and not self.is_reachable(scene, obj)
+
+    def report(self):
+        lines = ["Unused asset: {1} (scene {0})".format(*o) for o in self.orphans]
+        lines.append("{0} unused assets".format(len(self.orphans)))
+        return lines
@@ -11,10 +11,13 @@
 # 3. This license clause must be left present in all files of this software.
 
 import bpy
+from math import radians
 from mathutils import *
 from bpy.props import *
 from bpy.app.handlers import persistent
-from .utils import HomeTab, armature_parent_or_none
+from .utils import HomeTab
+from .registry import registry
+from . import basicprops
 
 
 # name is obj.data.name
@@ -28,70 +31,39 @@ class Asset(bpy.types.PropertyGroup):
     group_list = CollectionProperty(type = AssetDetail)
     group_index = IntProperty(default = -1, min = -1)
 
+# full rebuild of both lists, see registry.py for the incremental update
 # don't call this on load_post handler
 # gp3d_assets causes memleak on closing a re-opened saved file
 def populate_asset_and_group_list():
-    assets = bpy.context.window_manager.gp3d_assets
-    assets.asset_list.clear()
-    assets.group_list.clear()
-    for scene in bpy.data.scenes:
-        type_ = scene.gp3d_scenetype
-        if type_ == 'ASSETS' or type_ == 'ASSET_GROUP':
-            for obj in scene.objects:
-                if obj.type == 'MESH':
-                    added = None
-                    if type_ == 'ASSETS' and armature_parent_or_none(obj):
-                        added = assets.asset_list.add()
-                        added.name = obj.data.name
-                    elif type_ == 'ASSET_GROUP' and obj.parent == None:
-                        added = assets.group_list.add()
-                        added.name = "{0}".format(obj.as_pointer())
-                    if added:
-                        added.scene = scene.name
-                        added.objname = obj.name
-
-    if len(assets.asset_list) > 0:
-        assets.index = 0
-    if len(assets.group_list) > 0:
-        assets.group_index = 0
-
-@persistent
-def assign_refs(x):
-    for scene in bpy.data.scenes:
-        if scene.gp3d_scenetype == 'GAME_SCENE' or scene.gp3d_scenetype == 'ASSET_GROUP':
-            for obj in scene.objects:
-                src_name = obj.get('gp3d_name', None)
-                if src_name:
-                    src = bpy.data.objects.get(src_name, None)
-                    if src:
-                        obj['gp3d_id'] = "{0}".format(src.as_pointer())
+    registry.rebuild()
 
 # WORKAROUND because WindowManager custom properties will NOT be saved
 @persistent
 def on_save(x):
+    if not basicprops.in_use:
+        return
     assets = bpy.context.window_manager.gp3d_assets
-    populate_asset_and_group_list()
-    for scene in bpy.data.scenes:
-        if scene.gp3d_scenetype == 'GAME_SCENE' or scene.gp3d_scenetype == 'ASSET_GROUP':
-            for obj in scene.objects:
-                src_id = obj.get('gp3d_id', None)
-                if src_id:
-                    asset = assets.group_list.get(src_id, None)
-                    if asset:
-                        obj['gp3d_name'] = asset.objname
+    changed_groups, changed = registry.reconcile()
+
+    # only instances that changed or whose group changed need a new name
+    for name in registry.instances_of_groups(changed_groups) | changed:
+        obj = bpy.data.objects.get(name, None)
+        src_id = obj.get('gp3d_id', None) if obj else None
+        if src_id:
+            asset = assets.group_list.get(src_id, None)
+            if asset:
+                obj['gp3d_name'] = asset.objname
 
 def register():
     bpy.utils.register_class(AssetDetail)
     bpy.utils.register_class(Asset)
     bpy.types.WindowManager.gp3d_assets = PointerProperty(type = Asset)
-    bpy.app.handlers.load_post.append(assign_refs)
     bpy.app.handlers.save_pre.append(on_save)
 
 def unregister():
     bpy.utils.unregister_class(AssetDetail)
     bpy.utils.unregister_class(Asset)
     del bpy.types.WindowManager.gp3d_assets
-    bpy.app.handlers.load_post.remove(assign_refs)
     bpy.app.handlers.save_pre.remove(on_save)
 
 def base_poll(context):
@@ -103,6 +75,19 @@ class Refresh(bpy.types.Operator):
     bl_label = "Refresh"
     bl_idname = "gp3d.assets_refresh"
 
+    @classmethod
+    def poll(self, context):
+        return base_poll(context)
+
+    def execute(self, context):
+        registry.reconcile()
+        return {'FINISHED'}
+
+class Rebuild(bpy.types.Operator):
+    "Rebuild assets list from every scene"
+    bl_label = "Rebuild"
+    bl_idname = "gp3d.assets_rebuild"
+
     @classmethod
     def poll(self, context):
         return base_poll(context)
@@ -120,11 +105,14 @@ def show(obj):
 def show_instances(context, asset, is_group = False):
     bpy.ops.object.select_all(action='DESELECT')
 
-    for obj in context.scene.objects:
+    registry.reconcile()
+    for name in registry.instances(asset.name, is_group):
+        obj = context.scene.objects.get(name, None)
+        if obj is None:
+            continue
         if is_group:
-            if asset.name == obj.get("gp3d_id", None):
-                show(obj)
-        elif obj.data.name == asset.name:
+            show(obj)
+        else:
             obj.select = True
     return {'FINISHED'}
 
@@ -238,14 +226,190 @@ class AddAssetGrouPInstance(bpy.types.Operator):
         return {'FINISHED'}
 
 
+# same as link_instance but without operators, the objects are collected
+# in objs and linked to the scene by the caller
+def new_instance(source, objs, is_group = False):
+    instance = source.copy() # shares the mesh like a linked duplicate
+    instance.parent = None
+    objs.append(instance)
+    for mod in instance.modifiers:
+        if mod.type == 'ARMATURE':
+            mod.show_viewport = False
+            mod.show_render = False
+
+    for slot in instance.material_slots:
+        slot.link = 'OBJECT'
+    if len(source.material_slots) > 0:
+        instance.material_slots[0].material = source.material_slots[0].material
+        instance.active_material_index = 0
+
+    if is_group:
+        for child in source.children:
+            child_instance = new_instance(child, objs, is_group)
+            child_instance.parent = instance
+            child_instance.location = child.location
+    return instance
+
+# create one instance of asset (an AssetDetail, or its mesh name / group id)
+# for each matrix in a single scene update.
+# returns the root objects created, or an (error, message) tuple
+def place_instances(scene, asset, matrices, is_group = False):
+    if isinstance(asset, str):
+        assets = bpy.context.window_manager.gp3d_assets
+        collection = assets.group_list if is_group else assets.asset_list
+        found = collection.get(asset, None)
+        if found is None:
+            return ({'ERROR'}, "Asset ({0}) is not in the list. \
+Try refreshing the list.".format(asset))
+        asset = found
+
+    source = bpy.data.objects.get(asset.objname, None)
+    if source is None:
+        return ({'ERROR'}, "Object ({0}) from scene ({1}) is not found. \
+Try refreshing the list and make sure the asset doest exist. \
+in the scene".format(asset.name, asset.scene))
+
+    roots = list()
+    objs = list()
+    for matrix in matrices:
+        instance = new_instance(source, objs, is_group)
+        instance.matrix_world = matrix
+        if is_group:
+            instance['gp3d_id'] = asset.name
+        roots.append(instance)
+
+    for obj in objs:
+        scene.objects.link(obj)
+    scene.update()
+    return roots
+
+# one transform per row: x, y, z [, rx, ry, rz (degrees) [, sx, sy, sz]]
+# or the 16 values of a row major matrix. Other rows are skipped.
+def read_transforms(filepath):
+    matrices = list()
+    f = open(filepath, encoding = 'utf-8')
+    for line in f:
+        try:
+            values = [float(v) for v in line.replace(';', ',').split(',') if v.strip()]
+        except ValueError:
+            continue
+        if len(values) == 16:
+            matrices.append(Matrix([values[i:i + 4] for i in range(0, 16, 4)]))
+        elif len(values) in (3, 6, 9):
+            values += [0.0, 0.0, 0.0, 1.0, 1.0, 1.0][len(values) - 3:]
+            rot = Euler([radians(v) for v in values[3:6]]).to_matrix().to_4x4()
+            scale = Matrix.Scale(values[6], 4, (1, 0, 0)) *\
+                    Matrix.Scale(values[7], 4, (0, 1, 0)) *\
+                    Matrix.Scale(values[8], 4, (0, 0, 1))
+            matrices.append(Matrix.Translation(values[0:3]) * rot * scale)
+    f.close()
+    return matrices
+
+class PlaceInstances(bpy.types.Operator):
+    "Create instances of the selected asset or asset group from a list of transforms"
+    bl_label = "Place Instances"
+    bl_idname = "gp3d.assets_place"
+
+    filepath = StringProperty(subtype = 'FILE_PATH')
+    filter_glob = StringProperty(default = "*.csv;*.txt", options = {'HIDDEN'})
+    source = EnumProperty(items = [
+        ('FILE', 'File', "One transform per row of a CSV file"),
+        ('SELECTED', 'Selected', "The transforms of the selected objects")])
+    is_group = BoolProperty(default = False, 
+            description = "Place the selected asset group instead of the asset")
+
+    @classmethod
+    def poll(self, context):
+        return base_poll(context)
+
+    def invoke(self, context, event):
+        if self.source == 'FILE':
+            context.window_manager.fileselect_add(self)
+            return {'RUNNING_MODAL'}
+        return self.execute(context)
+
+    def execute(self, context):
+        assets = context.window_manager.gp3d_assets
+        if self.is_group:
+            index, collection = assets.group_index, assets.group_list
+        else:
+            index, collection = assets.index, assets.asset_list
+        if index < 0:
+            self.report({'ERROR'}, "Select an asset first")
+            return {'CANCELLED'}
+
+        if self.source == 'FILE':
+            matrices = read_transforms(self.filepath)
+        else:
+            matrices = [obj.matrix_world.copy() for obj in context.selected_objects]
+
+        ret = place_instances(context.scene, collection[index], matrices, self.is_group)
+        if isinstance(ret, tuple):
+            self.report(ret[0], ret[1])
+            return {'CANCELLED'}
+        self.report({'INFO'}, "Placed {0} instances".format(len(ret)))
+        return {'FINISHED'}
+
+def retarget_instances(asset, target):
+    source = bpy.data.objects.get(target.objname, None)
+    if source is None:
+        return ({'ERROR'}, "Object ({0}) from scene ({1}) is not found. \
+Try refreshing the list.".format(target.objname, target.scene))
+
+    registry.reconcile()
+    objs = [bpy.data.objects[name] for name in registry.instances(asset.name)]
+    for obj in objs:
+        obj.data = source.data
+        for slot in obj.material_slots:
+            slot.link = 'OBJECT'
+        if len(source.material_slots) > 0 and len(obj.material_slots) > 0:
+            obj.material_slots[0].material = source.material_slots[0].material
+    registry.mark(objs)
+    registry.reconcile()
+    return ({'INFO'}, "Retargeted {0} instances to {1}".format(len(objs),
+        target.objname))
+
+class RetargetInstances(bpy.types.Operator):
+    "Make every instance of the selected asset use another asset"
+    bl_label = "Retarget Instances"
+    bl_idname = "gp3d.assets_retarget"
+
+    target = StringProperty(name = "Target", 
+            description = "Asset the instances will use")
+
+    @classmethod
+    def poll(self, context):
+        return base_poll(context) and context.window_manager.gp3d_assets.index >= 0
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def draw(self, context):
+        self.layout.prop_search(self, "target", context.window_manager.gp3d_assets,
+                "asset_list", text = "Target")
+
+    def execute(self, context):
+        assets = context.window_manager.gp3d_assets
+        asset = assets.asset_list[assets.index]
+        target = assets.asset_list.get(self.target, None)
+        if target is None:
+            self.report({'ERROR'}, "Select an asset to retarget to")
+            return {'CANCELLED'}
+        ret = retarget_instances(asset, target)
+        self.report(ret[0], ret[1])
+        return {'FINISHED'} if ret[0] == {'INFO'} else {'CANCELLED'}
+
+
 class AssetList(bpy.types.UIList):
     def draw_item(self, context, layout, data, item, icon, active_data, 
             active_propname, index):
         layout.label(text=item.objname)
+        layout.label(text=str(registry.instance_count(item.name)))
 class AssetGroupList(bpy.types.UIList):
     def draw_item(self, context, layout, data, item, icon, active_data, 
             active_propname, index):
         layout.label(text=item.objname)
+        layout.label(text=str(registry.instance_count(item.name, True)))
 
 class AssetsPanel(HomeTab, bpy.types.Panel):
     bl_idname = "VIEW3D_PT_gp3d_assetss_panel"
@@ -258,11 +422,18 @@ class AssetsPanel(HomeTab, bpy.types.Panel):
     def draw(self, context):
         assets = context.window_manager.gp3d_assets
         layout = self.layout
-        layout.operator("gp3d.assets_refresh", icon='FILE_REFRESH', text= "Refresh Lists")
+        row = layout.row(align=True)
+        row.operator("gp3d.assets_refresh", icon='FILE_REFRESH', text= "Refresh Lists")
+        row.operator("gp3d.assets_rebuild", icon='RECOVER_LAST', text= "")
         layout.template_list("AssetList", "", assets, "asset_list",
                 assets, "index", rows = 5)
         layout.operator("gp3d.assets_add", icon='ZOOMIN', text="New Instance")
         layout.operator("gp3d.assets_toggle", icon='VISIBLE_IPO_ON', text="Show intances")
+        layout.operator("gp3d.assets_retarget", icon='FILE_REFRESH', 
+                text="Retarget Instances")
+        row = layout.row(align=True)
+        row.operator("gp3d.assets_place", text="Place from File").source = 'FILE'
+        row.operator("gp3d.assets_place", text="Place at Selected").source = 'SELECTED'
 
         layout.separator()
         layout.label(text = "Asset Groups:")
@@ -271,3 +442,13 @@ class AssetsPanel(HomeTab, bpy.types.Panel):
         layout.operator("gp3d.asset_group_add", icon='ZOOMIN', text="New Group Instance")
         layout.operator("gp3d.asset_group_select", icon='VISIBLE_IPO_ON', 
                 text="Show Group Instances")
+        row = layout.row(align=True)
+        op = row.operator("gp3d.assets_place", text="Place from File")
+        op.source = 'FILE'
+        op.is_group = True
+        op = row.operator("gp3d.assets_place", text="Place at Selected")
+        op.source = 'SELECTED'
+        op.is_group = True
+        if len(registry.unresolved) > 0:
+            layout.label(text = "{0} unresolved group references (see console)"
+                    .format(len(registry.unresolved)), icon='ERROR')
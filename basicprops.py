@@ -12,8 +12,53 @@
 
 import bpy
 from bpy.props import *
+from bpy.app.handlers import persistent
+
+# False while every scene of the open file is set to NONE, nothing would
+# be exported and the other handlers return at once then. A scene left at
+# the default type is a GAME_SCENE and counts. Checked on load and when a
+# type is picked, True until the first load as the addon may be enabled in
+# a file that already uses it.
+in_use = True
+
+def scenes_in_use():
+    return any(scene.gp3d_scenetype != 'NONE' for scene in bpy.data.scenes)
+
+def on_type_update(self, context):
+    global in_use
+    in_use = scenes_in_use()
+
+# appended first by register() so it runs before the other load handlers
+@persistent
+def on_load(x):
+    global in_use
+    in_use = scenes_in_use()
+
+# per asset limits checked by budgets.py, 0 is no limit. On a scene they
+# apply to every object of it that doesn't set its own.
+class Budget(bpy.types.PropertyGroup):
+    max_triangles = IntProperty(name = "Triangles", min = 0)
+    max_vertices = IntProperty(name = "Vertices", min = 0)
+    max_materials = IntProperty(name = "Materials", min = 0)
+    max_influences = IntProperty(name = "Skin influences", min = 0,
+            description = "Bones deforming a single vertex")
+    max_bones = IntProperty(name = "Bones", min = 0)
+
+def draw_budget(layout, budget, armature = False):
+    col = layout.column(align = True)
+    col.label(text = "Budget")
+    if armature:
+        col.prop(budget, "max_bones")
+        return
+    col.prop(budget, "max_triangles")
+    col.prop(budget, "max_vertices")
+    col.prop(budget, "max_materials")
+    col.prop(budget, "max_influences")
 
 def register():
+    bpy.utils.register_class(Budget)
+    bpy.types.Object.gp3d_budget = PointerProperty(type = Budget)
+    bpy.types.Scene.gp3d_budget = PointerProperty(type = Budget)
     bpy.types.Object.gp3d_tags = StringProperty()
     items = (
             ('GAME_SCENE', 'Game Scene', "This scene is equivalent to \
@@ -24,11 +69,17 @@ def register():
             ('NONE', 'None', "This scene will not be processed by gameplay3d exporter"),
         )
     bpy.types.Scene.gp3d_scenetype = EnumProperty(items = items, 
-        description = "Whether this blender scene is for assets or a game scene")
+        description = "Whether this blender scene is for assets or a game scene",
+        update = on_type_update)
+    bpy.app.handlers.load_post.append(on_load)
 
 def unregister():
+    del bpy.types.Object.gp3d_budget
+    del bpy.types.Scene.gp3d_budget
+    bpy.utils.unregister_class(Budget)
     del bpy.types.Object.gp3d_tags
     del bpy.types.Scene.gp3d_scenetype
+    bpy.app.handlers.load_post.remove(on_load)
 
 class GamePlayObjPanel(bpy.types.Panel):
     bl_idname = "OBJECT_PT_gp3d_basicprops"
@@ -41,11 +92,14 @@ class GamePlayObjPanel(bpy.types.Panel):
     def poll(cls, context):
         obj = context.active_object
         return obj is not None and (obj.type == 'MESH' or obj.type == 'CAMERA' or\
-                obj.type == 'LAMP')
+                obj.type == 'LAMP' or obj.type == 'ARMATURE')
 
     def draw(self, context):
         obj = context.active_object
-        self.layout.prop(obj, "gp3d_tags", text = "Tags")
+        if obj.type != 'ARMATURE':
+            self.layout.prop(obj, "gp3d_tags", text = "Tags")
+        if context.scene.gp3d_scenetype == 'ASSETS' and obj.type in ('MESH', 'ARMATURE'):
+            draw_budget(self.layout, obj.gp3d_budget, obj.type == 'ARMATURE')
 
 class GamePlayScenePanel(bpy.types.Panel):
     bl_idname = "SCENE_PT_gp3d_sceneprops"
@@ -56,3 +110,21 @@ class GamePlayScenePanel(bpy.types.Panel):
 
     def draw(self, context):
         self.layout.prop(context.scene, "gp3d_scenetype", text = "Type", expand=True)
+        if context.scene.gp3d_scenetype == 'ASSETS':
+            draw_budget(self.layout, context.scene.gp3d_budget)
+            self.layout.prop(context.scene.gp3d_budget, "max_bones")
+            self.layout.operator("gp3d.check_budgets", icon='VIEWZOOM')
+
+class CheckBudgets(bpy.types.Operator):
+    """Check the assets of every ASSETS scene against their budgets"""
+    bl_idname = "gp3d.check_budgets"
+    bl_label = "Check Budgets"
+
+    def execute(self, context):
+        from .budgets import BudgetCheck
+        check = BudgetCheck().run(bpy.data.scenes)
+        for line in check.report():
+            print(line)
+        level = 'WARNING' if check.violations else 'INFO'
+        self.report({level}, check.report()[-1])
+        return {'FINISHED'}
@@ -0,0 +1,131 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Checks the meshes and armatures of ASSETS scenes against the budgets set
+# on them (gp3d_budget, see basicprops.py), without FBX or the encoder. A
+# limit of 0 on the object falls back to the scene's, 0 there means none.
+#
+# Counts are read in bulk with foreach_get. A mesh is only evaluated
+# (to_mesh) when a modifier other than the armature changes its geometry,
+# skin influences are only counted when a limit asks for them.
+
+import os
+import json
+import bpy
+import numpy as np
+from .meshdedup import read_array
+from .output import write_text
+
+METRICS = ('triangles', 'vertices', 'materials', 'influences', 'bones')
+REPORT = "budget_report.json"
+
+def limit(obj, scene, metric):
+    value = getattr(obj.gp3d_budget, "max_" + metric)
+    return value if value > 0 else getattr(scene.gp3d_budget, "max_" + metric)
+
+def needs_evaluation(obj):
+    return any(modifier.type != 'ARMATURE' for modifier in obj.modifiers)
+
+# vertex group indices of the bones deforming obj
+def deform_groups(obj):
+    armature = obj.find_armature()
+    if armature is None:
+        return set()
+    bones = armature.data.bones
+    return set(group.index for group in obj.vertex_groups
+            if group.name in bones and bones[group.name].use_deform)
+
+def max_influences(mesh, groups):
+    if len(groups) == 0:
+        return 0
+    return max([sum(1 for g in vertex.groups if g.weight > 0 and g.group in groups)
+            for vertex in mesh.vertices] or [0])
+
+# vertices, triangles and the material indices used
+def mesh_counts(mesh):
+    totals = read_array(mesh.polygons, 'loop_total', np.int32)
+    indices = read_array(mesh.polygons, 'material_index', np.int32)
+    return {
+        'vertices': len(mesh.vertices),
+        'triangles': int((totals - 2).sum()) if len(totals) else 0,
+        'used': set(int(i) for i in np.unique(indices)) if len(indices) else set(),
+    }
+
+# materials can be linked to the object, count its slots
+def material_count(obj, used):
+    slots = obj.material_slots
+    return sum(1 for i in used if i < len(slots) and slots[i].material)
+
+class BudgetCheck:
+    violations = None # [{scene, object, metric, value, limit}]
+    checked = 0 # objects with a budget
+    counts = None # {mesh.name: mesh_counts()} of meshes read as they are
+
+    def __init__(self):
+        self.violations = list()
+        self.counts = dict()
+
+    def run(self, scenes):
+        for scene in sorted(scenes, key = lambda s: s.name):
+            if scene.gp3d_scenetype != 'ASSETS':
+                continue
+            for obj in sorted(scene.objects, key = lambda o: o.name):
+                if obj.type in ('MESH', 'ARMATURE'):
+                    self.check(scene, obj)
+        return self
+
+    def check(self, scene, obj):
+        limits = {metric: limit(obj, scene, metric) for metric in METRICS}
+        if not any(limits.values()):
+            return
+        self.checked += 1
+        counts = dict()
+        if obj.type == 'ARMATURE':
+            counts['bones'] = len(obj.data.bones)
+        elif any(limits[m] for m in ('triangles', 'vertices', 'materials',
+                'influences')):
+            counts = self.read_mesh(scene, obj, limits['influences'] > 0)
+        for metric in METRICS:
+            value = counts.get(metric, None)
+            if limits[metric] and value is not None and value > limits[metric]:
+                self.violations.append({'scene': scene.name, 'object': obj.name,
+                        'metric': metric, 'value': value, 'limit': limits[metric]})
+
+    def read_mesh(self, scene, obj, influences):
+        if needs_evaluation(obj):
+            mesh = obj.to_mesh(scene, True, 'PREVIEW')
+            try:
+                counts = mesh_counts(mesh)
+                if influences:
+                    counts['influences'] = max_influences(mesh, deform_groups(obj))
+            finally:
+                bpy.data.meshes.remove(mesh)
+        else:
+            counts = self.counts.get(obj.data.name, None)
+            if counts is None:
+                counts = self.counts[obj.data.name] = mesh_counts(obj.data)
+            counts = dict(counts)
+            if influences:
+                counts['influences'] = max_influences(obj.data, deform_groups(obj))
+        counts['materials'] = material_count(obj, counts.pop('used'))
+        return counts
+
+    def to_dict(self):
+        return {'checked': self.checked, 'violations': self.violations}
+
+    def write(self, filepath):
+        reportfile = os.path.join(filepath, REPORT)
+        write_text(reportfile, json.dumps(self.to_dict(), indent = 1, sort_keys = True))
+        return reportfile
+
+    def report(self):
+        lines = ["{scene}/{object}: {value} {metric}, budget {limit}".format(**v)
+                for v in self.violations]
+        lines.append("{0} budget violation(s) in {1} checked object(s)".format(
+                len(self.violations), self.checked))
+        return lines
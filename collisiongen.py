@@ -0,0 +1,159 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+import os
+import math
+import numpy as np
+from .utils import deci, cross_mkdir
+from .output import write_text
+
+# node tags selecting the collision shape written for an instance
+SHAPE_TAGS = {
+    'collision_box': 'BOX',
+    'collision_sphere': 'SPHERE',
+    'collision_capsule': 'CAPSULE',
+    'collision_obb': 'OBB',
+}
+
+def collision_shape(tags):
+    for tag in tags.split():
+        shape = SHAPE_TAGS.get(tag, None)
+        if shape:
+            return shape
+    return None
+
+# mesh vertex positions in gameplay3d's orientation (y up), as exported by Dup
+def vertex_array(mesh):
+    co = np.empty(len(mesh.vertices) * 3, dtype = np.float64)
+    mesh.vertices.foreach_get('co', co)
+    co = co.reshape(-1, 3)
+    return np.column_stack((co[:, 0], co[:, 2], -co[:, 1]))
+
+# axis and angle (degrees) of a 3x3 rotation matrix
+def axis_angle(rot):
+    cos = np.clip((np.trace(rot) - 1.0) / 2.0, -1.0, 1.0)
+    angle = math.acos(cos)
+    if angle < 1e-6:
+        return (1.0, 0.0, 0.0), 0.0
+    if math.pi - angle < 1e-6:
+        # 180 degrees, take the axis from the diagonal
+        axis = np.sqrt(np.maximum((np.diag(rot) + 1.0) / 2.0, 0.0))
+        index = int(np.argmax(axis))
+        for other in range(3):
+            if other != index and rot[index, other] < 0:
+                axis[other] = -axis[other]
+    else:
+        axis = np.array((rot[2, 1] - rot[1, 2], rot[0, 2] - rot[2, 0],
+            rot[1, 0] - rot[0, 1])) / (2.0 * math.sin(angle))
+    axis = axis / np.linalg.norm(axis)
+    return tuple(float(a) for a in axis), math.degrees(angle)
+
+class Bounds:
+    center = None # aabb center
+    extents = None # full aabb size
+    radius = None # bounding sphere around center
+    capsule_radius = None # around the y axis through center
+    obb_center = None
+    obb_extents = None
+    obb_axis = None
+    obb_angle = None
+
+    def __init__(self, points):
+        if len(points) == 0:
+            points = np.zeros((1, 3))
+        lo = points.min(axis = 0)
+        hi = points.max(axis = 0)
+        center = (lo + hi) / 2.0
+        offsets = points - center
+        self.center = tuple(float(v) for v in center)
+        self.extents = tuple(float(v) for v in hi - lo)
+        self.radius = float(np.sqrt((offsets ** 2).sum(axis = 1).max()))
+        self.capsule_radius = float(np.sqrt((offsets[:, (0, 2)] ** 2)
+            .sum(axis = 1).max()))
+        self.compute_obb(points)
+
+    # oriented box from the principal axes of the vertices
+    def compute_obb(self, points):
+        if len(points) < 3:
+            rot = np.identity(3)
+        else:
+            rot = np.linalg.eigh(np.cov(points, rowvar = False))[1]
+            if np.linalg.det(rot) < 0:
+                rot[:, 2] = -rot[:, 2]
+        local = points.dot(rot)
+        lo = local.min(axis = 0)
+        hi = local.max(axis = 0)
+        self.obb_center = tuple(float(v) for v in rot.dot((lo + hi) / 2.0))
+        self.obb_extents = tuple(float(v) for v in hi - lo)
+        self.obb_axis, self.obb_angle = axis_angle(rot)
+
+class CollisionGen:
+    filepath = None
+    bounds = None # {mesh.name: Bounds}, shared by every instance
+    definitions = None # {definition name: str_definition} of current scene
+    changed = None # physics files that changed
+
+    def __init__(self, filepath):
+        self.filepath = cross_mkdir(os.path.join(filepath, "physics"))
+        self.bounds = dict()
+        self.definitions = dict()
+        self.changed = list()
+
+    def get_bounds(self, mesh):
+        bounds = self.bounds.get(mesh.name, None)
+        if bounds is None:
+            bounds = Bounds(vertex_array(mesh))
+            self.bounds[mesh.name] = bounds
+        return bounds
+
+    def begin(self):
+        self.definitions = dict()
+
+    # returns (url, bounds) of the collision object definition for this mesh
+    def reference(self, scene, mesh, shape):
+        bounds = self.get_bounds(mesh)
+        name = "{0}_{1}".format(mesh.name.replace('.', '_'), shape.lower())
+        if name not in self.definitions:
+            self.definitions[name] = self.to_prop(name, bounds, shape)
+        url = "res/physics/{0}.physics#{1}".format(scene.name, name)
+        return url, bounds
+
+    def to_prop(self, name, bounds, shape):
+        str_obj = "collisionObject {0} {{\n".format(name)
+        str_obj += "\ttype = RIGID_BODY\n"
+        center = bounds.center
+        if shape == 'BOX':
+            str_obj += "\tshape = BOX\n"
+            str_obj += "\textents = {0}, {1}, {2}\n".format(*map(deci, bounds.extents))
+        elif shape == 'OBB':
+            # the instance writes a child node rotated to the box axes
+            str_obj += "\tshape = BOX\n"
+            str_obj += "\textents = {0}, {1}, {2}\n"\
+                    .format(*map(deci, bounds.obb_extents))
+            center = None
+        elif shape == 'SPHERE':
+            str_obj += "\tshape = SPHERE\n"
+            str_obj += "\tradius = {0}\n".format(deci(bounds.radius))
+        elif shape == 'CAPSULE':
+            str_obj += "\tshape = CAPSULE\n"
+            str_obj += "\tradius = {0}\n".format(deci(bounds.capsule_radius))
+            str_obj += "\theight = {0}\n".format(deci(max(bounds.extents[1],
+                2 * bounds.capsule_radius)))
+        if center is not None:
+            str_obj += "\tcenter = {0}, {1}, {2}\n".format(*map(deci, center))
+        str_obj += "\tmass = 0.0\n"
+        str_obj += "}\n"
+        return str_obj
+
+    def write(self, scene):
+        if len(self.definitions) == 0:
+            return
+        physicsfile = os.path.join(self.filepath, scene.name + ".physics")
+        data = "".join(self.definitions[name] for name in sorted(self.definitions))
+        if write_text(physicsfile, data, os.linesep):
+            self.changed.append(physicsfile)
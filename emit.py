@@ -0,0 +1,316 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Formats .scene and .animation files from the IR of ir.py. Nothing here
+# imports bpy: write_scene() and write_animation() are what the export
+# process pool runs.
+
+import os
+from .formatting import tabs, deci
+from .sceneindex import SceneIndex
+from .output import write_text, write_file
+
+class SceneEmitter:
+    compact = False # omit default-valued properties and indentation
+    index = None # SceneIndex when an index file is written
+    url_dir = "scenes" # resource folder of the file being written
+
+    def __init__(self, compact = False, gen_index = False):
+        self.compact = compact
+        self.index = SceneIndex() if gen_index else None
+
+    def indent(self, num):
+        return "" if self.compact else tabs(num)
+
+    def add_to_index(self, name, parent, tags = ()):
+        if self.index is None:
+            return -1
+        return self.index.add_node(name, parent, tags)
+
+    def emit(self, scene):
+        self.url_dir = "prefabs" if scene.prefab else "scenes"
+        str_scene = "scene {0} {{\n".format(scene.name)
+        if scene.ambient:
+            ambient = scene.ambient
+            str_scene += "{3}ambientColor = {0}, {1}, {2}\n"\
+                    .format(deci(ambient[0]), deci(ambient[1]), deci(ambient[2]),
+                            self.indent(1))
+        if scene.camera:
+            str_scene += "{1}activeCamera = {0}\n"\
+                    .format(scene.camera, self.indent(1))
+
+        for node in scene.nodes:
+            str_scene += self.node_prop(scene, 1, node)
+        str_scene += "}\n"
+
+        for light in scene.lights:
+            str_scene += self.light_prop(light)
+        for camera in scene.cameras:
+            str_scene += self.camera_prop(camera)
+        return str_scene
+
+    def node_prop(self, scene, tab_num, node, parent = -1):
+        tabs_lvl1 = self.indent(tab_num)
+        tabs_lvl2 = self.indent(tab_num + 1)
+        tabs_lvl3 = self.indent(tab_num + 2)
+
+        str_node = "{1}node {0}{{\n".format(node.name, tabs_lvl1)
+        node_index = self.add_to_index(node.name, parent, node.tags)
+        if node.prefab:
+            str_node += "{2}url = res/prefabs/{0}.scene#{1}\n"\
+                    .format(node.prefab[0], node.prefab[1], tabs_lvl2)
+        elif node.mesh:
+            str_node += "{2}url = res/gpb/{0}.gpb#{1}\n"\
+                    .format(node.mesh[0], node.mesh[1], tabs_lvl2)
+            if node.material:
+                str_node += "{2}material = res/materials/{0}.material#{1}\n"\
+                        .format(node.material[0], node.material[1], tabs_lvl2)
+
+        if node.light:
+            str_node += "{2}light = res/{3}/{0}.scene#{1}\n"\
+                    .format(scene.name, node.light, tabs_lvl2, self.url_dir)
+        if node.camera:
+            str_node += "{2}camera = res/{3}/{0}.scene#{1}\n"\
+                    .format(scene.name, node.camera, tabs_lvl2, self.url_dir)
+
+        if node.translate is not None:
+            str_node += self.transform_prop(node, tabs_lvl2)
+
+        # enable, nodes are enabled by default in gameplay3d
+        if not node.hide and not self.compact:
+            temp = "{1}enabled = {0}\n".format(not node.hide, tabs_lvl2)
+            str_node += temp.lower()
+
+        if len(node.tags) > 0:
+            str_tags = "{0}tags {{\n".format(tabs_lvl2)
+            for tag in node.tags:
+                str_tags += "{1}{0}\n".format(tag, tabs_lvl3)
+            str_tags += "{0}}}\n".format(tabs_lvl2)
+            str_node += str_tags
+
+        if node.collision:
+            str_node += self.collision_prop(node.name, tab_num + 1, node.collision,
+                    node_index)
+
+        for child in node.children:
+            str_node += self.node_prop(scene, tab_num + 1, child, node_index)
+        str_node += "{0}}}\n".format(tabs_lvl1)
+        return str_node
+
+    def transform_prop(self, node, tabs_lvl2):
+        str_node = ""
+        translate = [deci(v) for v in node.translate]
+        if not self.compact or any(float(v) != 0 for v in translate):
+            str_node += "{3}translate = {0}, {1}, {2}\n"\
+                    .format(translate[0], translate[1], translate[2], tabs_lvl2)
+
+        # a zero angle is the identity rotation whatever the axis
+        axis = node.axis
+        if not self.compact or float(deci(node.angle)) != 0:
+            str_node += "{4}rotate = {0}, {1}, {2}, {3}\n"\
+                    .format(deci(axis[0]), deci(axis[1]), deci(axis[2]),
+                            deci(node.angle), tabs_lvl2)
+
+        scaling = [deci(v) for v in node.scale]
+        if not self.compact or any(float(v) != 1 for v in scaling):
+            str_node += "{3}scale = {0}, {1}, {2}\n".format(scaling[0],
+                    scaling[1], scaling[2], tabs_lvl2)
+        return str_node
+
+    def collision_prop(self, name, tab_num, collision, parent):
+        shape, url, center, axis, angle = collision
+        if shape != 'OBB':
+            return "{1}collisionObject = {0}\n".format(url, self.indent(tab_num))
+
+        # gameplay3d boxes are axis aligned, use a child node for the box axes
+        tabs_lvl1 = self.indent(tab_num)
+        tabs_lvl2 = self.indent(tab_num + 1)
+        str_node = "{1}node {0}_collision{{\n".format(name, tabs_lvl1)
+        self.add_to_index(name + "_collision", parent)
+        str_node += "{1}collisionObject = {0}\n".format(url, tabs_lvl2)
+        str_node += "{3}translate = {0}, {1}, {2}\n"\
+                .format(deci(center[0]), deci(center[1]), deci(center[2]), tabs_lvl2)
+        str_node += "{4}rotate = {0}, {1}, {2}, {3}\n"\
+                .format(deci(axis[0]), deci(axis[1]), deci(axis[2]),
+                        deci(angle), tabs_lvl2)
+        str_node += "{0}}}\n".format(tabs_lvl1)
+        return str_node
+
+    def light_prop(self, light):
+        tab = self.indent(1)
+        str_light = "light {0} {{\n".format(light.name)
+        str_light += tab + "type = {0}\n".format(light.type)
+        color = light.color
+        str_light += tab + "color = {0}, {1}, {2}\n".format(deci(color[0]),
+                deci(color[1]), deci(color[2]))
+        if light.distance is not None:
+            str_light += tab + "range = {0}\n".format(light.distance)
+        if light.spot_size is not None:
+            str_light += tab + "innerAngle = 1.0\n"
+            str_light += tab + "outerAngle = {0}\n".format(deci(light.spot_size))
+        str_light += "}\n"
+        return str_light
+
+    def camera_prop(self, camera):
+        tab = self.indent(1)
+        str_camera = "camera {0} {{\n".format(camera.name)
+        if camera.type == 'PERSPECTIVE':
+            str_camera += tab + "type = PERSPECTIVE\n"
+            str_camera += tab + "fieldOfView = {0}\n".format(deci(camera.fov))
+        elif camera.type == 'ORTHOGRAPHIC':
+            str_camera += tab + "type = ORTHOGRAPHIC\n"
+            str_camera += tab + "zoomX = {0}\n".format(deci(camera.zoom[0]))
+            str_camera += tab + "zoomY = {0}\n".format(deci(camera.zoom[1]))
+        str_camera += tab + "nearPlane = {0}\n".format(deci(camera.near))
+        str_camera += tab + "farPlane = {0}\n".format(deci(camera.far))
+        str_camera += "}\n"
+        return str_camera
+
+
+class Aggregator:
+    class AnimProp:
+        name = None
+        strips = None
+        parent = None
+
+        def __init__(self):
+            self.name = None
+            self.strips = list()
+            self.parent = None
+
+        def copy(self):
+            new = Aggregator.AnimProp()
+            new.name = self.name
+            new.strips = self.strips.copy()
+            new.parent = self.parent
+            return new
+
+    finalprops = None
+
+    def __init__(self):
+        self.finalprops = list()
+
+    def process(self, temp_props):
+        base = Aggregator.AnimProp()
+        index = 0
+        while True:
+            strip = None
+            diff = False
+
+            for prop in list(temp_props): #iterate copy to freely remove while iterating
+                if index >= len(prop.strips):
+                    copy = base.copy()
+                    copy.name = prop.name
+                    self.finalprops.append(copy)
+                    base.strips.clear()
+                    base.parent = prop.name
+                    temp_props.remove(prop)
+                elif strip is None:
+                    strip = prop.strips[index]
+                elif strip.name != prop.strips[index].name:
+                    copy = base.copy()
+                    copy.name = prop.name
+                    copy.strips += prop.strips[index:]
+                    self.finalprops.append(copy)
+                    temp_props.remove(prop)
+
+            if len(temp_props) == 0:
+                break
+            if diff is False and strip is not None:
+                base.strips.append(strip)
+            index += 1
+
+    def emit(self, frm_count):
+        str_result = ""
+        for prop in self.finalprops:
+            if prop.parent:
+                str_anim = "animation {0} : {1}{{\n".format(prop.name, prop.parent)
+            else:
+                str_anim = "animation {0} {{\n".format(prop.name)
+            if prop.parent is None:
+                str_anim += "\tframeCount = {0}\n".format(frm_count)
+            str_anim += self.write_props(prop)
+            str_anim += "}\n"
+            str_result += str_anim
+        return str_result
+
+    def write(self, frm_count, animfile):
+        return write_text(animfile, self.emit(frm_count), os.linesep)
+
+    # strips are ClipIR
+    def write_props(self, prop):
+        str_clip = ""
+        for clip in prop.strips:
+            str_clip += "\tclip {0} {{\n".format(clip.name)
+            str_clip += "\t\tbegin = {0}\n".format(clip.begin)
+            str_clip += "\t\tend = {0}\n".format(clip.end)
+
+            rpt = "INDEFINITE" if clip.indefinite else deci(clip.repeat)
+            str_clip += "\t\trepeatCount = {0}\n".format(rpt)
+            str_clip += "\t\tspeed = {0}\n".format(deci(clip.speed))
+            str_clip += "\t\tloopBlendTime = {0}\n".format(deci(clip.blend))
+            str_clip += "\t}\n"
+        return str_clip
+
+def emit_animation(animation):
+    temp_props = list()
+    for name, clips in animation.groups:
+        temp = Aggregator.AnimProp()
+        temp.name = name
+        temp.strips = list(clips)
+        temp_props.append(temp)
+    agg = Aggregator()
+    agg.process(temp_props)
+    return agg.emit(animation.frame_count)
+
+
+# the functions the export process pool runs, they return the files that
+# changed, see output.py
+
+def write_scene(scene, folder, compact = False, gen_index = False):
+    emitter = SceneEmitter(compact, gen_index)
+    data = emitter.emit(scene)
+    scenefile = os.path.join(folder, scene.name + ".scene")
+    changed = list()
+    if write_text(scenefile, data):
+        changed.append(scenefile)
+
+    if emitter.index is not None:
+        indexfile = os.path.splitext(scenefile)[0] + ".index"
+        if write_file(indexfile, emitter.index.pack(data.encode('utf-8'))):
+            changed.append(indexfile)
+    return changed
+
+def write_animation(animation, folder):
+    animfile = os.path.join(folder, animation.name + ".animation")
+    if write_text(animfile, emit_animation(animation), os.linesep):
+        return [animfile]
+    return []
+
+# runs the write functions above in a multiprocessing pool when one is set
+class PoolWriter:
+    pool = None
+    pending = None
+    changed = None # files changed by what was written so far
+
+    def submit(self, func, *args):
+        if self.changed is None:
+            self.changed = list()
+            self.pending = list()
+        if self.pool is None:
+            self.changed += func(*args)
+        else:
+            self.pending.append(self.pool.apply_async(func, args))
+
+    # wait for the submitted writes, raises what failed in the pool.
+    # returns every changed file
+    def finish(self):
+        for result in self.pending or []:
+            self.changed += result.get()
+        self.pending = list()
+        return list(self.changed or [])
@@ -13,14 +13,15 @@
 import bpy
 import os
 
-from .scenegen import SceneGen
-from .animgen import AnimGen
-from .assetgen import AssetGen
+from .registry import registry
+from .utils import cross_mkdir
+from .stats import ExportStats, NULL_STATS
+from .selection import ExportFilter, parse_names, tagged_objects
 
 # ExportHelper is a helper class, defines filename and
 # invoke() function which calls the file selector.
 from bpy_extras.io_utils import ExportHelper
-from bpy.props import StringProperty, BoolProperty
+from bpy.props import StringProperty, BoolProperty, IntProperty
 from bpy.types import Operator
 
 from mathutils import Matrix, Vector
@@ -55,14 +56,256 @@ class ExportToGameplay3D(Operator, ExportHelper):
             description="Generate Gameplay3D bundle files",
             default=True,
             ) 
+    compact_scenes = BoolProperty(
+            name="Compact scene files",
+            description="Omit default transforms and indentation in scene files",
+            default=False,
+            ) 
+    gen_collision = BoolProperty(
+            name="Generate collision objects",
+            description="Generate physics files for instances tagged collision_box, "\
+                    "collision_sphere, collision_capsule or collision_obb",
+            default=True,
+            ) 
+    gen_index = BoolProperty(
+            name="Generate scene index files",
+            description="Write a .index file mapping node names and tags to nodes "\
+                    "next to each scene file",
+            default=True,
+            ) 
+    dedup_meshes = BoolProperty(
+            name="Merge duplicate meshes",
+            description="Encode meshes with identical geometry once and point "\
+                    "every instance at the same gpb node. Duplicates are left "\
+                    "out of the gpb, game code can't load them by id",
+            default=False,
+            ) 
+    prune_assets = BoolProperty(
+            name="Skip unused assets",
+            description="Only export assets instanced in a game scene or asset group",
+            default=False,
+            ) 
+    list_orphans = BoolProperty(
+            name="List unused assets",
+            description="Print assets that no game scene or asset group instances",
+            default=False,
+            ) 
+    expand_groups = BoolProperty(
+            name="Expand asset groups",
+            description="Write asset group instances in full into each scene. "\
+                    "Off references the group's prefab scene file instead, "\
+                    "which needs a loader that resolves res/prefabs urls",
+            default=True,
+            ) 
+    worker_count = IntProperty(
+            name="Worker processes",
+            description="Export and encode ASSETS scenes in this many background "\
+                    "Blender processes, 0 exports them in this one",
+            default=0,
+            min=0,
+            ) 
+    format_processes = IntProperty(
+            name="Formatting processes",
+            description="Format scene and animation files in this many python "\
+                    "processes while Blender reads the next scene, 0 formats "\
+                    "them in this one",
+            default=0,
+            min=0,
+            ) 
+    gen_textures = BoolProperty(
+            name="Collect textures",
+            description="Copy the images materials use into textures, once per "\
+                    "content, and point the materials at them",
+            default=False,
+            ) 
+    texture_profiles = StringProperty(
+            name="Texture profiles",
+            description="Space separated profiles (desktop, mobile, low) to "\
+                    "write downscaled textures for, into textures/<profile>",
+            default="",
+            ) 
+    texture_processes = IntProperty(
+            name="Texture processes",
+            description="Convert textures in this many background Blender "\
+                    "processes, 0 converts them in this one",
+            default=0,
+            min=0,
+            ) 
+    only_scenes = StringProperty(
+            name="Only scenes",
+            description="Comma separated names of the scenes to export, "\
+                    "empty exports every scene",
+            default="",
+            ) 
+    only_tags = StringProperty(
+            name="Only tagged",
+            description="Space separated tags, export the scenes of objects "\
+                    "with any of them and the assets those use",
+            default="",
+            ) 
+    only_selected = BoolProperty(
+            name="Only selected",
+            description="Export the scenes of the selected objects and the "\
+                    "assets those use",
+            default=False,
+            ) 
+    check_budgets = BoolProperty(
+            name="Check budgets",
+            description="Check ASSETS scenes against their triangle, vertex, "\
+                    "material, skin and bone budgets first and write "\
+                    "budget_report.json",
+            default=False,
+            ) 
+    fail_on_budget = BoolProperty(
+            name="Stop on budget violations",
+            description="Export nothing when an asset is over its budget",
+            default=False,
+            ) 
+    verify_gpb = BoolProperty(
+            name="Verify gpb references",
+            description="Check that every gpb node the scene files reference "\
+                    "is in its bundle",
+            default=True,
+            ) 
+    share_materials = BoolProperty(
+            name="Share materials",
+            description="Merge identical materials of all ASSETS scenes into "\
+                    "materials/library.material and reference it from scenes",
+            default=False,
+            ) 
+    dump_ir = BoolProperty(
+            name="Dump scene data",
+            description="Write what scene and animation files are generated from "\
+                    "as json into an ir folder, tools/regen.py regenerates from it",
+            default=False,
+            ) 
+    write_report = BoolProperty(
+            name="Write export report",
+            description="Time each export stage and write export_report.json "\
+                    "with timings, peak memory and encoder output",
+            default=False,
+            ) 
             
     def execute(self, context):
-        if self.gen_assets:
-            assetgen = AssetGen(self.filepath)
+        stats = ExportStats(self.write_report)
+        stats.start()
+        passed = True
+        try:
+            with stats.stage("export"):
+                if self.check_budgets:
+                    passed = self.preflight(context, stats)
+                if passed:
+                    self.export(context, stats)
+        finally:
+            stats.stop()
+        reportfile = stats.write(self.filepath)
+        if reportfile:
+            self.report({'INFO'}, "Export report written to {0}".format(reportfile))
+        return {'FINISHED'} if passed else {'CANCELLED'}
+
+    # budget check before anything is exported, False stops the export
+    def preflight(self, context, stats):
+        from .budgets import BudgetCheck
+        # the filter finds ASSETS scenes through asset_list, bring it up to
+        # date as export() does
+        registry.reconcile()
+        only = self.export_filter(context)
+        scenes = [scene for scene in bpy.data.scenes
+                if only is None or only.includes(scene)]
+        with stats.stage("budgets"):
+            check = BudgetCheck().run(scenes)
+        check.write(self.filepath)
+        stats.add("budgets", "violations", check.violations)
+        for line in check.report():
+            print(line)
+        if len(check.violations) == 0:
+            return True
+        if self.fail_on_budget:
+            self.report({'ERROR'}, check.report()[-1] + ", nothing exported")
+            return False
+        self.report({'WARNING'}, check.report()[-1])
+        return True
+
+    def export(self, context, stats):
+        # imported on first export, not when the addon is registered
+        from .scenegen import SceneGen
+        from .animgen import AnimGen
+        from .assetgen import AssetGen
+        from .collisiongen import CollisionGen
+        from .meshdedup import MeshDedup
+        from .assetprune import AssetPrune
+        from .matlib import MaterialLibrary, LIBRARY
+        from .textures import TextureStage
+        from .output import write_changed_list
+        from .worker import start_workers, wait_workers, start_pool
+
+        assetgen = AssetGen(self.filepath, stats = stats) if self.gen_assets else None
+        textures = None
+        if self.gen_assets and self.gen_textures:
+            textures = TextureStage(self.filepath, [bpy.path.abspath('//')],
+                    self.texture_profiles.split())
+            assetgen.textures = textures
+        scenegen = None
         if self.gen_scenes:
-            scenegen = SceneGen(self.filepath)
-        if self.gen_animations:
-            animgen = AnimGen(self.filepath)
+            collisiongen = CollisionGen(self.filepath) if self.gen_collision else None
+            scenegen = SceneGen(self.filepath, self.compact_scenes, collisiongen,
+                    self.gen_index, not self.expand_groups)
+        animgen = AnimGen(self.filepath) if self.gen_animations else None
+        pool = start_pool(self.format_processes) if self.format_processes > 0 else None
+        irpath = cross_mkdir(os.path.join(self.filepath, "ir")) if self.dump_ir else None
+        for gen in (scenegen, animgen):
+            if gen:
+                gen.pool = pool
+                gen.irpath = irpath
+        # scenes wait for the .material files of the encoder
+        share_materials = self.share_materials and self.gen_assets
+        if scenegen and share_materials:
+            scenegen.deferred = list()
+
+        registry.reconcile()
+        dedup = None
+        if self.dedup_meshes:
+            with stats.stage("dedup"):
+                dedup = MeshDedup().build(bpy.data.scenes)
+            stats.add("dedup", "bytes_saved", dedup.bytes_saved())
+            for line in dedup.report():
+                print(line)
+            if self.gen_scenes:
+                scenegen.dedup = dedup
+
+        prune = None
+        orphan_count = 0
+        if self.prune_assets or self.list_orphans:
+            with stats.stage("prune"):
+                prune = AssetPrune().build(bpy.data.scenes,
+                        context.window_manager.gp3d_assets.asset_list, dedup)
+            orphan_count = len(prune.orphans)
+            stats.add("prune", "orphans", orphan_count)
+            if self.list_orphans:
+                for line in prune.report():
+                    print(line)
+            if not self.prune_assets:
+                prune = None
+
+        # a partial export only writes the scenes the filter includes
+        only = self.export_filter(context, dedup)
+        if only is not None:
+            stats.add("filter", "scenes", sorted(only.scenes))
+            for name in only.missing:
+                self.report({'WARNING'}, "No scene named {0}".format(name))
+            if textures:
+                textures.partial = True
+
+        # ASSETS scenes go to worker processes while this one writes the rest
+        workers = None
+        if self.worker_count > 0 and (self.gen_assets or self.gen_animations):
+            names = [scene.name for scene in bpy.data.scenes
+                    if scene.gp3d_scenetype == 'ASSETS' and
+                            (only is None or only.includes(scene))]
+            workers = start_workers(self.filepath, names, self.worker_count, {
+                'assets': self.gen_assets, 'animations': self.gen_animations,
+                'dedup': dedup is not None, 'prune': prune is not None,
+                'report': stats.enabled, 'textures': textures is not None})
             
         overrides = self.initOverrides(context)
         space = overrides.get('space_data')
@@ -75,63 +318,133 @@ class ExportToGameplay3D(Operator, ExportHelper):
         for scene, progress in zip(bpy.data.scenes, range(total)):
             # update progress
             wm.progress_update(progress)
+            if only is not None and not only.includes(scene):
+                continue
             overrides['scene'] = scene
             scene.cursor_location = Vector((0, 0, 0))
 
             if scene.gp3d_scenetype == 'GAME_SCENE' and self.gen_scenes:
-                scenegen.export(scene)
+                with stats.stage("scene", scene.name):
+                    scenegen.export(scene)
+
+            elif scene.gp3d_scenetype == 'ASSET_GROUP' and self.gen_scenes and\
+                    not self.expand_groups:
+                with stats.stage("prefab", scene.name):
+                    scenegen.export(scene, prefab = True)
                     
-            elif scene.gp3d_scenetype == 'ASSETS':
-                bases_ = list()
-                objs_ = list()
-                apply_objs = list()
-                apply_bases = list()
-                dups = list()
-
-                # ready objects to match gameplay3d orientation
-                # iterate copy to exclude  duplicates
-                for obj, base in zip(list(scene.objects), list(scene.object_bases)):
-                    if obj.parent is None:
-                        dup = Dup()
-                        copy = dup.create_copy(scene, obj)
-                        objs_.append(copy)
-                        if obj.type == 'MESH':
-                            scene.objects.link(copy)
-                            apply_objs.append(copy)
-                            copy_base = super(bpy.types.Object, copy)
-                            bases_.append(copy_base)
-                            apply_bases.append(copy_base)
-                        elif obj.type == 'ARMATURE':
-                            # write animation
-                            if self.gen_animations:
-                                animgen.write(scene, obj)
-                            bases_.append(base)
-                        dups.append(dup)
-
-                overrides['selected_objects'] = objs_
-                overrides['selected_bases'] = bases_
-                overrides['selected_editable_objects'] = objs_
-                bpy.ops.object.location_clear(overrides) 
-                bpy.ops.object.mode_set(overrides, mode='OBJECT', toggle=False)
-
-                overrides['selected_objects'] = apply_objs
-                overrides['selected_bases'] = apply_bases
-                overrides['selected_editable_objects'] = apply_objs
-                bpy.ops.object.transform_apply(overrides, rotation=True)
-
-                # write assets
-                if self.gen_assets:
-                    assetgen.write(overrides, scene)
-
-                # restore
-                for dup in dups:
-                    dup.restore(scene)
+            elif scene.gp3d_scenetype == 'ASSETS' and not workers:
+                with stats.stage("assets", scene.name):
+                    export_assets(overrides, scene, assetgen, animgen, dedup,
+                            prune, stats)
+
+        changed = list() # files whose content changed
+        if workers:
+            for result in wait_workers(workers):
+                print(result.log)
+                stats.add("worker_logs", ", ".join(result.scenes), result.log)
+                changed += result.changed
+                if textures and result.textures:
+                    textures.merge(result.textures)
+                if result.report:
+                    stats.merge(result.report)
+                if result.returncode != 0:
+                    self.report({'ERROR'}, "Worker exporting {0} failed, see the console"
+                            .format(", ".join(result.scenes)))
 
+        # files still being formatted by the pool
+        try:
+            if textures:
+                with stats.stage("textures"):
+                    changed += textures.finish(self.texture_processes,
+                            bpy.app.binary_path)
+                for line in textures.report():
+                    print(line)
+                stats.add("textures", "count", len(textures.jobs))
+                stats.add("textures", "missing", sorted(textures.missing))
+            if share_materials:
+                with stats.stage("materials"):
+                    names = [scene.name for scene in bpy.data.scenes
+                            if scene.gp3d_scenetype == 'ASSETS']
+                    library = MaterialLibrary().build(assetgen.matpath, names)
+                    if library.write(assetgen.matpath):
+                        changed.append(os.path.join(assetgen.matpath,
+                                LIBRARY + ".material"))
+                    if scenegen:
+                        scenegen.flush(library)
+                for line in library.report():
+                    print(line)
+                stats.add("materials", "entries", len(library.entries))
+                stats.add("materials", "merged", len(library.merged))
+            with stats.stage("formatting"):
+                for gen in (scenegen, animgen):
+                    if gen:
+                        changed += gen.finish()
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        if scenegen and self.verify_gpb:
+            with stats.stage("verify_gpb"):
+                verifier = self.verify_references(scenegen, stats)
+            for line in verifier.report():
+                print(line)
+            if len(verifier.errors) > 0:
+                self.report({'WARNING'}, verifier.report()[-1])
+        if scenegen and scenegen.collisiongen:
+            changed += scenegen.collisiongen.changed
         if self.gen_assets:
+            changed += assetgen.changed
             assetgen.clean_up()
+
+        # for incremental packaging, unchanged files keep their timestamp
+        listfile = write_changed_list(self.filepath, changed)
+        stats.add("output", "changed", sorted(changed))
+        self.report({'INFO'}, "{0} file(s) changed, listed in {1}"
+                .format(len(changed), listfile))
         self.applyUserSettings(space, user_settings)
         wm.progress_end()
-        return {'FINISHED'}
+        if textures:
+            self.report({'INFO'}, textures.report()[-1])
+        if share_materials and len(library.merged) > 0:
+            self.report({'INFO'}, library.report()[-1])
+        if dedup and len(dedup.saved) > 0:
+            self.report({'INFO'}, dedup.report()[-1])
+        if self.list_orphans:
+            self.report({'INFO'}, "{0} unused assets, see the console for the list"
+                    .format(orphan_count))
+
+    # reads only the reference tables of the bundles, see gpbreader.py
+    def verify_references(self, scenegen, stats):
+        from .gpbreader import GpbVerifier
+        verifier = GpbVerifier(os.path.join(self.filepath, "gpb"))
+        verifier.verify(scenegen.references)
+        if stats.enabled:
+            for scene in bpy.data.scenes:
+                gpbfile = os.path.join(verifier.folder, scene.name + ".gpb")
+                if scene.gp3d_scenetype == 'ASSETS' and os.path.exists(gpbfile):
+                    verifier.index(scene.name)
+            for name, index in sorted(verifier.indexes.items()):
+                if index is not None:
+                    stats.add("gpb_sizes", name, index.sizes())
+        stats.add("gpb", "broken", verifier.report()[:-1])
+        return verifier
+
+    # None when every scene is exported
+    def export_filter(self, context, dedup = None):
+        if not (self.only_scenes or self.only_tags or self.only_selected):
+            return None
+        only = ExportFilter()
+        only.add_scenes(parse_names(self.only_scenes))
+        assets = context.window_manager.gp3d_assets
+        if self.only_tags:
+            only.add_objects(tagged_objects(self.only_tags.split()), assets, dedup)
+        if self.only_selected:
+            # no selection context when run from the command line
+            selected = getattr(context, "selected_objects", None)
+            if selected is None:
+                selected = [obj for obj in context.scene.objects if obj.select]
+            only.add_objects(selected, assets, dedup)
+        return only
 
     def initOverrides(self, context):
         screen = bpy.data.screens['Default']
@@ -161,6 +474,67 @@ class ExportToGameplay3D(Operator, ExportHelper):
         space.transform_orientation = settings['trans_orient']
         space.pivot_point = settings['pivot_point']
 
+# FBX export and encode one ASSETS scene. assetgen or animgen may be None
+# to skip the gpb or the animation file. Also run by worker processes.
+def export_assets(overrides, scene, assetgen, animgen, dedup = None, prune = None,
+        stats = NULL_STATS):
+    bases_ = list()
+    objs_ = list()
+    apply_objs = list()
+    apply_bases = list()
+    dups = list()
+    excluded = Exclude()
+
+    with stats.stage("prepare", scene.name):
+        # ready objects to match gameplay3d orientation
+        # iterate copy to exclude  duplicates
+        for obj, base in zip(list(scene.objects), list(scene.object_bases)):
+            if dedup and dedup.is_duplicate(obj):
+                excluded.add(obj)
+            elif prune and prune.is_orphan(scene, obj):
+                excluded.add(obj)
+            elif obj.parent is None:
+                dup = Dup()
+                copy = dup.create_copy(scene, obj)
+                objs_.append(copy)
+                if obj.type == 'MESH':
+                    scene.objects.link(copy)
+                    apply_objs.append(copy)
+                    copy_base = super(bpy.types.Object, copy)
+                    bases_.append(copy_base)
+                    apply_bases.append(copy_base)
+                elif obj.type == 'ARMATURE':
+                    # write animation
+                    if animgen:
+                        with stats.stage("animation", scene.name):
+                            animgen.write(scene, obj)
+                    bases_.append(base)
+                dups.append(dup)
+        excluded.unlink(scene)
+
+        overrides['selected_objects'] = objs_
+        overrides['selected_bases'] = bases_
+        overrides['selected_editable_objects'] = objs_
+        bpy.ops.object.location_clear(overrides) 
+        bpy.ops.object.mode_set(overrides, mode='OBJECT', toggle=False)
+
+        overrides['selected_objects'] = apply_objs
+        overrides['selected_bases'] = apply_bases
+        overrides['selected_editable_objects'] = apply_objs
+        bpy.ops.object.transform_apply(overrides, rotation=True)
+
+    # write assets, unless every asset of the scene was left out
+    if assetgen and len(dups) > 0:
+        assetgen.write(overrides, scene)
+    elif assetgen:
+        assetgen.remove(scene)
+
+    # restore
+    with stats.stage("restore", scene.name):
+        for dup in dups:
+            dup.restore(scene)
+        excluded.restore(scene)
+
 class Dup:
     trans = None
     obj = None
@@ -195,6 +569,29 @@ class Dup:
             self.copy.user_clear()
             bpy.data.objects.remove(self.copy)
 
+# objects left out of the asset export, unlinked until restored
+class Exclude:
+    objs = None
+
+    def __init__(self):
+        self.objs = list()
+
+    def add(self, obj):
+        if obj in self.objs:
+            return
+        self.objs.append(obj)
+        for child in obj.children:
+            self.add(child)
+
+    def unlink(self, scene):
+        for obj in self.objs:
+            scene.objects.unlink(obj)
+
+    def restore(self, scene):
+        for obj in self.objs:
+            scene.objects.link(obj)
+        self.objs.clear()
+
 # Only needed if you want to add into a dynamic menu
 def menu_func_export(self, context):
     self.layout.operator(ExportToGameplay3D.bl_idname, text="Export Gameplay3D")
@@ -0,0 +1,16 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Text helpers of the file writers, kept free of bpy so emit.py can run
+# outside of blender. utils.py re-exports them.
+
+def tabs(num):
+    return '\t' * num
+
+def deci(n):
+    return format(n, '.2f')
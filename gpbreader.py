@@ -0,0 +1,145 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Reads the reference table of a .gpb bundle without loading anything else.
+# The file is memory mapped, so only the pages of the table are read however
+# large the meshes and animations after it are:
+#
+#   identifier  9 bytes, AB 'GPB' BB '\r' '\n' 1A '\n'
+#   version     2 bytes, major and minor
+#   count       u32
+#   references  count * (u32 id length, id, u32 type, u32 offset)
+#
+# Offsets point at each object's data. Its size is taken up to the next
+# offset in the file, an estimate good enough for the export report.
+# Doesn't depend on bpy, used by the export and by tools/gpbinfo.py.
+
+import os
+import mmap
+import struct
+
+IDENTIFIER = b'\xabGPB\xbb\r\n\x1a\n'
+U32 = struct.Struct('<I')
+REFERENCE = struct.Struct('<II') # type, offset
+
+# gameplay3d's Reference types
+TYPES = {
+    1: 'SCENE', 2: 'NODE', 3: 'ANIMATIONS', 4: 'ANIMATION', 5: 'ANIMATIONCHANNEL',
+    8: 'NODEINSTANCE', 11: 'MODEL', 16: 'MATERIAL', 17: 'EFFECT', 32: 'CAMERA',
+    33: 'LIGHT', 34: 'MESH', 35: 'MESHPART', 36: 'MESHSKIN', 128: 'FONT',
+}
+NODE = 2
+
+class GpbIndex:
+    version = None # (major, minor)
+    file_size = 0
+    entries = None # {id: (type, offset, size)}
+
+    def __init__(self):
+        self.entries = dict()
+
+    def read(self, filepath):
+        f = open(filepath, 'rb')
+        try:
+            self.file_size = os.fstat(f.fileno()).st_size
+            if self.file_size < len(IDENTIFIER) + 2 + U32.size:
+                raise ValueError("Not a gameplay3d bundle: {0}".format(filepath))
+            data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+            try:
+                self.parse(data, filepath)
+            finally:
+                data.close()
+        finally:
+            f.close()
+        return self
+
+    def parse(self, data, filepath):
+        if data[:len(IDENTIFIER)] != IDENTIFIER:
+            raise ValueError("Not a gameplay3d bundle: {0}".format(filepath))
+        pos = len(IDENTIFIER)
+        self.version = (data[pos], data[pos + 1])
+        count = U32.unpack_from(data, pos + 2)[0]
+        pos += 2 + U32.size
+
+        refs = list()
+        for index in range(count):
+            if pos + U32.size > self.file_size:
+                raise ValueError("Truncated reference table: {0}".format(filepath))
+            length = U32.unpack_from(data, pos)[0]
+            pos += U32.size
+            end = pos + length + REFERENCE.size
+            if end > self.file_size:
+                raise ValueError("Truncated reference table: {0}".format(filepath))
+            ref_id = data[pos:pos + length].decode('utf-8', 'replace')
+            ref_type, offset = REFERENCE.unpack_from(data, pos + length)
+            refs.append((ref_id, ref_type, offset))
+            pos = end
+
+        # data runs to the next object's offset, the last one to the end
+        ends = sorted(set(offset for ref_id, ref_type, offset in refs))
+        ends.append(self.file_size)
+        following = {ends[i]: ends[i + 1] for i in range(len(ends) - 1)}
+        for ref_id, ref_type, offset in refs:
+            size = following.get(offset, self.file_size) - offset
+            self.entries[ref_id] = (ref_type, offset, max(size, 0))
+
+    def has_node(self, node_id):
+        entry = self.entries.get(node_id, None)
+        return entry is not None and entry[0] == NODE
+
+    # {type name: {id: size}} for the export report
+    def sizes(self):
+        result = dict()
+        for ref_id, (ref_type, offset, size) in self.entries.items():
+            name = TYPES.get(ref_type, str(ref_type))
+            result.setdefault(name, dict())[ref_id] = size
+        return result
+
+
+# checks (gpb scene, node id) references against the gpb files of a folder,
+# each bundle is read once
+class GpbVerifier:
+    folder = None
+    indexes = None # {gpb scene: GpbIndex or None when missing or unreadable}
+    errors = None # [(gpb scene, node id or None, what is wrong, used by)]
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.indexes = dict()
+        self.errors = list()
+
+    def index(self, scene):
+        if scene not in self.indexes:
+            gpbfile = os.path.join(self.folder, scene + ".gpb")
+            try:
+                self.indexes[scene] = GpbIndex().read(gpbfile)
+            except (OSError, ValueError) as err:
+                self.indexes[scene] = None
+                self.errors.append((scene, None, str(err), []))
+        return self.indexes[scene]
+
+    # references is {(gpb scene, node id): [scene files using it]}
+    def verify(self, references):
+        for scene, node_id in sorted(references):
+            index = self.index(scene)
+            if index is not None and not index.has_node(node_id):
+                self.errors.append((scene, node_id, "no such node",
+                        sorted(references[(scene, node_id)])))
+        return self.errors
+
+    def report(self):
+        lines = list()
+        for scene, node_id, error, users in self.errors:
+            url = "res/gpb/{0}.gpb".format(scene)
+            if node_id:
+                url += "#" + node_id
+            lines.append("{0}: {1}{2}".format(url, error,
+                    " (used by {0})".format(", ".join(users)) if users else ""))
+        lines.append("{0} broken gpb reference(s) in {1} bundle(s)".format(
+                len(self.errors), len(self.indexes)))
+        return lines
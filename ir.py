@@ -0,0 +1,90 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Plain snapshot of what the .scene and .animation files are written from.
+# SceneGen and AnimGen fill these in from blender data, emit.py formats
+# them without touching bpy, so they can be pickled to a process pool or
+# dumped to json and regenerated offline (tools/regen.py).
+#
+# Vectors are already in gameplay3d's orientation (y up) and angles in
+# degrees, the emitters only format numbers.
+
+import json
+
+class IR:
+    fields = ()
+
+    def __init__(self, **values):
+        for field in self.fields:
+            setattr(self, field, values.get(field, None))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+                getattr(self, f) == getattr(other, f) for f in self.fields)
+
+class NodeIR(IR):
+    # translate, axis and scale are (x, y, z), angle is the rotation
+    # around axis. translate is None for a prefab root, which takes the
+    # transform of its instance.
+    # mesh is (asset scene, asset object), material is (material file,
+    # material) both without extension, prefab is (group scene, group object),
+    # collision is (shape, url, obb center, obb axis, obb angle)
+    fields = ('name', 'type', 'tags', 'hide', 'translate', 'axis', 'angle',
+            'scale', 'mesh', 'material', 'prefab', 'light', 'camera', 'collision',
+            'children')
+
+class LightIR(IR):
+    # distance and spot_size are None when the type doesn't use them
+    fields = ('name', 'type', 'color', 'distance', 'spot_size')
+
+class CameraIR(IR):
+    # fov for PERSPECTIVE, zoom (x, y) for ORTHOGRAPHIC
+    fields = ('name', 'type', 'fov', 'zoom', 'near', 'far')
+
+class SceneIR(IR):
+    # ambient and camera are None for prefab scenes
+    fields = ('name', 'prefab', 'ambient', 'camera', 'nodes', 'lights', 'cameras')
+
+class ClipIR(IR):
+    fields = ('name', 'track', 'begin', 'end', 'indefinite', 'repeat', 'speed',
+            'blend')
+
+class AnimationIR(IR):
+    # groups are [(group name, [ClipIR])] in the order they are aggregated
+    fields = ('name', 'frame_count', 'groups')
+
+TYPES = {cls.__name__: cls for cls in (NodeIR, LightIR, CameraIR, SceneIR,
+        ClipIR, AnimationIR)}
+
+def to_data(value):
+    if isinstance(value, IR):
+        data = {f: to_data(getattr(value, f)) for f in value.fields}
+        data['ir'] = type(value).__name__
+        return data
+    if isinstance(value, (list, tuple)):
+        return [to_data(v) for v in value]
+    return value
+
+def from_data(data):
+    if isinstance(data, dict):
+        return TYPES[data['ir']](**{f: from_data(v) for f, v in data.items()
+                if f != 'ir'})
+    if isinstance(data, list):
+        return [from_data(v) for v in data]
+    return data
+
+def dump(value, filepath):
+    f = open(filepath, 'w', encoding = 'utf-8')
+    json.dump(to_data(value), f, separators = (',', ':'))
+    f.close()
+
+def load(filepath):
+    f = open(filepath, encoding = 'utf-8')
+    data = json.load(f)
+    f.close()
+    return from_data(data)
@@ -0,0 +1,132 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Merges the .material files the encoder writes for each ASSETS scene into
+# materials/library.material. Every material is flattened (its parents
+# merged in), canonicalized (properties sorted) and hashed; materials with
+# the same hash become one library entry, scenes reference that entry.
+
+import os
+import hashlib
+from .sceneprops import Namespace, parse
+from .output import write_text
+
+LIBRARY = "library" # materials/library.material
+
+def copy_space(space):
+    new = Namespace(space.namespace, space.id, space.parent)
+    new.properties = list(space.properties)
+    new.namespaces = [copy_space(child) for child in space.namespaces]
+    return new
+
+# child overriding base the way gameplay3d applies material inheritance
+def merge(base, child):
+    result = Namespace(child.namespace, child.id)
+    values = dict(child.properties)
+    result.properties = [(key, values.pop(key, value)) for key, value in base.properties]
+    result.properties += [(key, value) for key, value in child.properties
+            if key in values]
+    used = set()
+    for space in base.namespaces:
+        match = None
+        for index, other in enumerate(child.namespaces):
+            if index not in used and other.namespace == space.namespace and\
+                    other.id == space.id:
+                match = index
+                break
+        if match is None:
+            result.namespaces.append(copy_space(space))
+        else:
+            used.add(match)
+            result.namespaces.append(merge(space, child.namespaces[match]))
+    result.namespaces += [copy_space(other) for index, other
+            in enumerate(child.namespaces) if index not in used]
+    return result
+
+# material with its parents in the same file merged in
+def flatten(materials, name, seen = ()):
+    material = materials[name]
+    parent = material.parent
+    if parent and parent in materials and parent not in seen:
+        flat = merge(flatten(materials, parent, seen + (name,)), material)
+    else:
+        flat = copy_space(material)
+    flat.parent = None
+    return flat
+
+# the text hashed: no material name, properties sorted, namespaces in order
+# (passes are drawn in order)
+def canonical(space, tab_num = 0):
+    header = space.namespace if tab_num == 0 else space.header()
+    result = "{0} {{\n".format(header)
+    for key, value in sorted(space.properties):
+        result += "{0}={1}\n".format(key, value)
+    for child in space.namespaces:
+        result += canonical(child, tab_num + 1)
+    return result + "}\n"
+
+def digest(space):
+    return hashlib.sha1(canonical(space).encode('utf-8')).hexdigest()
+
+class MaterialLibrary:
+    entries = None # {digest: flattened material named as in the library}
+    names = None # {library name: digest}
+    mapping = None # {(material file, material): library name}
+    merged = None # [(material file, material, library name)] sharing an entry
+
+    def __init__(self):
+        self.entries = dict()
+        self.names = dict()
+        self.mapping = dict()
+        self.merged = list()
+
+    # reads materials/<scene>.material of each named scene
+    def build(self, matpath, scenes):
+        for scene in sorted(scenes):
+            matfile = os.path.join(matpath, scene + ".material")
+            if os.path.exists(matfile):
+                f = open(matfile, encoding = 'utf-8')
+                self.add_file(scene, f.read())
+                f.close()
+        return self
+
+    def add_file(self, filename, text):
+        spaces = parse(text).children("material")
+        materials = {space.id: space for space in spaces if space.id}
+        for space in spaces:
+            if not space.id:
+                continue
+            flat = flatten(materials, space.id)
+            key = digest(flat)
+            if key in self.entries:
+                name = self.entries[key].id
+                self.merged.append((filename, space.id, name))
+            else:
+                name = space.id
+                if name in self.names:
+                    name = "{0}_{1}".format(name, key[:8])
+                flat.id = name
+                self.entries[key] = flat
+                self.names[name] = key
+            self.mapping[(filename, space.id)] = name
+
+    # (material file, material) of the library entry replacing a reference
+    def lookup(self, reference):
+        name = self.mapping.get(tuple(reference), None)
+        return (LIBRARY, name) if name else reference
+
+    # returns True when the library file changed
+    def write(self, matpath):
+        data = "".join(entry.serialize() for entry in self.entries.values())
+        return write_text(os.path.join(matpath, LIBRARY + ".material"), data)
+
+    def report(self):
+        lines = ["{0}#{1} -> {2}#{3}".format(f, m, LIBRARY, n) for f, m, n in self.merged]
+        lines.append("Merged {0} materials, {1} library entries from {2} materials"
+                .format(len(self.merged), len(self.entries), len(self.mapping)))
+        return lines
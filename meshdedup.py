@@ -0,0 +1,113 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+import hashlib
+import numpy as np
+
+def read_array(collection, attribute, dtype, size = 1):
+    data = np.empty(len(collection) * size, dtype = dtype)
+    collection.foreach_get(attribute, data)
+    return data
+
+# hash of everything that ends up in the gpb for this mesh object
+def mesh_digest(obj):
+    mesh = obj.data
+    digest = hashlib.sha1()
+    digest.update(read_array(mesh.vertices, 'co', np.float32, 3).tobytes())
+    digest.update(read_array(mesh.vertices, 'normal', np.float32, 3).tobytes())
+    digest.update(read_array(mesh.loops, 'vertex_index', np.int32).tobytes())
+    digest.update(read_array(mesh.polygons, 'loop_total', np.int32).tobytes())
+    digest.update(read_array(mesh.polygons, 'material_index', np.int32).tobytes())
+    digest.update(read_array(mesh.polygons, 'use_smooth', np.bool_).tobytes())
+    # auto smooth splits the exported normals along sharp edges
+    digest.update(repr((mesh.use_auto_smooth, mesh.auto_smooth_angle)).encode('utf-8'))
+    for layer in mesh.uv_layers:
+        digest.update(read_array(layer.data, 'uv', np.float32, 2).tobytes())
+    for layer in mesh.vertex_colors:
+        digest.update(read_array(layer.data, 'color', np.float32, 3).tobytes())
+    for slot in obj.material_slots:
+        name = slot.material.name if slot.material else ""
+        digest.update(name.encode('utf-8') + b'\0')
+    return digest.hexdigest()
+
+# rough size of the mesh in the gpb, used for the savings report
+def estimate_bytes(mesh):
+    totals = read_array(mesh.polygons, 'loop_total', np.int32)
+    triangles = int((totals - 2).sum()) if len(totals) else 0
+    vertex_size = 4 * (3 + 3 + 2 * len(mesh.uv_layers))
+    index_size = 2 if len(mesh.vertices) < 65536 else 4
+    return len(mesh.vertices) * vertex_size + triangles * 3 * index_size
+
+def can_dedup(obj):
+    # skinned meshes belong to their armature, modifiers change the geometry,
+    # shape keys and vertex groups aren't hashed. a duplicate is left out of
+    # the export with its children, so only childless roots qualify
+    if obj.type != 'MESH' or obj.parent is not None or len(obj.children) > 0:
+        return False
+    return len(obj.modifiers) == 0 and len(obj.vertex_groups) == 0 and\
+            obj.data.shape_keys is None
+
+class MeshDedup:
+    canonical = None # {mesh.name: canonical mesh.name} for duplicates only
+    duplicates = None # [(scene.name, obj.name)] not exported
+    saved = None # [(mesh.name, canonical mesh.name, bytes)]
+    digests = None # {mesh.name: digest} of the last build
+
+    def __init__(self):
+        self.canonical = dict()
+        self.duplicates = list()
+        self.saved = list()
+        self.digests = dict()
+
+    # changed names the meshes to hash again when building a second time,
+    # the others keep their digest. None hashes every mesh.
+    def build(self, scenes, changed = None):
+        self.canonical = dict()
+        self.duplicates = list()
+        self.saved = list()
+        digests = dict()
+        found = dict() # {digest: mesh.name}
+        candidates = list()
+        for scene in scenes:
+            if scene.gp3d_scenetype == 'ASSETS':
+                candidates += [(scene.name, obj.name, obj) for obj in scene.objects
+                        if can_dedup(obj)]
+
+        # first by scene and object name wins so the choice is stable
+        seen = set()
+        for scene_name, obj_name, obj in sorted(candidates, key = lambda c: c[:2]):
+            mesh = obj.data
+            if mesh.name in seen:
+                continue # linked duplicate, already the same asset
+            seen.add(mesh.name)
+            digest = self.digests.get(mesh.name, None)
+            if digest is None or changed is None or mesh.name in changed:
+                digest = mesh_digest(obj)
+            digests[mesh.name] = digest
+            original = found.setdefault(digest, mesh.name)
+            if original != mesh.name:
+                self.canonical[mesh.name] = original
+                self.duplicates.append((scene_name, obj_name))
+                self.saved.append((mesh.name, original, estimate_bytes(mesh)))
+        self.digests = digests
+        return self
+
+    def resolve(self, mesh_name):
+        return self.canonical.get(mesh_name, mesh_name)
+
+    def is_duplicate(self, obj):
+        return can_dedup(obj) and obj.data.name in self.canonical
+
+    def bytes_saved(self):
+        return sum(s[2] for s in self.saved)
+
+    def report(self):
+        lines = ["{0} -> {1}: {2} bytes".format(*s) for s in self.saved]
+        lines.append("Merged {0} duplicate meshes, saved about {1} bytes"
+                .format(len(self.saved), self.bytes_saved()))
+        return lines
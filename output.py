@@ -0,0 +1,109 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Every generated file goes through here. A file whose content didn't change
+# is left untouched, so its timestamp stays and hot-reload or packaging
+# don't pick it up. Changed files are written to a temp file next to the
+# target and renamed over it, a reader never sees half a file.
+#
+# write_file(), commit_file() and remove_file() return True when the target
+# changed, the caller collects those paths into the export's changed list.
+# A removed file stays in the list, a packager finds it gone.
+
+import os
+import hashlib
+
+CHUNK = 1 << 16
+CHANGED_LIST = "changed_files.txt"
+
+def file_digest(path):
+    sha = hashlib.sha1()
+    f = open(path, 'rb')
+    chunk = f.read(CHUNK)
+    while chunk:
+        sha.update(chunk)
+        chunk = f.read(CHUNK)
+    f.close()
+    return sha.digest()
+
+# size first, the hash is only needed when the sizes match
+def same_content(path, data):
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+    except OSError:
+        return False
+    return file_digest(path) == hashlib.sha1(data).digest()
+
+def same_file(path, other):
+    try:
+        if os.path.getsize(path) != os.path.getsize(other):
+            return False
+    except OSError:
+        return False
+    return file_digest(path) == file_digest(other)
+
+def temp_path(path):
+    folder, name = os.path.split(path)
+    return os.path.join(folder, ".{0}.{1}.tmp".format(name, os.getpid()))
+
+# data is bytes, text is encoded by the caller
+def write_file(path, data):
+    if same_content(path, data):
+        return False
+    temp = temp_path(path)
+    f = open(temp, 'wb')
+    try:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    finally:
+        f.close()
+    os.replace(temp, path)
+    return True
+
+# text with '\n' line ends, newline gives what they are written as
+def write_text(path, text, newline = '\n'):
+    if newline != '\n':
+        text = text.replace('\n', newline)
+    return write_file(path, text.encode('utf-8'))
+
+# moves a finished file (e.g. written by the encoder) over path, or drops
+# it when path already has the same content
+def commit_file(source, path):
+    if same_file(path, source):
+        os.remove(source)
+        return False
+    try:
+        os.replace(source, path)
+    except OSError:
+        # another file system, copy next to the target first
+        f = open(source, 'rb')
+        data = f.read()
+        f.close()
+        os.remove(source)
+        write_file(path, data)
+    return True
+
+# removes a file that is no longer generated
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+# writes the changed paths relative to the export folder, one per line
+def write_changed_list(filepath, changed):
+    names = sorted(set(os.path.relpath(path, filepath) for path in changed))
+    listfile = os.path.join(filepath, CHANGED_LIST)
+    f = open(listfile, 'w', encoding = 'utf-8', newline = '\n')
+    for name in names:
+        f.write(name.replace(os.sep, '/') + "\n")
+    f.close()
+    return listfile
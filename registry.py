@@ -0,0 +1,281 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Keeps gp3d_assets.asset_list and group_list up to date incrementally.
+# Objects touched while editing are only marked dirty, the lists are
+# reconciled lazily (on save, refresh or export) by re-reading just the
+# objects and scenes that changed. rebuild() is the full walk used the first
+# time and for recovery.
+
+import bpy
+from bpy.app.handlers import persistent
+from .utils import armature_parent_or_none
+from . import basicprops
+
+INSTANCE_SCENES = ('GAME_SCENE', 'ASSET_GROUP')
+
+# what an object contributes to the lists for one of its scenes
+def object_records(obj, scene):
+    records = list()
+    type_ = scene.gp3d_scenetype
+    if obj.type == 'MESH':
+        if type_ == 'ASSETS' and armature_parent_or_none(obj):
+            records.append(('ASSET', obj.data.name, scene.name))
+        elif type_ == 'ASSET_GROUP' and obj.parent is None:
+            records.append(('GROUP', "{0}".format(obj.as_pointer()), scene.name))
+    if type_ in INSTANCE_SCENES:
+        if obj.type == 'MESH':
+            records.append(('ASSET_INSTANCE', obj.data.name, scene.name))
+        src_id = obj.get('gp3d_id', None)
+        if src_id:
+            records.append(('GROUP_INSTANCE', src_id, scene.name))
+    return records
+
+def find_item(collection, name, objname, scene):
+    index = collection.find(name)
+    if index >= 0:
+        item = collection[index]
+        if item.objname == objname and item.scene == scene:
+            return index
+    for index, item in enumerate(collection):
+        if item.name == name and item.objname == objname and item.scene == scene:
+            return index
+    return -1
+
+class AssetRegistry:
+    built = False
+    records = None # {obj.name: [(kind, key, scene.name)]}
+    object_names = None
+    mesh_names = None
+    scenes = None # {scene.name: (gp3d_scenetype, frozenset of object names)}
+    dirty = None # object names to re-read on the next reconcile
+    asset_instances = None # {mesh.name: {obj.name}}
+    group_instances = None # {group key: {obj.name}}
+    refs_pending = False # gp3d_id of group instances not yet resolved
+    unresolved = None # [(scene.name, obj.name, gp3d_name)]
+
+    def __init__(self):
+        self.clear()
+        self.unresolved = list()
+
+    # group instances store their group's object name in gp3d_name when
+    # saved, gp3d_id (the pointer, only valid for this session) is restored
+    # from it on first use instead of on file load
+    def resolve_refs(self):
+        if not self.refs_pending:
+            return self.unresolved
+        self.refs_pending = False
+        objects = {obj.name: obj for obj in bpy.data.objects}
+        ids = dict() # {gp3d_name: gp3d_id}
+        unresolved = list()
+        for scene in bpy.data.scenes:
+            if scene.gp3d_scenetype not in INSTANCE_SCENES:
+                continue
+            for obj in scene.objects:
+                src_name = obj.get('gp3d_name', None)
+                if not src_name:
+                    continue
+                src_id = ids.get(src_name, None)
+                if src_id is None:
+                    src = objects.get(src_name, None)
+                    if src is None:
+                        unresolved.append((scene.name, obj.name, src_name))
+                        continue
+                    src_id = ids[src_name] = "{0}".format(src.as_pointer())
+                obj['gp3d_id'] = src_id
+        for ref in unresolved:
+            print("Unresolved group reference: {1} in scene {0} -> {2}".format(*ref))
+        self.unresolved = unresolved
+        return unresolved
+
+    # forget everything, the next reconcile does a full rebuild
+    def clear(self):
+        self.built = False
+        self.records = dict()
+        self.object_names = set()
+        self.mesh_names = set()
+        self.scenes = dict()
+        self.dirty = set()
+        self.asset_instances = dict()
+        self.group_instances = dict()
+
+    def mark(self, objs):
+        for obj in objs:
+            self.dirty.add(obj.name)
+
+    def scene_signatures(self):
+        return {scene.name: (scene.gp3d_scenetype, frozenset(scene.objects.keys()))
+                for scene in bpy.data.scenes}
+
+    def rebuild(self):
+        self.resolve_refs()
+        assets = bpy.context.window_manager.gp3d_assets
+        assets.asset_list.clear()
+        assets.group_list.clear()
+        self.clear()
+        for scene in bpy.data.scenes:
+            for obj in scene.objects:
+                for record in object_records(obj, scene):
+                    self.add_record(assets, obj, record)
+        self.object_names = set(bpy.data.objects.keys())
+        self.mesh_names = set(bpy.data.meshes.keys())
+        self.scenes = self.scene_signatures()
+        self.built = True
+
+        if len(assets.asset_list) > 0:
+            assets.index = 0
+        if len(assets.group_list) > 0:
+            assets.group_index = 0
+        # every instance needs its gp3d_name refreshed
+        return set(self.group_instances), set(self.records)
+
+    # brings the lists up to date with what changed since the last call.
+    # returns the group keys and object names whose records changed.
+    def reconcile(self):
+        if not self.built:
+            return self.rebuild()
+
+        dirty = self.dirty
+        self.dirty = set()
+
+        # added, removed and renamed objects
+        names = set(bpy.data.objects.keys())
+        removed = self.object_names - names
+        dirty |= names - self.object_names
+        self.object_names = names
+
+        # renamed or removed meshes invalidate the assets keyed by them
+        meshes = set(bpy.data.meshes.keys())
+        gone = self.mesh_names - meshes
+        self.mesh_names = meshes
+        if gone:
+            for name, records in self.records.items():
+                if any(r[0] in ('ASSET', 'ASSET_INSTANCE') and r[1] in gone
+                        for r in records):
+                    dirty.add(name)
+
+        # a scene whose type changed is re-read as a whole, otherwise only
+        # the objects linked to or unlinked from it
+        signatures = self.scene_signatures()
+        for name, (type_, objs) in signatures.items():
+            old = self.scenes.get(name, None)
+            if old is None or old[0] != type_:
+                dirty |= objs
+            elif old[1] != objs:
+                dirty |= objs ^ old[1]
+        for name in set(self.scenes) - set(signatures):
+            for obj_name, records in self.records.items():
+                if any(r[2] == name for r in records):
+                    dirty.add(obj_name)
+        self.scenes = signatures
+
+        assets = bpy.context.window_manager.gp3d_assets
+        changed_groups = set()
+        changed = set()
+        for name in removed | dirty:
+            obj = bpy.data.objects.get(name, None) if name not in removed else None
+            new = list()
+            if obj is not None:
+                for scene in obj.users_scene:
+                    new += object_records(obj, scene)
+            old = self.records.get(name, [])
+            if sorted(new) == sorted(old):
+                continue
+            changed.add(name)
+            for record in list(old):
+                self.remove_record(assets, name, record)
+                if record[0] == 'GROUP':
+                    changed_groups.add(record[1])
+            for record in new:
+                self.add_record(assets, obj, record)
+                if record[0] == 'GROUP':
+                    changed_groups.add(record[1])
+
+        assets.index = min(assets.index, len(assets.asset_list) - 1)
+        assets.group_index = min(assets.group_index, len(assets.group_list) - 1)
+        return changed_groups, changed
+
+    def add_record(self, assets, obj, record):
+        kind, key, scene = record
+        self.records.setdefault(obj.name, list()).append(record)
+        instances = self.instance_map(kind)
+        if instances is not None:
+            instances.setdefault(key, set()).add(obj.name)
+            return
+        collection = assets.asset_list if kind == 'ASSET' else assets.group_list
+        added = collection.add()
+        added.name = key
+        added.scene = scene
+        added.objname = obj.name
+
+    def remove_record(self, assets, obj_name, record):
+        kind, key, scene = record
+        records = self.records.get(obj_name, [])
+        if record in records:
+            records.remove(record)
+        if not records:
+            self.records.pop(obj_name, None)
+        instances = self.instance_map(kind)
+        if instances is not None:
+            names = instances.get(key, set())
+            names.discard(obj_name)
+            if not names:
+                instances.pop(key, None)
+            return
+        collection = assets.asset_list if kind == 'ASSET' else assets.group_list
+        index = find_item(collection, key, obj_name, scene)
+        if index >= 0:
+            collection.remove(index)
+
+    def instance_map(self, kind):
+        if kind == 'ASSET_INSTANCE':
+            return self.asset_instances
+        if kind == 'GROUP_INSTANCE':
+            return self.group_instances
+        return None
+
+    # names of the objects instancing an asset (mesh.name) or group (key),
+    # only as current as the last reconcile
+    def instances(self, key, is_group = False):
+        instances = self.group_instances if is_group else self.asset_instances
+        return instances.get(key, set())
+
+    def instance_count(self, key, is_group = False):
+        return len(self.instances(key, is_group))
+
+    def instances_of_groups(self, keys):
+        names = set()
+        for key in keys:
+            names |= self.group_instances.get(key, set())
+        return names
+
+
+registry = AssetRegistry()
+
+# marks the objects blender flagged as updated, which catches parenting
+# and data changes also made by scripts, drivers or undo; adds, removes
+# and renames are found by reconcile itself
+@persistent
+def on_scene_update(scene):
+    if basicprops.in_use and registry.built and bpy.data.objects.is_updated:
+        registry.mark(obj for obj in scene.objects
+                if obj.is_updated or obj.is_updated_data)
+
+@persistent
+def on_load(x):
+    registry.clear()
+    registry.unresolved = list()
+    registry.refs_pending = True
+
+def register():
+    bpy.app.handlers.scene_update_post.append(on_scene_update)
+    bpy.app.handlers.load_post.append(on_load)
+
+def unregister():
+    bpy.app.handlers.scene_update_post.remove(on_scene_update)
+    bpy.app.handlers.load_post.remove(on_load)
@@ -11,116 +11,215 @@
 # 3. This license clause must be left present in all files of this software.
 
 from .utils import *
+from .collisiongen import collision_shape
+from .ir import NodeIR, LightIR, CameraIR, SceneIR, dump
+from .emit import PoolWriter, write_scene
 import os
 import bpy 
 from mathutils import *
 from math import *
 
-class SceneGen:
+def by_name(objs):
+    return sorted(objs, key = lambda obj: obj.name)
+
+# Reads blender scenes into SceneIR, emit.py formats and writes them
+class SceneGen(PoolWriter):
     filepath = None
-    str_scene = None
+    compact = False # omit default-valued properties and indentation
+    collisiongen = None
+    gen_index = False # write a .index file next to each .scene file
+    dedup = None # MeshDedup, duplicate meshes point at the canonical asset
+    prefabs = False # reference asset group prefabs instead of expanding them
+    prefabpath = None
+    irpath = None # dump the IR of every scene as json here when set
+    deferred = None # [(SceneIR, folder)] held back until flush() when set
+    references = None # {(asset scene, asset object): [scene names]} of gpb urls
     lights = None
     cameras = None
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, compact = False, collisiongen = None,
+            gen_index = False, prefabs = False):
         self.filepath = cross_mkdir(os.path.join(filepath, "scenes"))
+        self.prefabpath = os.path.join(filepath, "prefabs")
+        self.compact = compact
+        self.collisiongen = collisiongen
+        self.gen_index = gen_index
+        self.prefabs = prefabs
+        self.references = dict()
+
+    # prefab is True for ASSET_GROUP scenes, each group root is written once
+    # to prefabs/<scene>.scene without its own transform
+    def export(self, scene, prefab = False):
+        ir = self.extract(scene, prefab)
+        self.add_references(ir.name, ir.nodes)
+        folder = cross_mkdir(self.prefabpath) if prefab else self.filepath
+        if self.deferred is not None:
+            self.deferred.append((ir, folder))
+        else:
+            self.write(ir, folder)
+        if self.collisiongen:
+            self.collisiongen.write(scene)
+
+    def add_references(self, scene_name, nodes):
+        for node in nodes:
+            if node.mesh and not node.prefab:
+                users = self.references.setdefault(tuple(node.mesh), [])
+                if scene_name not in users:
+                    users.append(scene_name)
+            self.add_references(scene_name, node.children)
+
+    # write the deferred scenes with their materials pointing at the
+    # MaterialLibrary entries
+    def flush(self, library):
+        for ir, folder in self.deferred or []:
+            for node in ir.nodes:
+                self.relink(node, library)
+            self.write(ir, folder)
+        self.deferred = None
+
+    # the dumped IR is what is written, regenerating it gives the same file
+    def write(self, ir, folder):
+        if self.irpath:
+            dump(ir, os.path.join(self.irpath, ir.name + ".scene.json"))
+        self.submit(write_scene, ir, folder, self.compact, self.gen_index)
+
+    def relink(self, node, library):
+        if node.material:
+            node.material = library.lookup(node.material)
+        for child in node.children:
+            self.relink(child, library)
 
-    def export(self, scene):
-        self.str_scene = "scene {0} {{\n".format(scene.name)
-        if scene.world:
+    def extract(self, scene, prefab = False):
+        ir = SceneIR(name = scene.name, prefab = prefab)
+        if scene.world and not prefab:
             ambient = scene.world.ambient_color
-            self.str_scene += "\tambientColor = {0}, {1}, {2}\n"\
-                    .format(deci(ambient.r), deci(ambient.g), deci(ambient.b))
-        if scene.camera:
-            self.str_scene += "\tactiveCamera = {0}\n".format(scene.camera.name)
-
-        self.lights = {} # {light.name: str_light}
-        self.cameras = {} # {camera.name: str_camera}
-
-        for obj in scene.objects:
-            if obj.parent is None:
-                temp = self.to_prop(scene, 1, obj) 
-                if temp is not None:
-                    self.str_scene += temp
-
-        self.str_scene += "}\n"
-        scenefile = os.path.join(self.filepath, scene.name + ".scene")
-        self.write(self.str_scene, scenefile)
+            ir.ambient = (ambient.r, ambient.g, ambient.b)
+        if scene.camera and not prefab:
+            ir.camera = scene.camera.name
+
+        self.lights = {} # {light.name: LightIR}
+        self.cameras = {} # {camera.name: CameraIR}
+        if self.collisiongen:
+            self.collisiongen.begin()
+
+        # everything is written sorted by name, scene.objects and children
+        # order changes with how objects were linked
+        roots = self.group_roots(scene) if prefab else set()
+        ir.nodes = [self.to_node(scene, obj, obj.name in roots)
+                for obj in by_name(scene.objects) if obj.parent is None]
+        ir.lights = [self.lights[name] for name in sorted(self.lights)]
+        ir.cameras = [self.cameras[name] for name in sorted(self.cameras)]
+        return ir
+
+    # names of the asset group roots in an ASSET_GROUP scene
+    def group_roots(self, scene):
+        groups = bpy.context.window_manager.gp3d_assets.group_list
+        return set(group.objname for group in groups.values()
+                if group.scene == scene.name)
+
+    # children parented to a group instance after it was placed, the copies
+    # of the group root's children are in the prefab already
+    def extra_children(self, node, group):
+        source = bpy.data.objects.get(group.objname, None)
+        copies = list(source.children) if source else []
+        extra = list()
+        for child in by_name(node.children):
+            match = None
+            for copy in copies:
+                if copy.type == child.type and copy.data == child.data and\
+                        (copy.data is not None or
+                                no_suffix(copy.name) == no_suffix(child.name)):
+                    match = copy
+                    break
+            if match is None:
+                extra.append(child)
+            else:
+                copies.remove(match)
+        return extra
 
-    def to_prop(self, scene, tab_num, node):
-        tabs_lvl1 = tabs(tab_num)
-        tabs_lvl2 = tabs(tab_num + 1)
-        tabs_lvl3 = tabs(tab_num + 2)
+    # the asset group a group instance should reference as a prefab
+    def prefab_group(self, node):
+        src_id = node.get('gp3d_id', None) if self.prefabs else None
+        if src_id:
+            return bpy.context.window_manager.gp3d_assets.group_list.get(src_id, None)
+        return None
 
+    def to_node(self, scene, node, prefab_root = False):
         suffix = get_suffix(node.name)
         name = no_suffix(node.name) if suffix and suffix.group(0) == ".001"\
                 else node.name
-        str_node = "{1}node {0}{{\n".format(name, tabs_lvl1)
-        if node.type == 'MESH':
-            # url
-            source = bpy.context.window_manager.gp3d_assets.asset_list[node.data.name]
-            str_node += "{2}url = res/gpb/{0}.gpb#{1}\n"\
-                    .format(source.scene, source.objname, tabs_lvl2)
-
+        ir = NodeIR(name = name, type = node.type, tags = node.gp3d_tags.split(),
+                hide = node.hide, children = [])
+        group = self.prefab_group(node)
+        if group:
+            ir.prefab = (group.scene, group.objname)
+        elif node.type == 'MESH':
+            data_name = self.dedup.resolve(node.data.name) if self.dedup else node.data.name
+            source = bpy.context.window_manager.gp3d_assets.asset_list[data_name]
             # material - use the first in list
             mat = node.material_slots[0]
+            ir.mesh = (source.scene, source.objname)
             if mat is not None:
-                str_node += "{2}material = res/materials/{0}.material#{1}\n"\
-                        .format(source.scene, mat.name.replace('.', '_'), tabs_lvl2)
+                ir.material = (source.scene, mat.name.replace('.', '_'))
+
+            # collision object chosen by tag
+            shape = collision_shape(node.gp3d_tags) if self.collisiongen else None
+            if shape:
+                url, bounds = self.collisiongen.reference(scene, node.data, shape)
+                ir.collision = (shape, url, bounds.obb_center, bounds.obb_axis,
+                        bounds.obb_angle)
 
-        # light
         if node.type == 'LAMP':
-            data = node.data
-            if data.name not in self.lights:
-                str_light = "light {0} {{\n".format(data.name)
-                _type = data.type
-                if _type == 'SUN':
-                    _type = 'DIRECTIONAL'
-                str_light += "\ttype = {0}\n".format(_type)
-                color = data.color
-                str_light += "\tcolor = {0}, {1}, {2}\n".format(deci(color.r), 
-                        deci(color.g), deci(color.b))
-
-                if data.type == 'SPOT' or data.type == 'POINT':
-                    str_light += "\trange = {0}\n".format(data.distance)
-                    if data.type == 'SPOT':
-                        str_light += "\tinnerAngle = 1.0\n"
-                        str_light += "\touterAngle = {0}\n".format(deci(data.spot_size))
-                str_light += "}\n"
-                self.lights[data.name] = str_light
-            str_node += "{2}light = res/scenes/{0}.scene#{1}\n"\
-                    .format(scene.name, data.name, tabs_lvl2)
-
-        # camera
+            ir.light = node.data.name
+            if node.data.name not in self.lights:
+                self.lights[node.data.name] = self.to_light(node.data)
+
         if node.type == 'CAMERA':
-            data = node.data
-            if data.name not in self.cameras:
-                str_camera = "camera {0} {{\n".format(data.name)
-                if data.type == 'PERSP':
-                    str_camera += "\ttype = PERSPECTIVE\n"
-                    render = scene.render
-                    aspect_ratio = (render.resolution_x * render.pixel_aspect_x) \
-                            / (render.resolution_y * render.pixel_aspect_y)
-                    data.lens_unit = 'FOV'
-                    str_camera += "\tfieldOfView = {0}\n"\
-                            .format(deci(degrees(atan(tan(data.angle / 2) \
-                                / aspect_ratio) * 2)))
-                elif data.type == 'ORTHO':
-                    str_camera += "\ttype = ORTHOGRAPHIC\n"
-                    str_camera += "\tzoomX = {0}\n".format(deci(data.ortho_scale))
-                    str_camera += "\tzoomY = {0}\n"\
-                            .format(deci(scene.render.resolution_y * 
-                                    data.ortho_scale / scene.render.resolution_x))
-
-                str_camera += "\tnearPlane = {0}\n".format(deci(data.clip_start))
-                str_camera += "\tfarPlane = {0}\n".format(deci(data.clip_end))
-                str_camera += "}\n"
-                self.cameras[data.name] = str_camera
-
-            str_node += "{2}camera = res/scenes/{0}.scene#{1}\n"\
-                    .format(scene.name, data.name, tabs_lvl2)
-
-        # transformation
+            ir.camera = node.data.name
+            if node.data.name not in self.cameras:
+                self.cameras[node.data.name] = self.to_camera(scene, node.data)
+
+        # transformation, a prefab's root takes the instance's transform
+        if not prefab_root:
+            ir.translate, ir.axis, ir.angle, ir.scale = self.transform(node)
+
+        # a prefab reference brings its own children, only the ones added to
+        # the instance are written under it
+        children = by_name(node.children) if group is None else\
+                self.extra_children(node, group)
+        ir.children = [self.to_node(scene, child) for child in children]
+        return ir
+
+    def to_light(self, data):
+        _type = data.type
+        if _type == 'SUN':
+            _type = 'DIRECTIONAL'
+        light = LightIR(name = data.name, type = _type,
+                color = (data.color.r, data.color.g, data.color.b))
+        if data.type == 'SPOT' or data.type == 'POINT':
+            light.distance = data.distance
+            if data.type == 'SPOT':
+                light.spot_size = data.spot_size
+        return light
+
+    def to_camera(self, scene, data):
+        camera = CameraIR(name = data.name, near = data.clip_start,
+                far = data.clip_end)
+        if data.type == 'PERSP':
+            camera.type = 'PERSPECTIVE'
+            render = scene.render
+            aspect_ratio = (render.resolution_x * render.pixel_aspect_x) \
+                    / (render.resolution_y * render.pixel_aspect_y)
+            data.lens_unit = 'FOV'
+            camera.fov = degrees(atan(tan(data.angle / 2) / aspect_ratio) * 2)
+        elif data.type == 'ORTHO':
+            camera.type = 'ORTHOGRAPHIC'
+            camera.zoom = (data.ortho_scale, scene.render.resolution_y *
+                    data.ortho_scale / scene.render.resolution_x)
+        return camera
+
+    # (translate, axis, angle, scale) in gameplay3d's orientation
+    def transform(self, node):
         if armature_parent_or_none(node):
             # rotate to match gameplay3d's orientation
             if node.type == 'CAMERA' or node.type == 'LAMP':
@@ -130,50 +229,10 @@ class SceneGen:
             dec = trans.decompose()
         else:
             dec = node.matrix_local.decompose()
-            
-        # locate
-        loc = dec[0]
-        str_node += "{3}translate = {0}, {1}, {2}\n"\
-                .format(deci(loc.x), deci(loc.z), deci(loc.y * -1), tabs_lvl2)
 
-        # rotate
+        loc = dec[0]
         pair = dec[1].to_axis_angle()
         axis = pair[0]
-        angle = degrees(pair[1])
-        str_node += "{4}rotate = {0}, {1}, {2}, {3}\n"\
-                .format(deci(axis.x), deci(axis.z), deci(axis.y * -1) , deci(angle),
-                        tabs_lvl2)
-        # scale
         scale = dec[2]
-        str_node += "{3}scale = {0}, {1}, {2}\n".format(deci(scale.x), 
-                deci(scale.z), deci(scale.y), tabs_lvl2)
-
-        # enable
-        if not node.hide:
-            temp = "{1}enabled = {0}\n".format(not node.hide, tabs_lvl2)
-            str_node += temp.lower()
-
-        # tags
-        if len(node.gp3d_tags) > 0:
-            tags = node.gp3d_tags.split()
-            str_tags = "{0}tags {{\n".format(tabs_lvl2)
-            for tag in tags:
-                str_tags += "{1}{0}\n".format(tag, tabs_lvl3)
-            str_tags += "{0}}}\n".format(tabs_lvl2)
-            str_node += str_tags
-
-        for child in node.children:
-            str_node += self.to_prop(scene, tab_num + 1, child)
-        str_node += "{0}}}\n".format(tabs_lvl1)
-        return str_node
-
-    # write files
-    def write(self, data, scenefile):
-        for light in self.lights.values():
-            data += light
-        for camera in self.cameras.values():
-            data += camera
-
-        f = open(scenefile, 'w', encoding = 'utf-8')
-        f.write(data)
-        f.close()
+        return ((loc.x, loc.z, loc.y * -1), (axis.x, axis.z, axis.y * -1),
+                degrees(pair[1]), (scale.x, scale.z, scale.y))
@@ -0,0 +1,212 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Sidecar .index file written next to each .scene file so the game can find
+# nodes by name and by tag without walking the scene.
+#
+# Little endian, every section 4 byte aligned so the file can be mapped
+# and used in place:
+#
+#   header      HEADER
+#   nodes       node_count * NODE     (name, path, parent index or -1)
+#   tags        tag_count * TAG       (tag, first member, member count)
+#   members     u32 node indices, grouped by tag
+#   node hash   u32 buckets, node index + 1 or 0 when empty
+#   tag hash    u32 buckets, tag index + 1 or 0 when empty
+#   strings     utf-8, NUL terminated, referenced by byte offset
+#
+# Hash tables use 32 bit FNV-1a of the utf-8 name and linear probing over a
+# power of two bucket count. scene_hash is the sha1 of the .scene file the
+# index was generated with.
+
+import struct
+import hashlib
+from .sceneprops import parse
+
+MAGIC = b'GP3DIDX\0'
+VERSION = 1
+HEADER = struct.Struct('<8sI20s10I')
+NODE = struct.Struct('<IIi')
+TAG = struct.Struct('<III')
+U32 = struct.Struct('<I')
+
+def fnv1a(data):
+    h = 0x811c9dc5
+    for byte in data:
+        h = ((h ^ byte) * 0x01000193) & 0xffffffff
+    return h
+
+def bucket_count(num):
+    count = 1
+    while count < num * 2:
+        count *= 2
+    return count
+
+def hash_table(names):
+    buckets = [0] * bucket_count(len(names))
+    mask = len(buckets) - 1
+    for index, name in enumerate(names):
+        slot = fnv1a(name.encode('utf-8')) & mask
+        while buckets[slot]:
+            slot = (slot + 1) & mask
+        buckets[slot] = index + 1
+    return buckets
+
+class SceneIndex:
+    nodes = None # [(name, path, parent)]
+    tags = None # {tag: [node index]}
+
+    def __init__(self):
+        self.nodes = list()
+        self.tags = dict()
+
+    # returns the index of the added node
+    def add_node(self, name, parent, tags = ()):
+        path = name if parent < 0 else self.nodes[parent][1] + "/" + name
+        self.nodes.append((name, path, parent))
+        index = len(self.nodes) - 1
+        for tag in tags:
+            self.tags.setdefault(tag, list()).append(index)
+        return index
+
+    def pack(self, scene_data):
+        strings = bytearray()
+        offsets = dict()
+        def string(value):
+            if value not in offsets:
+                offsets[value] = len(strings)
+                strings.extend(value.encode('utf-8') + b'\0')
+            return offsets[value]
+
+        tag_names = sorted(self.tags)
+        node_data = b''.join(NODE.pack(string(name), string(path), parent)
+                for name, path, parent in self.nodes)
+        tag_data = bytearray()
+        members = list()
+        for tag in tag_names:
+            tag_data += TAG.pack(string(tag), len(members), len(self.tags[tag]))
+            members += self.tags[tag]
+        node_buckets = hash_table([node[0] for node in self.nodes])
+        tag_buckets = hash_table(tag_names)
+        while len(strings) % 4:
+            strings.append(0)
+
+        offset = HEADER.size
+        node_offset = offset
+        offset += len(node_data)
+        tag_offset = offset
+        offset += len(tag_data)
+        member_offset = offset
+        offset += 4 * len(members)
+        node_bucket_offset = offset
+        offset += 4 * len(node_buckets)
+        tag_bucket_offset = offset
+        offset += 4 * len(tag_buckets)
+        string_offset = offset
+
+        header = HEADER.pack(MAGIC, VERSION, hashlib.sha1(scene_data).digest(),
+                len(self.nodes), node_offset, len(tag_names), tag_offset,
+                member_offset, len(node_buckets), node_bucket_offset,
+                len(tag_buckets), tag_bucket_offset, string_offset)
+        u32s = lambda values: struct.pack('<{0}I'.format(len(values)), *values)
+        return b''.join((header, node_data, bytes(tag_data), u32s(members),
+            u32s(node_buckets), u32s(tag_buckets), bytes(strings)))
+
+
+class IndexReader:
+    data = None
+    scene_hash = None
+    node_count = 0
+    tag_count = 0
+
+    def __init__(self, data):
+        fields = HEADER.unpack_from(data, 0)
+        if fields[0] != MAGIC or fields[1] != VERSION:
+            raise ValueError("Not a gameplay3d scene index")
+        self.data = data
+        self.scene_hash = fields[2]
+        (self.node_count, self.node_offset, self.tag_count, self.tag_offset,
+                self.member_offset, self.node_buckets, self.node_bucket_offset,
+                self.tag_buckets, self.tag_bucket_offset,
+                self.string_offset) = fields[3:]
+
+    def string(self, offset):
+        start = self.string_offset + offset
+        end = self.data.index(b'\0', start)
+        return bytes(self.data[start:end]).decode('utf-8')
+
+    def node(self, index):
+        name, path, parent = NODE.unpack_from(self.data,
+                self.node_offset + index * NODE.size)
+        return self.string(name), self.string(path), parent
+
+    def tag(self, index):
+        name, first, count = TAG.unpack_from(self.data,
+                self.tag_offset + index * TAG.size)
+        members = struct.unpack_from('<{0}I'.format(count), self.data,
+                self.member_offset + first * 4)
+        return self.string(name), list(members)
+
+    def lookup(self, name, buckets, bucket_offset, get):
+        mask = buckets - 1
+        slot = fnv1a(name.encode('utf-8')) & mask
+        while True:
+            entry = U32.unpack_from(self.data, bucket_offset + slot * 4)[0]
+            if entry == 0:
+                return None
+            if get(entry - 1)[0] == name:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    # first node with this name in document order
+    def find_node(self, name):
+        return self.lookup(name, self.node_buckets, self.node_bucket_offset, self.node)
+
+    # node indices tagged with this tag
+    def find_tag(self, tag):
+        index = self.lookup(tag, self.tag_buckets, self.tag_bucket_offset, self.tag)
+        return [] if index is None else self.tag(index)[1]
+
+
+# check that an index matches the .scene text it was generated with.
+# returns a list of errors, an empty list means the index is consistent.
+def validate(index_data, scene_text):
+    errors = list()
+    reader = IndexReader(index_data)
+    if reader.scene_hash != hashlib.sha1(scene_text.encode('utf-8')).digest():
+        errors.append("scene hash does not match")
+
+    expected = SceneIndex()
+    for scene in parse(scene_text).children("scene"):
+        stack = [(node, -1) for node in reversed(scene.children("node"))]
+        while stack:
+            node, parent = stack.pop()
+            tags = node.find("tags")
+            tags = [key for key, value in tags.properties] if tags else ()
+            index = expected.add_node(node.id, parent, tags)
+            stack += [(child, index) for child in reversed(node.children("node"))]
+
+    if reader.node_count != len(expected.nodes):
+        errors.append("index has {0} nodes, scene has {1}"
+                .format(reader.node_count, len(expected.nodes)))
+    for index in range(min(reader.node_count, len(expected.nodes))):
+        if reader.node(index) != expected.nodes[index]:
+            errors.append("node {0}: {1} != {2}".format(index, reader.node(index),
+                expected.nodes[index]))
+    found = dict(reader.tag(index) for index in range(reader.tag_count))
+    if found != expected.tags:
+        errors.append("tags differ: {0} != {1}".format(found, expected.tags))
+
+    for index, node in enumerate(expected.nodes):
+        found = reader.find_node(node[0])
+        if found is None or reader.node(found)[0] != node[0]:
+            errors.append("node lookup failed for {0}".format(node[0]))
+    for tag, members in expected.tags.items():
+        if reader.find_tag(tag) != members:
+            errors.append("tag lookup failed for {0}".format(tag))
+    return errors
@@ -0,0 +1,186 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Minimal reader for gameplay3d Properties files (.scene, .material, ...).
+# Does not depend on bpy so it can be used by command line tools.
+
+import math
+
+class Namespace:
+    namespace = None
+    id = None
+    parent = None
+    properties = None # [(name, value)]
+    namespaces = None # [Namespace]
+
+    def __init__(self, namespace, id = None, parent = None):
+        self.namespace = namespace
+        self.id = id
+        self.parent = parent
+        self.properties = list()
+        self.namespaces = list()
+
+    def get(self, name, default = None):
+        for key, value in self.properties:
+            if key == name:
+                return value
+        return default
+
+    def find(self, namespace, id = None):
+        for child in self.namespaces:
+            if child.namespace == namespace and (id is None or child.id == id):
+                return child
+        return None
+
+    def children(self, namespace):
+        return [child for child in self.namespaces if child.namespace == namespace]
+
+    def header(self):
+        header = self.namespace
+        if self.id:
+            header += " " + self.id
+        if self.parent:
+            header += " : " + self.parent
+        return header
+
+    def serialize(self, tab_num = 0, compact = False):
+        indent = "" if compact else '\t' * tab_num
+        inner = "" if compact else '\t' * (tab_num + 1)
+        result = "{0}{1} {{\n".format(indent, self.header())
+        for key, value in self.properties:
+            if value:
+                result += "{0}{1} = {2}\n".format(inner, key, value)
+            else:
+                result += "{0}{1}\n".format(inner, key)
+        for child in self.namespaces:
+            result += child.serialize(tab_num + 1, compact)
+        result += "{0}}}\n".format(indent)
+        return result
+
+
+def strip_comments(text):
+    result = ""
+    index = 0
+    while index < len(text):
+        if text.startswith("/*", index):
+            end = text.find("*/", index + 2)
+            index = len(text) if end < 0 else end + 2
+        elif text.startswith("//", index):
+            end = text.find("\n", index)
+            index = len(text) if end < 0 else end
+        else:
+            result += text[index]
+            index += 1
+    return result
+
+def parse_header(line):
+    parent = None
+    if ':' in line:
+        line, parent = line.split(':', 1)
+        parent = parent.strip() or None
+    words = line.split()
+    namespace = words[0] if words else ""
+    id = words[1] if len(words) > 1 else None
+    return Namespace(namespace, id, parent)
+
+# returns a root Namespace whose children are the top level namespaces
+def parse(text):
+    root = Namespace("")
+    stack = [root]
+    pending = None # header waiting for a '{' on the next line
+    for line in strip_comments(text).splitlines():
+        line = line.strip()
+        while line:
+            if pending is not None:
+                if line.startswith('{'):
+                    stack[-1].namespaces.append(pending)
+                    stack.append(pending)
+                    line = line[1:].strip()
+                    pending = None
+                    continue
+                # not a namespace after all, keep as a bare property
+                stack[-1].properties.append((pending.header(), ""))
+                pending = None
+            if line.startswith('}'):
+                if len(stack) > 1:
+                    stack.pop()
+                line = line[1:].strip()
+            elif line.endswith('{') and '=' not in line:
+                space = parse_header(line[:-1])
+                stack[-1].namespaces.append(space)
+                stack.append(space)
+                line = ""
+            elif '=' in line:
+                key, value = line.split('=', 1)
+                stack[-1].properties.append((key.strip(), value.strip()))
+                line = ""
+            elif ' ' in line or '\t' in line or ':' in line:
+                pending = parse_header(line)
+                line = ""
+            else:
+                # a lone word is either a namespace or a bare value (tags)
+                pending = Namespace(line)
+                line = ""
+    if pending is not None:
+        stack[-1].properties.append((pending.header(), ""))
+    return root
+
+
+# default transforms of a gameplay3d node
+TRANSLATE_DEFAULT = (0.0, 0.0, 0.0)
+ROTATE_DEFAULT = (0.0, 0.0, 1.0, 0.0)
+SCALE_DEFAULT = (1.0, 1.0, 1.0)
+
+def to_floats(value, default):
+    if value is None:
+        return default
+    return tuple(float(v) for v in value.split(','))
+
+def node_transforms(node):
+    return (to_floats(node.get("translate"), TRANSLATE_DEFAULT),
+            to_floats(node.get("rotate"), ROTATE_DEFAULT),
+            to_floats(node.get("scale"), SCALE_DEFAULT))
+
+# {node path: (translate, rotate, scale)} for every node of every scene
+def collect_transforms(text):
+    result = dict()
+    stack = [(space, space.id) for space in parse(text).children("scene")]
+    while stack:
+        space, path = stack.pop()
+        for node in space.children("node"):
+            node_path = "{0}/{1}".format(path, node.id)
+            result[node_path] = node_transforms(node)
+            stack.append((node, node_path))
+    return result
+
+def same_rotation(a, b, tolerance):
+    # a zero angle is the identity whatever the axis
+    if abs(a[3]) <= tolerance and abs(b[3]) <= tolerance:
+        return True
+    return all(abs(x - y) <= tolerance for x, y in zip(a, b))
+
+# compare node transforms of two .scene files, e.g. compact and verbose output.
+# returns a list of differences, an empty list means both load the same.
+def compare_transforms(text_a, text_b, tolerance = 0.005):
+    nodes_a = collect_transforms(text_a)
+    nodes_b = collect_transforms(text_b)
+    diffs = list()
+    for path in sorted(set(nodes_a) ^ set(nodes_b)):
+        diffs.append("{0}: node only in one file".format(path))
+    for path in sorted(set(nodes_a) & set(nodes_b)):
+        trans_a, rot_a, scale_a = nodes_a[path]
+        trans_b, rot_b, scale_b = nodes_b[path]
+        if not all(math.isclose(x, y, abs_tol = tolerance)
+                for x, y in zip(trans_a, trans_b)):
+            diffs.append("{0}: translate {1} != {2}".format(path, trans_a, trans_b))
+        if not same_rotation(rot_a, rot_b, tolerance):
+            diffs.append("{0}: rotate {1} != {2}".format(path, rot_a, rot_b))
+        if not all(math.isclose(x, y, abs_tol = tolerance)
+                for x, y in zip(scale_a, scale_b)):
+            diffs.append("{0}: scale {1} != {2}".format(path, scale_a, scale_b))
+    return diffs
@@ -0,0 +1,65 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Which scenes a partial export writes. Scenes can be named directly, or
+# picked through objects (tagged or selected): each object brings its own
+# scenes, the ASSETS scene of its mesh and, for a group instance, the group
+# scene and whatever the group root instances in turn.
+
+import bpy
+
+# scene names are comma separated, they may contain spaces
+def parse_names(text):
+    return [name.strip() for name in text.split(',') if name.strip()]
+
+def tagged_objects(tags):
+    tags = set(tags)
+    return [obj for obj in bpy.data.objects if tags & set(obj.gp3d_tags.split())]
+
+class ExportFilter:
+    scenes = None # names of the scenes to export
+    missing = None # requested scene names that don't exist
+
+    def __init__(self):
+        self.scenes = set()
+        self.missing = list()
+
+    def includes(self, scene):
+        return scene.name in self.scenes
+
+    def add_scenes(self, names):
+        for name in names:
+            if name in bpy.data.scenes:
+                self.scenes.add(name)
+            else:
+                self.missing.append(name)
+
+    # assets is window_manager.gp3d_assets, dedup maps duplicate meshes to
+    # the one that is exported
+    def add_objects(self, objs, assets, dedup = None):
+        pending = list(objs)
+        seen = set()
+        while pending:
+            obj = pending.pop()
+            if obj.name in seen:
+                continue
+            seen.add(obj.name)
+            for scene in obj.users_scene:
+                self.scenes.add(scene.name)
+            if obj.type == 'MESH':
+                name = dedup.resolve(obj.data.name) if dedup else obj.data.name
+                asset = assets.asset_list.get(name, None)
+                if asset:
+                    self.scenes.add(asset.scene)
+            src_id = obj.get('gp3d_id', None)
+            group = assets.group_list.get(src_id, None) if src_id else None
+            if group:
+                root = bpy.data.objects.get(group.objname, None)
+                if root:
+                    pending.append(root)
+            pending += obj.children
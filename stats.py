@@ -0,0 +1,142 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Optional timing and memory instrumentation of an export, written as
+# export_report.json next to the outputs. A disabled ExportStats hands out
+# a shared no-op stage so instrumented code costs nothing.
+
+import os
+import json
+import time
+import tracemalloc
+
+class NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+NULL_STAGE = NullStage()
+
+# tracemalloc.reset_peak is new in python 3.9, blender 2.7x has 3.4/3.5.
+# Without it the peak is the highest since tracing started, which says
+# nothing about a single stage, so only the memory growth is reported.
+PER_STAGE_PEAK = hasattr(tracemalloc, 'reset_peak')
+
+class Stage:
+    stats = None
+    name = None
+    scene = None
+    wall = 0.0
+    cpu = 0.0
+    start_memory = 0 # traced memory when the stage began
+    peak = 0 # highest traced memory during the stage, with PER_STAGE_PEAK
+
+    def __init__(self, stats, name, scene):
+        self.stats = stats
+        self.name = name
+        self.scene = scene
+        self.peak = 0
+
+    def __enter__(self):
+        stack = self.stats.stack
+        if self.stats.tracing:
+            if PER_STAGE_PEAK:
+                # keep the parent's peak so far before restarting the count
+                if stack:
+                    stack[-1].peak = max(stack[-1].peak,
+                            tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+            self.start_memory = tracemalloc.get_traced_memory()[0]
+        stack.append(self)
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *args):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        stack = self.stats.stack
+        stack.pop()
+        growth = None
+        peak = None
+        if self.stats.tracing:
+            current, traced_peak = tracemalloc.get_traced_memory()
+            growth = current - self.start_memory
+            if PER_STAGE_PEAK:
+                self.peak = max(self.peak, traced_peak)
+                if stack:
+                    stack[-1].peak = max(stack[-1].peak, self.peak)
+                peak = self.peak - self.start_memory
+        self.stats.stages.append({
+            'stage': self.name,
+            'scene': self.scene,
+            'depth': len(stack),
+            'wall_time': round(wall, 6),
+            'cpu_time': round(cpu, 6),
+            'memory_growth': growth,
+            'peak_memory': peak,
+            })
+        return False
+
+class ExportStats:
+    enabled = False
+    tracing = False # tracemalloc was started by us
+    stack = None
+    stages = None # [{stage, scene, depth, wall_time, cpu_time, memory_growth,
+                  #   peak_memory}], peak_memory above the stage's start or None
+    sections = None # {section: {key: value}}, e.g. encoder output per scene
+
+    def __init__(self, enabled = False):
+        self.enabled = enabled
+        self.stack = list()
+        self.stages = list()
+        self.sections = dict()
+
+    def start(self):
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.tracing = True
+
+    def stop(self):
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+    def stage(self, name, scene = None):
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name, scene)
+
+    def add(self, section, key, value):
+        if self.enabled:
+            self.sections.setdefault(section, dict())[key] = value
+
+    # stages and sections of a report written by a worker process
+    def merge(self, data):
+        if self.enabled:
+            self.stages += data.get('stages', [])
+            for section, values in data.get('sections', {}).items():
+                self.sections.setdefault(section, dict()).update(values)
+
+    def to_dict(self):
+        return {'stages': self.stages, 'sections': self.sections}
+
+    def write(self, filepath, name = "export_report.json"):
+        if not self.enabled:
+            return None
+        reportfile = os.path.join(filepath, name)
+        f = open(reportfile, 'w', encoding = 'utf-8')
+        json.dump(self.to_dict(), f, indent = 1, sort_keys = True)
+        f.close()
+        return reportfile
+
+
+# stats used when the caller doesn't pass any
+NULL_STATS = ExportStats(False)
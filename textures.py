@@ -0,0 +1,252 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Collects the images the samplers of the encoder's .material files point
+# at. Each image is copied once to textures/<hash>.<ext>, so the same image
+# under two names ships once (the manifest lists the names), and the sampler
+# paths are rewritten to res/textures/. For each profile a downscaled copy goes to
+# textures/<profile>/ under the same name, a package for that platform maps
+# the folder to res/textures.
+#
+# textures/manifest.json records the hash and profile settings of every
+# file, images that match it are not converted again. Converting needs
+# bpy, it runs in this blender or in background blender processes.
+
+import os
+import re
+import sys
+import json
+import subprocess
+from .output import file_digest, write_file, write_text, commit_file, temp_path
+
+# name: (longest side, round sizes down to powers of two)
+PROFILES = {
+    'desktop': (2048, False),
+    'mobile': (1024, True),
+    'low': (512, True),
+}
+MANIFEST = "manifest.json"
+URL_DIR = "res/textures/"
+PATH_LINE = re.compile(r'^([ \t]*path[ \t]*=[ \t]*)(.*?)[ \t]*$', re.M)
+
+def pot_floor(size):
+    return 1 << (size.bit_length() - 1)
+
+def scaled_size(width, height, max_size, pot):
+    scale = min(1.0, max_size / max(width, height, 1))
+    width = max(1, int(round(width * scale)))
+    height = max(1, int(round(height * scale)))
+    if pot:
+        width, height = pot_floor(width), pot_floor(height)
+    return width, height
+
+# needs bpy, returns True when target changed
+def convert(source, target, max_size, pot):
+    import bpy
+    image = bpy.data.images.load(source)
+    try:
+        size = scaled_size(image.size[0], image.size[1], max_size, pot)
+        if size == tuple(image.size):
+            f = open(source, 'rb')
+            data = f.read()
+            f.close()
+            return write_file(target, data)
+        image.scale(size[0], size[1])
+        temp = temp_path(target)
+        image.filepath_raw = temp
+        image.save()
+        return commit_file(temp, target)
+    finally:
+        bpy.data.images.remove(image)
+
+class TextureStage:
+    filepath = None # textures folder
+    search = None # folders relative sampler paths are looked up in
+    profiles = None # names of PROFILES
+    hashes = None # {source path: hex digest}
+    jobs = None # {texture name: [source paths]}
+    missing = None # sampler paths no image was found for
+    changed = None
+    partial = False # not every scene exported, keep the other manifest entries
+
+    def __init__(self, filepath, search = (), profiles = ()):
+        self.filepath = os.path.join(filepath, 'textures')
+        os.makedirs(self.filepath, exist_ok = True)
+        self.search = list(search)
+        self.profiles = [name for name in profiles if name in PROFILES]
+        self.hashes = dict()
+        self.jobs = dict()
+        self.missing = set()
+        self.changed = list()
+
+    def resolve(self, path, folder):
+        path = path.strip('"')
+        if os.path.isabs(path):
+            return path if os.path.isfile(path) else None
+        for base in [folder] + self.search:
+            source = os.path.normpath(os.path.join(base, path))
+            if os.path.isfile(source):
+                return source
+        return None
+
+    def digest(self, source):
+        digest = self.hashes.get(source, None)
+        if digest is None:
+            digest = file_digest(source).hex()
+            self.hashes[source] = digest
+        return digest
+
+    # named by content only, worker processes agree on it without talking
+    def texture_name(self, source):
+        ext = os.path.splitext(source)[1].lower()
+        return self.digest(source)[:16] + ext
+
+    # points the sampler paths of a .material file at res/textures
+    def rewrite(self, matfile):
+        if not os.path.exists(matfile):
+            return
+        folder = os.path.dirname(matfile)
+        f = open(matfile, encoding = 'utf-8')
+        text = f.read()
+        f.close()
+
+        def replace(match):
+            path = match.group(2)
+            if path.startswith(URL_DIR):
+                return match.group(0)
+            source = self.resolve(path, folder)
+            if source is None:
+                self.missing.add(path)
+                return match.group(0)
+            name = self.texture_name(source)
+            sources = self.jobs.setdefault(name, [])
+            if source not in sources:
+                sources.append(source)
+            return match.group(1) + URL_DIR + name
+
+        new_text = PATH_LINE.sub(replace, text)
+        if new_text != text:
+            write_text(matfile, new_text)
+
+    # jobs of a worker process, see worker.py
+    def save_jobs(self, jobfile):
+        f = open(jobfile, 'w', encoding = 'utf-8')
+        json.dump({'jobs': self.jobs, 'missing': sorted(self.missing)}, f)
+        f.close()
+
+    def merge(self, data):
+        for name, sources in data['jobs'].items():
+            known = self.jobs.setdefault(name, [])
+            known += [source for source in sources if source not in known]
+        self.missing.update(data['missing'])
+
+    def load_manifest(self):
+        manifest = os.path.join(self.filepath, MANIFEST)
+        if not os.path.exists(manifest):
+            return dict()
+        f = open(manifest, encoding = 'utf-8')
+        try:
+            return json.load(f)
+        except ValueError:
+            return dict()
+        finally:
+            f.close()
+
+    # copies and converts the collected images, count > 0 converts in that
+    # many background blender processes
+    def finish(self, count = 0, blender = None):
+        old = self.load_manifest()
+        manifest = dict(old) if self.partial else dict()
+        conversions = list()
+        for name in sorted(self.jobs):
+            source = self.jobs[name][0]
+            entry = {'hash': self.digest(source), 'profiles': dict(),
+                    'sources': sorted(set(os.path.basename(path)
+                            for path in self.jobs[name]))}
+            before = old.get(name, {}).get('profiles', {})
+            # write_file leaves a target with the same content alone and
+            # replaces a damaged one
+            target = os.path.join(self.filepath, name)
+            f = open(source, 'rb')
+            data = f.read()
+            f.close()
+            if write_file(target, data):
+                self.changed.append(target)
+            for profile in self.profiles:
+                settings = list(PROFILES[profile])
+                entry['profiles'][profile] = settings
+                target = os.path.join(self.filepath, profile, name)
+                if before.get(profile, None) != settings or not os.path.exists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok = True)
+                    conversions.append((source, target) + PROFILES[profile])
+            manifest[name] = entry
+
+        if count > 0 and len(conversions) > 1:
+            self.changed += run_processes(conversions, count, blender, self.filepath)
+        else:
+            for job in conversions:
+                if convert(*job):
+                    self.changed.append(job[1])
+
+        manifest_file = os.path.join(self.filepath, MANIFEST)
+        if write_text(manifest_file, json.dumps(manifest, indent = 1, sort_keys = True)):
+            self.changed.append(manifest_file)
+        return self.changed
+
+    def report(self):
+        lines = ["Texture not found: {0}".format(path) for path in sorted(self.missing)]
+        lines.append("{0} textures, {1} file(s) changed, {2} not found".format(
+                len(self.jobs), len(self.changed), len(self.missing)))
+        return lines
+
+
+# conversions split over background blender processes, returns the
+# targets that changed
+def run_processes(conversions, count, blender, folder):
+    count = max(1, min(count, len(conversions)))
+    expr = "import {0}.textures as t; t.main()".format(__package__)
+    running = list()
+    for index in range(count):
+        jobfile = os.path.join(folder, ".convert{0}.json".format(index))
+        f = open(jobfile, 'w', encoding = 'utf-8')
+        json.dump(conversions[index::count], f)
+        f.close()
+        if os.path.exists(jobfile + ".changed"):
+            os.remove(jobfile + ".changed") # left by a failed conversion
+        cmd = [ blender, '-b', '--python-expr', expr, '--', jobfile ]
+        proc = subprocess.Popen(cmd, stdout = subprocess.PIPE,
+                stderr = subprocess.STDOUT)
+        running.append((proc, jobfile))
+
+    changed = list()
+    for proc, jobfile in running:
+        log = proc.communicate()[0].decode('utf-8', 'replace')
+        # blender exits with 0 when the script raised, only the list of
+        # changed targets tells the conversion finished
+        if proc.returncode != 0 or not os.path.exists(jobfile + ".changed"):
+            print(log)
+            print("Texture conversion failed, see {0}".format(jobfile))
+            continue
+        f = open(jobfile + ".changed", encoding = 'utf-8')
+        changed += f.read().splitlines()
+        f.close()
+        os.remove(jobfile + ".changed")
+        os.remove(jobfile)
+    return changed
+
+# entry point inside a background blender process
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    jobfile = argv[0]
+    f = open(jobfile, encoding = 'utf-8')
+    conversions = json.load(f)
+    f.close()
+    changed = [job[1] for job in conversions if convert(*job)]
+    f = open(jobfile + ".changed", 'w', encoding = 'utf-8')
+    f.write("".join(path + "\n" for path in changed))
+    f.close()
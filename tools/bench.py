@@ -0,0 +1,394 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Times the exporter's hot paths on generated scenes of growing size and
+# prints how each one scales. Every size multiplies the base workload:
+#
+#   scenegen          N scene nodes in chains of depth D, half of them meshes
+#   scene_emit        formatting the same scene from its IR only
+#   aggregator_*      G animation groups of S strips, half shared by all
+#   populate          M assets with K instances each (blender only)
+#   assets_prepare    M assets and a B bone armature (blender only)
+#
+# Outside of blender the bpy/mathutils stand-ins of standin.py are used and
+# the blender only benchmarks are skipped.
+#
+# usage: python bench.py [options]
+#        blender -b --python bench.py -- [options]
+#
+#   --sizes 1 2 4 8     workload multipliers
+#   --repeat 3          runs per size, the fastest is reported
+#   --only NAME ...     benchmarks to run
+#   --json FILE         also write the results as json
+
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import tempfile
+import importlib
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, TOOLS_DIR)
+
+from compare_scenes import load_addon_module
+
+MESH_KINDS = 16 # distinct meshes the generated nodes instance
+# bpy.data collections of generated data, in the order they are removed
+DATA_ORDER = ('scenes', 'objects', 'meshes', 'armatures', 'materials', 'actions')
+
+def in_blender():
+    try:
+        import bpy
+    except ImportError:
+        return False
+    return not getattr(bpy, 'standin', False)
+
+# the addon's modules, registered in blender or on top of the stand-ins
+def load_addon():
+    if not in_blender():
+        import standin
+        standin.install()
+        return load_addon_module
+
+    import bpy
+    sys.path.insert(0, os.path.dirname(ADDON_DIR))
+    package = importlib.import_module(os.path.basename(ADDON_DIR))
+    if not hasattr(bpy.types.Scene, "gp3d_scenetype"):
+        package.register()
+    return lambda name: importlib.import_module(package.__name__ + "." + name)
+
+def node_matrix(index):
+    from mathutils import Matrix
+    return Matrix.Translation((index % 10, index % 7, index % 3)) *\
+            Matrix.Rotation(math.radians(index % 360), 4, 'Z')
+
+# strip names of each group, the first half is the same for every group
+def strip_names(groups, strips):
+    shared = ["shared{0}".format(i) for i in range(strips // 2)]
+    return [shared + ["g{0}s{1}".format(g, i) for i in range(strips - len(shared))]
+            for g in range(groups)]
+
+# generated data of one benchmark run, removed by cleanup()
+class Workload:
+    items = 0 # size of the workload, for the per item time
+    temp = None
+    scenes = None # the state the run function works on
+    data = None # {bpy.data collection name: [datablock]} created in blender
+
+    def __init__(self):
+        self.temp = tempfile.mkdtemp(prefix = "gp3d_bench")
+        self.scenes = dict()
+        self.data = {kind: list() for kind in DATA_ORDER}
+
+    def new(self, kind, *args):
+        import bpy
+        item = getattr(bpy.data, kind).new(*args)
+        self.data[kind].append(item)
+        return item
+
+    def cleanup(self):
+        if in_blender():
+            import bpy
+            for kind in DATA_ORDER:
+                collection = getattr(bpy.data, kind)
+                for item in self.data[kind]:
+                    try:
+                        collection.remove(item, do_unlink = True)
+                    except TypeError: # blender < 2.78
+                        item.user_clear()
+                        collection.remove(item)
+                self.data[kind].clear()
+        shutil.rmtree(self.temp, ignore_errors = True)
+
+
+# stand-in workloads
+
+class StandinNode:
+    def __init__(self, name, type_, parent, data, matrix):
+        from standin import Namespace
+        self.name = name
+        self.type = type_
+        self.parent = parent
+        self.data = data
+        self.children = list()
+        self.gp3d_tags = ""
+        self.hide = False
+        self.matrix_local = matrix
+        self.matrix_world = matrix
+        self.material_slots = [Namespace(name = "material")]
+        if parent:
+            parent.children.append(self)
+
+    def get(self, key, default = None):
+        return default
+
+def standin_nodes(nodes, depth):
+    import bpy
+    from standin import Namespace
+    assets = bpy.context.window_manager.gp3d_assets
+    assets.asset_list.clear()
+    meshes = list()
+    for i in range(MESH_KINDS):
+        meshes.append(Namespace(name = "mesh{0}".format(i)))
+        assets.asset_list[meshes[-1].name] = Namespace(scene = "assets",
+                objname = "asset{0}".format(i))
+
+    objects = list()
+    parent = None
+    for i in range(nodes):
+        parent = None if i % depth == 0 else parent
+        mesh = meshes[i % MESH_KINDS] if i % 2 == 0 else None
+        node = StandinNode("node{0}".format(i), 'MESH' if mesh else 'EMPTY',
+                parent, mesh, node_matrix(i))
+        objects.append(node)
+        parent = node
+    return Namespace(name = "bench_nodes", world = None, camera = None,
+            objects = objects)
+
+
+# blender workloads
+
+def blender_meshes(work, scene, count):
+    material = work.new("materials", "bench_material")
+    verts = [(-1, -1, 0), (1, -1, 0), (1, 1, 0), (-1, 1, 0)]
+    objects = list()
+    for i in range(count):
+        mesh = work.new("meshes", "bench_mesh{0}".format(i))
+        mesh.from_pydata(verts, [], [(0, 1, 2, 3)])
+        mesh.materials.append(material)
+        obj = work.new("objects", "bench_asset{0}".format(i), mesh)
+        scene.objects.link(obj)
+        objects.append(obj)
+    return objects
+
+def blender_scene(work, name, scenetype):
+    scene = work.new("scenes", name)
+    scene.gp3d_scenetype = scenetype
+    return scene
+
+def blender_nodes(work, addon, nodes, depth):
+    assets = blender_scene(work, "bench_assets", 'ASSETS')
+    meshes = [obj.data for obj in blender_meshes(work, assets, MESH_KINDS)]
+    scene = blender_scene(work, "bench_nodes", 'GAME_SCENE')
+    parent = None
+    for i in range(nodes):
+        parent = None if i % depth == 0 else parent
+        mesh = meshes[i % MESH_KINDS] if i % 2 == 0 else None
+        obj = work.new("objects", "bench_node{0}".format(i), mesh)
+        scene.objects.link(obj)
+        obj.parent = parent
+        obj.matrix_basis = node_matrix(i)
+        parent = obj
+    scene.update()
+    addon("assets").populate_asset_and_group_list()
+    return scene
+
+def blender_armature(work, scene, bones):
+    import bpy
+    armature = work.new("armatures", "bench_armature")
+    obj = work.new("objects", "bench_rig", armature)
+    scene.objects.link(obj)
+    scene.objects.active = obj
+    overrides = {'scene': scene, 'active_object': obj, 'object': obj}
+    bpy.ops.object.mode_set(overrides, mode = 'EDIT')
+    parent = None
+    for i in range(bones):
+        bone = armature.edit_bones.new("bone{0}".format(i))
+        bone.head = (0, 0, i)
+        bone.tail = (0, 0, i + 1)
+        bone.parent = parent
+        parent = bone
+    bpy.ops.object.mode_set(overrides, mode = 'OBJECT')
+    return obj
+
+
+# benchmarks, setup builds a Workload for a size and run times one pass
+
+def setup_scenegen(addon, args, size):
+    work = Workload()
+    nodes = args.nodes * size
+    if in_blender():
+        scene = blender_nodes(work, addon, nodes, args.depth)
+    else:
+        scene = standin_nodes(nodes, args.depth)
+    work.scenes['scene'] = scene
+    work.scenes['gen'] = addon("scenegen").SceneGen(work.temp)
+    work.items = nodes
+    return work
+
+def run_scenegen(work):
+    work.scenes['gen'].export(work.scenes['scene'])
+
+def setup_scene_emit(addon, args, size):
+    work = setup_scenegen(addon, args, size)
+    work.scenes['ir'] = work.scenes['gen'].extract(work.scenes['scene'])
+    work.scenes['SceneEmitter'] = addon("emit").SceneEmitter
+    return work
+
+def run_scene_emit(work):
+    work.scenes['SceneEmitter']().emit(work.scenes['ir'])
+
+def setup_aggregator(addon, args, size):
+    work = Workload()
+    ir = addon("ir")
+    groups = args.groups * size
+    props = list()
+    for group, strips in enumerate(strip_names(groups, args.strips)):
+        prop = addon("emit").Aggregator.AnimProp()
+        prop.name = "group{0}".format(group)
+        prop.strips = [ir.ClipIR(name = name, track = "track{0}".format(group),
+                begin = index * 20.0, end = index * 20.0 + 10.0, indefinite = False,
+                repeat = 1.0, speed = 1.0, blend = 0.0)
+                for index, name in enumerate(strips)]
+        props.append(prop)
+    work.scenes['Aggregator'] = addon("emit").Aggregator
+    work.scenes['props'] = props
+    work.scenes['animfile'] = os.path.join(work.temp, "bench.animation")
+    work.items = groups * args.strips
+    return work
+
+def run_aggregator_process(work):
+    agg = work.scenes['Aggregator']()
+    agg.process(list(work.scenes['props']))
+    work.scenes['processed'] = agg
+
+def setup_aggregator_write(addon, args, size):
+    work = setup_aggregator(addon, args, size)
+    run_aggregator_process(work)
+    return work
+
+def run_aggregator_write(work):
+    work.scenes['processed'].write(250, work.scenes['animfile'])
+
+def setup_populate(addon, args, size):
+    work = Workload()
+    assets = addon("assets")
+    count = args.assets * size
+    source = blender_scene(work, "bench_assets", 'ASSETS')
+    objects = blender_meshes(work, source, count)
+    scene = blender_scene(work, "bench_instances", 'GAME_SCENE')
+    assets.populate_asset_and_group_list()
+    matrices = [node_matrix(i) for i in range(args.instances)]
+    for obj in objects:
+        work.data['objects'] += assets.place_instances(scene, obj.data.name, matrices)
+    work.scenes['populate'] = assets.populate_asset_and_group_list
+    work.items = count * (args.instances + 1)
+    return work
+
+def run_populate(work):
+    work.scenes['populate']()
+
+def setup_assets_prepare(addon, args, size):
+    import bpy
+    work = Workload()
+    scene = blender_scene(work, "bench_prepare", 'ASSETS')
+    blender_meshes(work, scene, args.assets * size)
+    rig = blender_armature(work, scene, args.bones * size)
+    work.scenes['scene'] = scene
+    work.scenes['overrides'] = {'blend_data': bpy.data, 'scene': scene,
+            'active_object': rig, 'object': rig}
+    work.scenes['export_assets'] = addon("export").export_assets
+    work.items = args.assets * size + args.bones * size
+    return work
+
+def run_assets_prepare(work):
+    scene = work.scenes['scene']
+    work.scenes['export_assets'](dict(work.scenes['overrides']), scene, None, None)
+
+BENCHES = [
+    # name, blender only, setup, run
+    ('scenegen', False, setup_scenegen, run_scenegen),
+    ('scene_emit', False, setup_scene_emit, run_scene_emit),
+    ('aggregator_process', False, setup_aggregator, run_aggregator_process),
+    ('aggregator_write', False, setup_aggregator_write, run_aggregator_write),
+    ('populate', True, setup_populate, run_populate),
+    ('assets_prepare', True, setup_assets_prepare, run_assets_prepare),
+]
+
+def measure(run, work, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        run(work)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+# growth exponent between two sizes, 1.0 is linear, 2.0 quadratic
+def exponent(prev, cur):
+    if prev['time'] <= 0 or cur['time'] <= 0 or prev['items'] == cur['items']:
+        return None
+    return math.log(cur['time'] / prev['time']) / math.log(cur['items'] / prev['items'])
+
+def run_bench(addon, args, name, setup, run):
+    results = list()
+    for size in args.sizes:
+        work = setup(addon, args, size)
+        try:
+            seconds = measure(run, work, args.repeat)
+        finally:
+            work.cleanup()
+        result = {'size': size, 'items': work.items, 'time': seconds}
+        result['exponent'] = exponent(results[-1], result) if results else None
+        results.append(result)
+    return results
+
+def report(name, results):
+    print("{0}".format(name))
+    print("  {0:>6} {1:>8} {2:>12} {3:>12} {4:>9}".format(
+            "size", "items", "seconds", "us/item", "exponent"))
+    for r in results:
+        per_item = r['time'] / r['items'] * 1e6 if r['items'] else 0.0
+        growth = "" if r['exponent'] is None else "{0:.2f}".format(r['exponent'])
+        print("  {0:>6} {1:>8} {2:>12.6f} {3:>12.3f} {4:>9}".format(
+                r['size'], r['items'], r['time'], per_item, growth))
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog = "bench.py")
+    parser.add_argument('--sizes', nargs = '+', type = int, default = [1, 2, 4, 8])
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--only', nargs = '+')
+    parser.add_argument('--json')
+    parser.add_argument('--nodes', type = int, default = 250)
+    parser.add_argument('--depth', type = int, default = 5)
+    parser.add_argument('--groups', type = int, default = 4)
+    parser.add_argument('--strips', type = int, default = 8)
+    parser.add_argument('--assets', type = int, default = 20)
+    parser.add_argument('--instances', type = int, default = 10)
+    parser.add_argument('--bones', type = int, default = 32)
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    blender = in_blender()
+    addon = load_addon()
+    print("Benchmarking {0}".format("in blender" if blender else "with stand-ins"))
+
+    results = dict()
+    for name, blender_only, setup, run in BENCHES:
+        if args.only and name not in args.only:
+            continue
+        if blender_only and not blender:
+            print("{0}: skipped, needs blender".format(name))
+            continue
+        results[name] = run_bench(addon, args, name, setup, run)
+        report(name, results[name])
+
+    if args.json:
+        with open(args.json, 'w', encoding = 'utf-8') as f:
+            json.dump({'blender': blender, 'results': results}, f, indent = 1)
+    return 0
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    sys.exit(main(argv))
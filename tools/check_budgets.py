@@ -0,0 +1,50 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Pre-flight budget check of a .blend, nothing is exported. Exits with 1
+# when an asset is over its budget, for CI.
+#
+# usage: blender -b <file.blend> --python check_budgets.py -- [--json FILE]
+#            [--scenes "Props,Characters"]
+
+import os
+import sys
+import json
+import argparse
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, TOOLS_DIR)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog = "check_budgets.py")
+    parser.add_argument('--json', help = "write the violations as json")
+    parser.add_argument('--scenes', default = "",
+            help = "comma separated ASSETS scenes, default all")
+    return parser.parse_args(argv)
+
+def main(argv):
+    import bpy
+    from bench import load_addon
+    args = parse_args(argv)
+    addon = load_addon()
+    budgets = addon("budgets")
+    names = addon("selection").parse_names(args.scenes)
+    scenes = [scene for scene in bpy.data.scenes if not names or scene.name in names]
+
+    check = budgets.BudgetCheck().run(scenes)
+    for line in check.report():
+        print(line)
+    if args.json:
+        f = open(args.json, 'w', encoding = 'utf-8')
+        json.dump(check.to_dict(), f, indent = 1, sort_keys = True)
+        f.close()
+    return 1 if check.violations else 0
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    sys.exit(main(argv))
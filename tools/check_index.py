@@ -0,0 +1,38 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Checks every .index file of an export against the .scene it sits next to.
+#
+# usage: python check_index.py <export dir>/scenes
+
+import os
+import sys
+import glob
+from compare_scenes import load_addon_module
+
+def main(argv):
+    if len(argv) != 1:
+        print("usage: check_index.py <scenes dir>")
+        return 2
+    sceneindex = load_addon_module("sceneindex")
+    failed = 0
+    for indexfile in sorted(glob.glob(os.path.join(argv[0], "*.index"))):
+        scenefile = os.path.splitext(indexfile)[0] + ".scene"
+        with open(indexfile, 'rb') as f:
+            data = f.read()
+        with open(scenefile, encoding = 'utf-8', newline = '') as f:
+            text = f.read()
+        errors = sceneindex.validate(data, text)
+        for error in errors:
+            print("{0}: {1}".format(os.path.basename(indexfile), error))
+        failed += 1 if errors else 0
+    print("{0} index file(s) inconsistent".format(failed))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
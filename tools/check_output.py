@@ -0,0 +1,105 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Runnable check of the scene output, no blender needed: exports generated
+# stand-in scenes (see standin.py) compact and verbose with .index files,
+# then checks that both load to the same transforms (compare_scenes.py)
+# and that every .index file matches its .scene (check_index.py).
+#
+# usage: python check_output.py [--nodes 200] [--depth 5] [--keep]
+
+import os
+import sys
+import glob
+import shutil
+import argparse
+import tempfile
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, TOOLS_DIR)
+
+import bench
+
+# (name, nodes, depth) of the generated scenes, sized by --nodes and --depth
+def scene_shapes(nodes, depth):
+    return [("flat", nodes, 1), ("chains", nodes, depth), ("single", 1, 1)]
+
+def read_text(path):
+    f = open(path, encoding = 'utf-8', newline = '')
+    text = f.read()
+    f.close()
+    return text
+
+def export(addon, scenes, folder, compact):
+    gen = addon("scenegen").SceneGen(folder, compact, gen_index = True)
+    for scene in scenes:
+        gen.export(scene)
+    gen.finish()
+    return os.path.join(folder, "scenes")
+
+def check_indexes(sceneindex, folder):
+    errors = list()
+    for indexfile in sorted(glob.glob(os.path.join(folder, "*.index"))):
+        f = open(indexfile, 'rb')
+        data = f.read()
+        f.close()
+        text = read_text(os.path.splitext(indexfile)[0] + ".scene")
+        errors += ["{0}: {1}".format(os.path.basename(indexfile), error)
+                for error in sceneindex.validate(data, text)]
+    return errors
+
+def run(args, work):
+    addon = bench.load_addon()
+    sceneprops = addon("sceneprops")
+    sceneindex = addon("sceneindex")
+
+    scenes = list()
+    for name, nodes, depth in scene_shapes(args.nodes, args.depth):
+        scene = bench.standin_nodes(nodes, depth)
+        scene.name = name
+        scenes.append(scene)
+    full = export(addon, scenes, os.path.join(work, "full"), False)
+    compact = export(addon, scenes, os.path.join(work, "compact"), True)
+
+    errors = list()
+    for scene in scenes:
+        filename = scene.name + ".scene"
+        texts = [read_text(os.path.join(folder, filename)) for folder in (full, compact)]
+        if len(texts[1]) >= len(texts[0]):
+            errors.append("{0}: compact output is not smaller".format(filename))
+        errors += ["{0}: {1}".format(filename, diff)
+                for diff in sceneprops.compare_transforms(texts[0], texts[1])]
+    for folder in (full, compact):
+        errors += check_indexes(sceneindex, folder)
+
+    for error in errors:
+        print(error)
+    print("{0} scene(s) checked, {1} error(s)".format(len(scenes), len(errors)))
+    return 1 if errors else 0
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog = "check_output.py")
+    parser.add_argument('--nodes', type = int, default = 200)
+    parser.add_argument('--depth', type = int, default = 5)
+    parser.add_argument('--keep', action = 'store_true')
+    args = parser.parse_args(argv)
+    if bench.in_blender():
+        print("check_output.py runs outside of blender, on the stand-ins")
+        return 2
+
+    work = tempfile.mkdtemp(prefix = "gp3d_check")
+    try:
+        return run(args, work)
+    finally:
+        if args.keep:
+            print("Output kept in {0}".format(work))
+        else:
+            shutil.rmtree(work, ignore_errors = True)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
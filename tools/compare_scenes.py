@@ -0,0 +1,49 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Checks that two .scene files load to the same node transforms,
+# e.g. the compact and verbose output of the same blender scene.
+#
+# usage: python compare_scenes.py <verbose.scene> <compact.scene>
+
+import os
+import sys
+import types
+import importlib
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# import a bpy independent module of the addon without running __init__.py
+def load_addon_module(name):
+    if "gp3d_addon" not in sys.modules:
+        package = types.ModuleType("gp3d_addon")
+        package.__path__ = [ADDON_DIR]
+        sys.modules["gp3d_addon"] = package
+    return importlib.import_module("gp3d_addon." + name)
+
+def main(argv):
+    if len(argv) != 2:
+        print("usage: compare_scenes.py <verbose.scene> <compact.scene>")
+        return 2
+    sceneprops = load_addon_module("sceneprops")
+    texts = list()
+    for path in argv:
+        with open(path, encoding = 'utf-8') as f:
+            texts.append(f.read())
+
+    diffs = sceneprops.compare_transforms(texts[0], texts[1])
+    for diff in diffs:
+        print(diff)
+    if diffs:
+        print("{0} difference(s) found".format(len(diffs)))
+        return 1
+    print("{0} nodes match".format(len(sceneprops.collect_transforms(texts[0]))))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
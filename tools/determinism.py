@@ -0,0 +1,131 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Checks that exporting the same .blend gives byte-identical files: the file
+# is exported twice in each of several blender processes, each started with
+# a different PYTHONHASHSEED, and every export is compared to the first.
+#
+# usage: python determinism.py --blender <blender> <file.blend>
+#                              [--processes 2] [--assets] [--keep]
+#
+# inside blender (started by the above):
+#        blender -b <file.blend> --python determinism.py -- --export <dir>
+
+import os
+import sys
+import shutil
+import filecmp
+import argparse
+import tempfile
+import subprocess
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, TOOLS_DIR)
+
+EXPORTS_PER_PROCESS = 2
+# written next to the exports once all of them finished, blender exits
+# with 0 even when the script raised
+DONE = "exported"
+# logs of the export itself, not part of the output
+IGNORED = ('export_report.json',)
+
+def list_files(root):
+    files = set()
+    for folder, dirs, names in os.walk(root):
+        for name in names:
+            if name not in IGNORED:
+                files.add(os.path.relpath(os.path.join(folder, name), root))
+    return files
+
+# differences of tree against the reference tree
+def compare_trees(reference, tree):
+    expected = list_files(reference)
+    found = list_files(tree)
+    diffs = ["missing {0}".format(f) for f in sorted(expected - found)]
+    diffs += ["unexpected {0}".format(f) for f in sorted(found - expected)]
+    for name in sorted(expected & found):
+        if not filecmp.cmp(os.path.join(reference, name), os.path.join(tree, name),
+                shallow = False):
+            diffs.append("differs {0}".format(name))
+    return diffs
+
+# in blender: export the loaded file into <export>/0, <export>/1, ...
+def export(args):
+    import bpy
+    from bench import load_addon
+    load_addon()
+    for index in range(EXPORTS_PER_PROCESS):
+        target = os.path.join(args.export, str(index))
+        os.makedirs(target, exist_ok = True)
+        result = bpy.ops.export_scene.gameplay3d(filepath = target + os.sep,
+                gen_assets = args.assets, write_report = False)
+        if 'FINISHED' not in result:
+            print("Export to {0} failed: {1}".format(target, result))
+            return 1
+    f = open(os.path.join(args.export, DONE), 'w')
+    f.close()
+    return 0
+
+def run(args):
+    work = tempfile.mkdtemp(prefix = "gp3d_determinism")
+    exports = list()
+    try:
+        for process in range(args.processes):
+            target = os.path.join(work, "process{0}".format(process))
+            env = dict(os.environ, PYTHONHASHSEED = str(process + 1))
+            cmd = [ args.blender, '-b', args.blend, '--python', os.path.abspath(__file__),
+                    '--', '--export', target ]
+            if args.assets:
+                cmd.append('--assets')
+            ret = subprocess.run(cmd, env = env, stdout = subprocess.PIPE,
+                    stderr = subprocess.STDOUT)
+            if ret.returncode != 0 or not os.path.exists(os.path.join(target, DONE)):
+                print(ret.stdout.decode('utf-8', 'replace'))
+                print("Export process {0} failed".format(process))
+                return 2
+            exports += [os.path.join(target, str(i)) for i in range(EXPORTS_PER_PROCESS)]
+
+        reference = exports[0]
+        failed = 0
+        for tree in exports[1:]:
+            diffs = compare_trees(reference, tree)
+            for diff in diffs:
+                print("{0}: {1}".format(os.path.relpath(tree, work), diff))
+            failed += 1 if diffs else 0
+        print("{0} export(s) of {1} files compared, {2} differ".format(
+                len(exports), len(list_files(reference)), failed))
+        return 1 if failed else 0
+    finally:
+        if args.keep:
+            print("Exports kept in {0}".format(work))
+        else:
+            shutil.rmtree(work, ignore_errors = True)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog = "determinism.py")
+    parser.add_argument('blend', nargs = '?')
+    parser.add_argument('--blender', default = 'blender')
+    parser.add_argument('--processes', type = int, default = 2)
+    parser.add_argument('--assets', action = 'store_true',
+            help = "also export gpb files, needs gameplay-encoder")
+    parser.add_argument('--keep', action = 'store_true')
+    parser.add_argument('--export', help = argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    if args.export:
+        return export(args)
+    if not args.blend:
+        print("usage: determinism.py --blender <blender> <file.blend>")
+        return 2
+    return run(args)
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    sys.exit(main(argv))
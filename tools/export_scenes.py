@@ -0,0 +1,63 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Exports a .blend from the command line, all of it or only some scenes.
+#
+# usage: blender -b <file.blend> --python export_scenes.py -- <output dir>
+#            [--scenes "Level 1,Props"] [--tags door key] [--selected]
+#            [--no-scenes] [--no-animations] [--no-assets] [--workers N]
+#            [--report]
+#
+# --tags and --selected also export the ASSETS and group scenes the picked
+# objects use. --selected is the selection saved in the file.
+
+import os
+import sys
+import argparse
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, TOOLS_DIR)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog = "export_scenes.py")
+    parser.add_argument('output')
+    parser.add_argument('--scenes', default = "",
+            help = "comma separated scene names")
+    parser.add_argument('--tags', nargs = '+', default = [])
+    parser.add_argument('--selected', action = 'store_true')
+    parser.add_argument('--no-scenes', action = 'store_true')
+    parser.add_argument('--no-animations', action = 'store_true')
+    parser.add_argument('--no-assets', action = 'store_true')
+    parser.add_argument('--workers', type = int, default = 0)
+    parser.add_argument('--report', action = 'store_true')
+    return parser.parse_args(argv)
+
+def main(argv):
+    import bpy
+    from bench import load_addon
+    args = parse_args(argv)
+    load_addon()
+    os.makedirs(args.output, exist_ok = True)
+    result = bpy.ops.export_scene.gameplay3d(
+            filepath = os.path.join(os.path.abspath(args.output), ""),
+            gen_scenes = not args.no_scenes,
+            gen_animations = not args.no_animations,
+            gen_assets = not args.no_assets,
+            worker_count = args.workers,
+            write_report = args.report,
+            only_scenes = args.scenes,
+            only_tags = " ".join(args.tags),
+            only_selected = args.selected)
+    if 'FINISHED' not in result:
+        print("Export failed: {0}".format(result))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    sys.exit(main(argv))
@@ -0,0 +1,83 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Lists the reference table of .gpb files (id, type, size), or checks every
+# gpb url of an export's scene and prefab files against its bundles. Only
+# the reference tables are read.
+#
+# usage: python gpbinfo.py <file.gpb> ... [--largest N]
+#        python gpbinfo.py --check <export dir>
+
+import os
+import sys
+import glob
+import argparse
+from compare_scenes import load_addon_module
+
+GPB_URL = "res/gpb/"
+
+def list_bundles(gpbreader, files, largest):
+    for path in files:
+        index = gpbreader.GpbIndex().read(path)
+        entries = sorted(index.entries.items(), key = lambda e: (-e[1][2], e[0]))
+        if largest:
+            entries = entries[:largest]
+        print("{0}: version {1}.{2}, {3} references, {4} bytes".format(path,
+                index.version[0], index.version[1], len(index.entries),
+                index.file_size))
+        for ref_id, (ref_type, offset, size) in entries:
+            print("  {0:>12}  {1:<16} {2}".format(size,
+                    gpbreader.TYPES.get(ref_type, str(ref_type)), ref_id))
+
+# {(gpb scene, node id): [scene files]} of the node urls in a scene file
+def scene_references(sceneprops, path, references):
+    f = open(path, encoding = 'utf-8')
+    text = f.read()
+    f.close()
+    name = os.path.basename(path)
+    stack = list(sceneprops.parse(text).children("scene"))
+    while stack:
+        space = stack.pop()
+        for node in space.children("node"):
+            url = node.get("url", "")
+            if url.startswith(GPB_URL) and '#' in url:
+                bundle, node_id = url[len(GPB_URL):].split('#', 1)
+                key = (os.path.splitext(bundle)[0], node_id)
+                references.setdefault(key, []).append(name)
+            stack.append(node)
+
+def check_export(gpbreader, sceneprops, folder):
+    references = dict()
+    for pattern in ("scenes/*.scene", "prefabs/*.scene"):
+        for path in sorted(glob.glob(os.path.join(folder, pattern))):
+            scene_references(sceneprops, path, references)
+    verifier = gpbreader.GpbVerifier(os.path.join(folder, "gpb"))
+    verifier.verify(references)
+    for line in verifier.report():
+        print(line)
+    return 1 if verifier.errors else 0
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog = "gpbinfo.py")
+    parser.add_argument('files', nargs = '*')
+    parser.add_argument('--largest', type = int, default = 0,
+            help = "only list the N largest entries of each bundle")
+    parser.add_argument('--check', metavar = 'EXPORT_DIR')
+    args = parser.parse_args(argv)
+
+    gpbreader = load_addon_module("gpbreader")
+    if args.check:
+        return check_export(gpbreader, load_addon_module("sceneprops"), args.check)
+    if not args.files:
+        parser.print_usage()
+        return 2
+    list_bundles(gpbreader, args.files, args.largest)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
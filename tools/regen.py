@@ -0,0 +1,65 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Regenerates .scene and .animation files from the IR an export dumped with
+# "Dump scene data" (the ir folder), without blender. Useful to profile or
+# change the emitters against real scenes.
+#
+# usage: python regen.py <export dir>/ir <output dir> [--compact] [--index]
+#                        [--profile]
+
+import os
+import sys
+import glob
+import time
+import argparse
+from compare_scenes import load_addon_module
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog = "regen.py")
+    parser.add_argument('irdir')
+    parser.add_argument('output')
+    parser.add_argument('--compact', action = 'store_true')
+    parser.add_argument('--index', action = 'store_true')
+    parser.add_argument('--profile', action = 'store_true',
+            help = "print the cProfile statistics of the emitters")
+    return parser.parse_args(argv)
+
+def regenerate(ir, emit, args):
+    files = list()
+    for path in sorted(glob.glob(os.path.join(args.irdir, "*.scene.json"))):
+        scene = ir.load(path)
+        folder = os.path.join(args.output, "prefabs" if scene.prefab else "scenes")
+        os.makedirs(folder, exist_ok = True)
+        files += emit.write_scene(scene, folder, args.compact, args.index)
+    for path in sorted(glob.glob(os.path.join(args.irdir, "*.animation.json"))):
+        folder = os.path.join(args.output, "animations")
+        os.makedirs(folder, exist_ok = True)
+        files += emit.write_animation(ir.load(path), folder)
+    return files
+
+def main(argv):
+    args = parse_args(argv)
+    ir = load_addon_module("ir")
+    emit = load_addon_module("emit")
+
+    start = time.perf_counter()
+    if args.profile:
+        import cProfile
+        import pstats
+        profile = cProfile.Profile()
+        files = profile.runcall(regenerate, ir, emit, args)
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(20)
+    else:
+        files = regenerate(ir, emit, args)
+    print("{0} file(s) changed in {1:.3f}s".format(len(files),
+            time.perf_counter() - start))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,205 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Minimal bpy and mathutils stand-ins, just enough to import the addon's
+# modules and run SceneGen and the emitters of emit.py outside of blender.
+# install() puts them in sys.modules, never call it in blender.
+
+import sys
+import math
+import types
+
+class Vector:
+    def __init__(self, values = (0.0, 0.0, 0.0)):
+        self.values = [float(v) for v in values]
+
+    x = property(lambda self: self.values[0])
+    y = property(lambda self: self.values[1])
+    z = property(lambda self: self.values[2])
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def copy(self):
+        return Vector(self.values)
+
+    @property
+    def length(self):
+        return math.sqrt(sum(v * v for v in self.values))
+
+class Quaternion:
+    def __init__(self, values = (1.0, 0.0, 0.0, 0.0)):
+        self.w, self.x, self.y, self.z = [float(v) for v in values]
+
+    def to_axis_angle(self):
+        w = max(-1.0, min(1.0, self.w))
+        angle = 2.0 * math.acos(w)
+        s = math.sqrt(max(0.0, 1.0 - w * w))
+        if s < 1e-8:
+            return Vector((1.0, 0.0, 0.0)), 0.0
+        return Vector((self.x / s, self.y / s, self.z / s)), angle
+
+class Matrix:
+    def __init__(self, rows = None):
+        if rows is None:
+            rows = [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+        self.rows = [[float(v) for v in row] for row in rows]
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def copy(self):
+        return Matrix(self.rows)
+
+    # blender 2.7x multiplies matrices with *
+    def __mul__(self, other):
+        a = self.rows
+        b = other.rows
+        return Matrix([[sum(a[i][k] * b[k][j] for k in range(4)) for j in range(4)]
+                for i in range(4)])
+
+    @staticmethod
+    def Translation(vector):
+        m = Matrix()
+        for i in range(3):
+            m.rows[i][3] = float(vector[i])
+        return m
+
+    @staticmethod
+    def Rotation(angle, size, axis):
+        c = math.cos(angle)
+        s = math.sin(angle)
+        m = Matrix()
+        i, j = {'X': (1, 2), 'Y': (2, 0), 'Z': (0, 1)}[axis]
+        m.rows[i][i] = c
+        m.rows[i][j] = -s
+        m.rows[j][i] = s
+        m.rows[j][j] = c
+        return m
+
+    @staticmethod
+    def Scale(factor, size, axis = None):
+        m = Matrix()
+        for i in range(3):
+            m.rows[i][i] = float(factor)
+        return m
+
+    def decompose(self):
+        r = self.rows
+        loc = Vector((r[0][3], r[1][3], r[2][3]))
+        scale = [math.sqrt(sum(r[i][j] ** 2 for i in range(3))) or 1.0
+                for j in range(3)]
+        m = [[r[i][j] / scale[j] for j in range(3)] for i in range(3)]
+        trace = m[0][0] + m[1][1] + m[2][2]
+        if trace > 0:
+            s = math.sqrt(trace + 1.0) * 2
+            quat = (0.25 * s, (m[2][1] - m[1][2]) / s, (m[0][2] - m[2][0]) / s,
+                    (m[1][0] - m[0][1]) / s)
+        elif m[0][0] > m[1][1] and m[0][0] > m[2][2]:
+            s = math.sqrt(1.0 + m[0][0] - m[1][1] - m[2][2]) * 2
+            quat = ((m[2][1] - m[1][2]) / s, 0.25 * s, (m[0][1] + m[1][0]) / s,
+                    (m[0][2] + m[2][0]) / s)
+        elif m[1][1] > m[2][2]:
+            s = math.sqrt(1.0 + m[1][1] - m[0][0] - m[2][2]) * 2
+            quat = ((m[0][2] - m[2][0]) / s, (m[0][1] + m[1][0]) / s, 0.25 * s,
+                    (m[1][2] + m[2][1]) / s)
+        else:
+            s = math.sqrt(1.0 + m[2][2] - m[0][0] - m[1][1]) * 2
+            quat = ((m[1][0] - m[0][1]) / s, (m[0][2] + m[2][0]) / s,
+                    (m[1][2] + m[2][1]) / s, 0.25 * s)
+        return loc, Quaternion(quat), Vector(scale)
+
+# a blender collection: indexed and looked up by name
+class Collection(dict):
+    def find(self, name):
+        return list(self.keys()).index(name) if name in self else -1
+
+class Namespace:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+def persistent(func):
+    return func
+
+def make_property(name):
+    def prop(**kwargs):
+        return (name, kwargs)
+    prop.__name__ = name
+    return prop
+
+PROPERTIES = ('BoolProperty', 'IntProperty', 'FloatProperty', 'StringProperty',
+        'EnumProperty', 'CollectionProperty', 'PointerProperty',
+        'FloatVectorProperty', 'IntVectorProperty', 'BoolVectorProperty')
+
+def make_bpy():
+    bpy = types.ModuleType("bpy")
+    bpy.standin = True
+
+    # any bpy.types.<Name> is a plain base class
+    bpy_types = types.ModuleType("bpy.types")
+    classes = dict()
+    def type_getattr(name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if name not in classes:
+            classes[name] = type(name, (object,), {})
+        return classes[name]
+    bpy_types.__getattr__ = type_getattr
+
+    bpy_props = types.ModuleType("bpy.props")
+    for name in PROPERTIES:
+        setattr(bpy_props, name, make_property(name))
+
+    app = types.ModuleType("bpy.app")
+    handlers = types.ModuleType("bpy.app.handlers")
+    handlers.persistent = persistent
+    for name in ('load_post', 'save_pre', 'scene_update_post'):
+        setattr(handlers, name, list())
+    app.handlers = handlers
+    app.background = True
+    app.binary_path = ""
+
+    bpy.types = bpy_types
+    bpy.props = bpy_props
+    bpy.app = app
+    bpy.utils = Namespace(register_class = lambda cls: None,
+            unregister_class = lambda cls: None,
+            register_module = lambda name: None,
+            unregister_module = lambda name: None)
+    bpy.ops = Namespace()
+    bpy.data = Namespace(scenes = Collection(), objects = Collection(),
+            meshes = Collection(), actions = Collection())
+    assets = Namespace(asset_list = Collection(), group_list = Collection(),
+            index = -1, group_index = -1)
+    bpy.context = Namespace(window_manager = Namespace(gp3d_assets = assets),
+            scene = None, active_object = None, selected_objects = [])
+    return {'bpy': bpy, 'bpy.types': bpy_types, 'bpy.props': bpy_props,
+            'bpy.app': app, 'bpy.app.handlers': handlers}
+
+def make_mathutils():
+    mathutils = types.ModuleType("mathutils")
+    mathutils.standin = True
+    mathutils.Vector = Vector
+    mathutils.Quaternion = Quaternion
+    mathutils.Matrix = Matrix
+    mathutils.__all__ = ['Vector', 'Quaternion', 'Matrix']
+    return {'mathutils': mathutils}
+
+def install():
+    if 'bpy' in sys.modules and not getattr(sys.modules['bpy'], 'standin', False):
+        raise RuntimeError("the real bpy is loaded, the stand-in is not needed")
+    modules = make_bpy()
+    modules.update(make_mathutils())
+    sys.modules.update(modules)
+    return modules['bpy']
@@ -0,0 +1,139 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Measures what the addon costs a headless blender start: importing the
+# package, register(), and the load handlers on the given file. Also
+# starts blender with and without the addon to time the whole process.
+# Fails when registering imported an export-only module, those are meant
+# to be loaded by the first export (see ExportToGameplay3D.export).
+#
+# usage: python startup.py --blender <blender> [file.blend] [--runs 5]
+#
+# inside blender (started by the above):
+#        blender -b [file.blend] --factory-startup --python startup.py -- --measure <json>
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import importlib
+import subprocess
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.dirname(TOOLS_DIR)
+
+# only needed once an export runs
+EXPORT_MODULES = ('scenegen', 'animgen', 'assetgen', 'collisiongen', 'meshdedup',
+        'assetprune', 'matlib', 'textures', 'worker', 'emit', 'ir')
+
+def ms(seconds):
+    return round(seconds * 1000.0, 2)
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+# in blender: time import, register and the addon's load handlers
+def measure(args):
+    import bpy
+    sys.path.insert(0, os.path.dirname(ADDON_DIR))
+    name = os.path.basename(ADDON_DIR)
+    before = set(bpy.app.handlers.load_post)
+
+    start = time.perf_counter()
+    package = importlib.import_module(name)
+    imported = time.perf_counter()
+    package.register()
+    registered = time.perf_counter()
+
+    handlers = [h for h in bpy.app.handlers.load_post if h not in before]
+    for handler in handlers:
+        handler(None)
+    loaded = time.perf_counter()
+
+    modules = sorted(m[len(name) + 1:] for m in sys.modules if m.startswith(name + "."))
+    result = {'import': ms(imported - start), 'register': ms(registered - imported),
+            'load_post': ms(loaded - registered), 'modules': modules,
+            'numpy': 'numpy' in sys.modules}
+    package.unregister()
+    f = open(args.measure, 'w', encoding = 'utf-8')
+    json.dump(result, f)
+    f.close()
+    return 0
+
+# blender exits with 0 when the script raised, a run that should write
+# result only succeeded when the file is there afterwards
+def run_blender(args, script, result = None):
+    cmd = [ args.blender, '-b' ]
+    if args.blend:
+        cmd.append(args.blend)
+    cmd += [ '--factory-startup' ] + script
+    if result and os.path.exists(result):
+        os.remove(result)
+    start = time.perf_counter()
+    ret = subprocess.run(cmd, stdout = subprocess.PIPE, stderr = subprocess.STDOUT)
+    elapsed = time.perf_counter() - start
+    if ret.returncode != 0 or (result and not os.path.exists(result)):
+        print(ret.stdout.decode('utf-8', 'replace'))
+        raise RuntimeError("blender exited with {0}{1}".format(ret.returncode,
+                ", {0} not written".format(result) if result else ""))
+    return elapsed
+
+def run(args):
+    handle, jsonfile = tempfile.mkstemp(suffix = ".json")
+    os.close(handle)
+    bare, full, results = list(), list(), list()
+    try:
+        for index in range(args.runs):
+            bare.append(run_blender(args, [ '--python-expr', 'pass' ]))
+            full.append(run_blender(args, [ '--python', os.path.abspath(__file__),
+                    '--', '--measure', jsonfile ], jsonfile))
+            f = open(jsonfile, encoding = 'utf-8')
+            results.append(json.load(f))
+            f.close()
+    finally:
+        if os.path.exists(jsonfile):
+            os.remove(jsonfile)
+
+    print("{0} run(s){1}".format(args.runs,
+            " on " + args.blend if args.blend else ""))
+    for key in ('import', 'register', 'load_post'):
+        print("  {0:<10} {1:>9.2f} ms".format(key, median([r[key] for r in results])))
+    print("  {0:<10} {1:>9.2f} ms (blender {2:.2f} ms without the addon)".format(
+            "process", ms(median(full)), ms(median(bare))))
+    print("  numpy loaded: {0}".format(results[-1]['numpy']))
+
+    eager = [m for m in results[-1]['modules'] if m in EXPORT_MODULES]
+    for module in eager:
+        print("Imported on register: {0}".format(module))
+    if args.json:
+        f = open(args.json, 'w', encoding = 'utf-8')
+        json.dump({'runs': results, 'process': full, 'bare': bare}, f, indent = 1)
+        f.close()
+    return 1 if eager else 0
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog = "startup.py")
+    parser.add_argument('blend', nargs = '?')
+    parser.add_argument('--blender', default = 'blender')
+    parser.add_argument('--runs', type = int, default = 5)
+    parser.add_argument('--json', help = "also write the timings of every run")
+    parser.add_argument('--measure', help = argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    if args.measure:
+        return measure(args)
+    return run(args)
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    sys.exit(main(argv))
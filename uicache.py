@@ -0,0 +1,66 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Results of UI queries (panel polls, enum items) cached per active object.
+# Only plain python values (names, tuples) are stored, never blender
+# structs, so a stale entry can't point at freed data.
+
+import bpy
+from bpy.app.handlers import persistent
+from . import basicprops
+
+class UICache:
+    key = None # (scene.name, active object name)
+    values = None
+
+    def __init__(self):
+        self.invalidate()
+
+    def invalidate(self):
+        self.key = None
+        self.values = dict()
+
+    def get(self, context, name, build):
+        obj = context.active_object
+        key = (context.scene.name, obj.name if obj else None)
+        if key != self.key:
+            self.key = key
+            self.values = dict()
+        if name not in self.values:
+            self.values[name] = build(obj)
+        return self.values[name]
+
+    def set(self, name, value):
+        self.values[name] = value
+
+
+cache = UICache()
+
+# objects are tagged when their NLA tracks or strips change. playback
+# tags the animated objects every frame, that isn't an edit
+@persistent
+def on_scene_update(scene):
+    if not basicprops.in_use:
+        return
+    screen = bpy.context.screen
+    if screen and screen.is_animation_playing:
+        return
+    if bpy.data.objects.is_updated or bpy.data.actions.is_updated:
+        cache.invalidate()
+
+@persistent
+def on_load(x):
+    cache.invalidate()
+
+def register():
+    bpy.app.handlers.scene_update_post.append(on_scene_update)
+    bpy.app.handlers.load_post.append(on_load)
+
+def unregister():
+    bpy.app.handlers.scene_update_post.remove(on_scene_update)
+    bpy.app.handlers.load_post.remove(on_load)
@@ -13,6 +13,7 @@
 import bpy
 import re
 import os
+from .formatting import tabs, deci
 
 class HomeTab:
     bl_space_type = 'VIEW_3D'
@@ -41,12 +42,6 @@ def make_names_unique(collection, item, attribute):
     item.name = name # set the new unique name
     setattr(item, attribute, name)
 
-def tabs(num):
-    return '\t' * num
-
-def deci(n):
-    return format(n, '.2f')
-
 def armature_parent_or_none(obj):
     return obj.parent is None or obj.parent.type == 'ARMATURE'
 
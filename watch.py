@@ -0,0 +1,396 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Watch mode: while running, edits are recorded by a scene_update_post
+# handler (objects, actions and worlds blender tagged as updated) and, once
+# no edit came for a while or the file is saved, only the affected files are
+# exported again. Scene and prefab files are written here, ASSETS scenes
+# with changed meshes or actions are encoded by a background worker (see
+# worker.py) so editing isn't blocked. changed_files.txt lists what each
+# pass wrote for the game to hot-reload. Meshes are merged and materials
+# shared the way a full export does, so a pass writes the same files.
+# Only the meshes edited since the last pass are hashed again for the
+# merge. The worker needs the edits saved: the open file is used when it
+# has no unsaved changes, otherwise a snapshot is saved at most every
+# snapshot_interval seconds and changed ASSETS scenes wait for it.
+#
+# When not watching the handlers return at once, while watching and idle
+# only the modal timer runs.
+
+import os
+import time
+import bpy
+from bpy.props import StringProperty, BoolProperty, FloatProperty
+from bpy.app.handlers import persistent
+from bpy_extras.io_utils import ExportHelper
+from .registry import registry
+
+class WatchState:
+    active = False
+    objects = None # names of objects changed since the last pass
+    actions = None # names of changed actions
+    scenes = None # names of scenes changed as a whole (world, shared materials)
+    last_change = 0.0
+    flush_now = False # set on save, skips the debounce
+    workers = None # background ASSETS export of the last pass, if running
+    assets = None # ASSETS scenes waiting to be encoded
+    meshes = None # names of meshes edited since the dedup table was built
+    dedup = None # MeshDedup kept between passes
+    last_snapshot = 0.0
+
+    def __init__(self):
+        self.reset()
+        self.clear()
+
+    # everything kept between passes, for a new watch or file
+    def clear(self):
+        self.workers = None
+        self.assets = set()
+        self.meshes = set()
+        self.dedup = None
+        self.last_snapshot = 0.0
+
+    def reset(self):
+        self.objects = set()
+        self.actions = set()
+        self.scenes = set()
+        self.flush_now = False
+
+    def pending(self):
+        return bool(self.objects or self.actions or self.scenes)
+
+    def touch(self):
+        self.last_change = time.monotonic()
+
+
+watch = WatchState()
+
+@persistent
+def on_scene_update(scene):
+    if not watch.active:
+        return
+    screen = bpy.context.screen
+    if screen and screen.is_animation_playing:
+        return
+    changed = False
+    if bpy.data.objects.is_updated:
+        for obj in scene.objects:
+            if obj.is_updated or obj.is_updated_data:
+                watch.objects.add(obj.name)
+                if obj.type == 'MESH':
+                    watch.meshes.add(obj.data.name)
+                changed = True
+    if bpy.data.actions.is_updated:
+        for action in bpy.data.actions:
+            if action.is_updated:
+                watch.actions.add(action.name)
+                changed = True
+    if bpy.data.worlds.is_updated and scene.world and scene.world.is_updated:
+        watch.scenes.add(scene.name)
+        changed = True
+    if changed:
+        watch.touch()
+
+@persistent
+def on_save(x):
+    if watch.active and watch.pending():
+        watch.flush_now = True
+
+# loading a file ends the modal operator without cancel(), stop watching
+# here. A running encode belongs to the old file, it is waited for and
+# dropped.
+@persistent
+def on_load(x):
+    if watch.workers is not None:
+        from .worker import wait_workers
+        wait_workers(watch.workers)
+    watch.active = False
+    watch.reset()
+    watch.clear()
+
+def uses_actions(obj, actions):
+    data = obj.animation_data
+    if data is None:
+        return False
+    if data.action and data.action.name in actions:
+        return True
+    return any(strip.action and strip.action.name in actions
+            for track in data.nla_tracks for strip in track.strips)
+
+# (game scenes, asset groups, ASSETS scenes) touched by the recorded edits
+def affected_scenes(state):
+    game, groups, assets = list(), list(), list()
+    for scene in bpy.data.scenes:
+        touched = scene.name in state.scenes or\
+                any(name in state.objects for name in scene.objects.keys())
+        type_ = scene.gp3d_scenetype
+        if type_ == 'ASSETS':
+            if touched or any(uses_actions(obj, state.actions) for obj in scene.objects
+                    if obj.type == 'ARMATURE'):
+                assets.append(scene.name)
+        elif touched and type_ == 'GAME_SCENE':
+            game.append(scene.name)
+        elif touched and type_ == 'ASSET_GROUP':
+            groups.append(scene.name)
+    return game, groups, assets
+
+# game scenes instancing the asset groups of the named ASSET_GROUP scenes,
+# also through groups instanced in other groups. Only as current as the
+# last registry.reconcile()
+def instancing_scenes(group_scenes):
+    group_list = bpy.context.window_manager.gp3d_assets.group_list
+    pending = set(group_scenes)
+    seen = set()
+    game = set()
+    while pending:
+        name = pending.pop()
+        seen.add(name)
+        keys = [group.name for group in group_list.values() if group.scene == name]
+        for obj_name in registry.instances_of_groups(keys):
+            obj = bpy.data.objects.get(obj_name, None)
+            for scene in obj.users_scene if obj else ():
+                if scene.gp3d_scenetype == 'GAME_SCENE':
+                    game.add(scene.name)
+                elif scene.gp3d_scenetype == 'ASSET_GROUP' and scene.name not in seen:
+                    pending.add(scene.name)
+    return game
+
+class WatchGameplay3D(bpy.types.Operator, ExportHelper):
+    """Export changed scenes, animations and assets again while editing"""
+    bl_idname = "export_scene.gameplay3d_watch"
+    bl_label = "Watch and export to Gameplay3D files"
+
+    filename_ext = ""
+    filter_glob = StringProperty(
+            default="",
+            options={'HIDDEN'},
+            )
+
+    gen_assets = BoolProperty(
+            name="Encode changed assets",
+            description="Export and encode changed ASSETS scenes in a "\
+                    "background Blender process",
+            default=True,
+            )
+    compact_scenes = BoolProperty(
+            name="Compact scene files",
+            description="Omit default transforms and indentation in scene files",
+            default=False,
+            )
+    gen_collision = BoolProperty(
+            name="Generate collision objects",
+            description="Generate physics files for tagged instances",
+            default=True,
+            )
+    gen_index = BoolProperty(
+            name="Generate scene index files",
+            description="Write a .index file next to each .scene file",
+            default=True,
+            )
+    dedup_meshes = BoolProperty(
+            name="Merge duplicate meshes",
+            description="Encode meshes with identical geometry once and point "\
+                    "every instance at the same gpb node",
+            default=False,
+            )
+    share_materials = BoolProperty(
+            name="Share materials",
+            description="Reference materials/library.material from scenes, "\
+                    "rebuilt when encoded assets change",
+            default=False,
+            )
+    expand_groups = BoolProperty(
+            name="Expand asset groups",
+            description="Write asset group instances in full into each scene",
+            default=True,
+            )
+    debounce = FloatProperty(
+            name="Delay",
+            description="Seconds without edits before changed files are exported",
+            default=1.0,
+            min=0.1,
+            )
+    snapshot_interval = FloatProperty(
+            name="Snapshot interval",
+            description="Minimum seconds between saving a snapshot of the file "\
+                    "for the encoder while it has unsaved changes",
+            default=30.0,
+            min=0.0,
+            )
+
+    timer = None
+
+    # running it again stops watching
+    def invoke(self, context, event):
+        if watch.active:
+            watch.active = False
+            return {'FINISHED'}
+        return ExportHelper.invoke(self, context, event)
+
+    def execute(self, context):
+        watch.reset()
+        watch.clear()
+        watch.active = True
+        self.timer = context.window_manager.event_timer_add(0.25, context.window)
+        context.window_manager.modal_handler_add(self)
+        self.report({'INFO'}, "Watching for changes, export to {0}".format(self.filepath))
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if not watch.active:
+            self.stop(context)
+            self.report({'INFO'}, "Stopped watching")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        # edits made during a background encode wait for it
+        if watch.workers is not None:
+            self.collect_workers()
+        elif watch.pending() and (watch.flush_now or
+                time.monotonic() - watch.last_change >= self.debounce):
+            self.export_changes(context)
+        elif watch.assets:
+            self.encode_assets()
+        return {'PASS_THROUGH'}
+
+    def cancel(self, context):
+        self.stop(context)
+        watch.active = False
+
+    def stop(self, context):
+        context.window_manager.event_timer_remove(self.timer)
+        if watch.workers is not None:
+            from .worker import wait_workers
+            changed = list()
+            for result in wait_workers(watch.workers):
+                changed += result.changed
+            self.log_changed(changed)
+            watch.workers = None
+
+    def export_changes(self, context):
+        from .scenegen import SceneGen
+        from .collisiongen import CollisionGen
+        from .meshdedup import MeshDedup
+
+        game, groups, assets = affected_scenes(watch)
+        watch.reset()
+
+        changed = list()
+        if game or groups:
+            registry.reconcile()
+        if groups and self.expand_groups:
+            # expanded groups are written into the scenes instancing them
+            game = sorted(set(game) | instancing_scenes(groups))
+            groups = list()
+        if game or groups:
+            collisiongen = CollisionGen(self.filepath) if self.gen_collision else None
+            scenegen = SceneGen(self.filepath, self.compact_scenes, collisiongen,
+                    self.gen_index, not self.expand_groups)
+            if self.dedup_meshes:
+                if watch.dedup is None:
+                    watch.dedup = MeshDedup().build(bpy.data.scenes)
+                else:
+                    watch.dedup.build(bpy.data.scenes, watch.meshes)
+                watch.meshes = set()
+                scenegen.dedup = watch.dedup
+            if self.share_materials:
+                scenegen.deferred = list()
+            for name in game:
+                scenegen.export(bpy.data.scenes[name])
+            for name in groups:
+                scenegen.export(bpy.data.scenes[name], prefab = True)
+            if self.share_materials:
+                scenegen.flush(self.material_library(changed))
+            changed += scenegen.finish()
+            if collisiongen:
+                changed += collisiongen.changed
+
+        watch.assets |= set(assets)
+        self.log_changed(changed)
+        self.encode_assets()
+
+    # starts the worker on the waiting ASSETS scenes once it can read the
+    # edits: from the open file when saved, or from a throttled snapshot
+    def encode_assets(self):
+        from .worker import start_workers
+        if not watch.assets or watch.workers is not None:
+            return
+        blendfile = None
+        if bpy.data.filepath and not bpy.data.is_dirty:
+            blendfile = bpy.data.filepath
+        elif time.monotonic() - watch.last_snapshot < self.snapshot_interval:
+            return
+        else:
+            watch.last_snapshot = time.monotonic()
+        names = sorted(name for name in watch.assets if name in bpy.data.scenes)
+        watch.assets = set()
+        watch.workers = start_workers(self.filepath, names, 1, {
+                'assets': self.gen_assets, 'animations': True,
+                'dedup': self.dedup_meshes}, blendfile)
+
+    # the library of the .material files the last encodes left, adds the
+    # library file to changed when it was written
+    def material_library(self, changed):
+        from .matlib import MaterialLibrary, LIBRARY
+        matpath = os.path.join(self.filepath, "materials")
+        names = [scene.name for scene in bpy.data.scenes
+                if scene.gp3d_scenetype == 'ASSETS']
+        library = MaterialLibrary().build(matpath, names)
+        os.makedirs(matpath, exist_ok = True)
+        if library.write(matpath):
+            changed.append(os.path.join(matpath, LIBRARY + ".material"))
+        return library
+
+    def collect_workers(self):
+        from .worker import workers_done, wait_workers
+        if not workers_done(watch.workers):
+            return
+        changed = list()
+        for result in wait_workers(watch.workers):
+            changed += result.changed
+            if result.returncode != 0:
+                print(result.log)
+                self.report({'ERROR'}, "Exporting {0} failed, see the console"
+                        .format(", ".join(result.scenes)))
+        watch.workers = None
+        self.log_changed(changed)
+
+        # scenes point at library entries built from the encoded materials
+        if self.share_materials and any(path.endswith(".material") for path in changed):
+            types = ('GAME_SCENE',) if self.expand_groups else\
+                    ('GAME_SCENE', 'ASSET_GROUP')
+            watch.scenes |= set(scene.name for scene in bpy.data.scenes
+                    if scene.gp3d_scenetype in types)
+            watch.touch()
+
+    def log_changed(self, changed):
+        if len(changed) == 0:
+            return
+        from .output import write_changed_list
+        write_changed_list(self.filepath, changed)
+        for path in changed:
+            print("Watch: wrote {0}".format(os.path.relpath(path, self.filepath)))
+
+
+def menu_func_export(self, context):
+    text = "Stop Gameplay3D Watch" if watch.active else "Watch Gameplay3D"
+    self.layout.operator(WatchGameplay3D.bl_idname, text=text)
+
+def register():
+    bpy.app.handlers.scene_update_post.append(on_scene_update)
+    bpy.app.handlers.save_post.append(on_save)
+    bpy.app.handlers.load_post.append(on_load)
+    bpy.types.INFO_MT_file_export.append(menu_func_export)
+
+def unregister():
+    watch.active = False
+    bpy.app.handlers.scene_update_post.remove(on_scene_update)
+    bpy.app.handlers.save_post.remove(on_save)
+    bpy.app.handlers.load_post.remove(on_load)
+    bpy.types.INFO_MT_file_export.remove(menu_func_export)
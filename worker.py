@@ -0,0 +1,216 @@
+# This software can be used for commercial and personal work
+# as long as the following conditions are met:
+#
+# 1. This software must not be altered or modified and then redistributed or sold
+#    without my consent.
+# 2. The author cannot be held liable for any damages caused by using this software.
+# 3. This license clause must be left present in all files of this software.
+
+# Exports ASSETS scenes in background blender processes. The main process
+# saves a snapshot of the file once, starts the workers on it with a share
+# of the scenes each and collects their logs. Each worker runs the same
+# export_assets() as a normal export.
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+import bpy
+
+from .assetgen import AssetGen
+from .animgen import AnimGen
+from .meshdedup import MeshDedup
+from .assetprune import AssetPrune
+from .registry import registry
+from .stats import ExportStats
+from .textures import TextureStage
+
+class WorkerResult:
+    scenes = None
+    returncode = None
+    log = None
+    report = None # stats of the worker when a report was asked for
+    changed = None # files the worker changed
+    textures = None # saved TextureStage jobs when textures are collected
+
+    def __init__(self, scenes, returncode, log, report = None, changed = (),
+            textures = None):
+        self.scenes = scenes
+        self.returncode = returncode
+        self.log = log
+        self.report = report
+        self.changed = list(changed)
+        self.textures = textures
+
+def snapshot(filepath):
+    temp = os.path.join(filepath, 'temp')
+    os.makedirs(temp, exist_ok = True)
+    blendfile = os.path.join(temp, 'gp3d_snapshot.blend')
+    bpy.ops.wm.save_as_mainfile(filepath = blendfile, copy = True)
+    return blendfile
+
+def worker_command(blendfile, filepath, scenes, index, options):
+    expr = "import {0}.worker as w; w.main()".format(__package__)
+    cmd = [ bpy.app.binary_path, '-b', blendfile, '--python-expr', expr, '--',
+            '--output', filepath,
+            '--temp', os.path.join(filepath, 'temp', 'worker{0}'.format(index)) ]
+    for option in ('assets', 'animations', 'dedup', 'prune'):
+        if options.get(option, False):
+            cmd.append('--' + option)
+    if options.get('report', False):
+        cmd += [ '--report', report_path(filepath, index) ]
+    cmd += [ '--changed', changed_path(filepath, index) ]
+    if options.get('textures', False):
+        cmd += [ '--textures', textures_path(filepath, index) ]
+    cmd.append('--scenes')
+    cmd += scenes
+    return cmd
+
+# pool of plain python processes running the write functions of emit.py,
+# see PoolWriter. blender's own executable can't be used to spawn them.
+def start_pool(count):
+    import multiprocessing
+    context = multiprocessing.get_context('spawn')
+    python = getattr(bpy.app, 'binary_path_python', None)
+    if python:
+        context.set_executable(python)
+    return context.Pool(count)
+
+def report_path(filepath, index):
+    return os.path.join(filepath, 'temp', 'worker{0}.json'.format(index))
+
+def changed_path(filepath, index):
+    return os.path.join(filepath, 'temp', 'worker{0}.changed'.format(index))
+
+def textures_path(filepath, index):
+    return os.path.join(filepath, 'temp', 'worker{0}.textures'.format(index))
+
+# start exporting the named ASSETS scenes in count processes,
+# pass the result to wait_workers(). blendfile is a saved file matching
+# what is open to use instead of a snapshot, it is left in place.
+def start_workers(filepath, scenes, count, options, blendfile = None):
+    if len(scenes) == 0:
+        return None, []
+    owned = blendfile is None
+    if owned:
+        blendfile = snapshot(filepath)
+    count = max(1, min(count, len(scenes)))
+    shares = [scenes[i::count] for i in range(count)]
+
+    running = list()
+    for index, share in enumerate(shares):
+        logfile = os.path.join(filepath, 'temp', 'worker{0}.log'.format(index))
+        log = open(logfile, 'w+', encoding = 'utf-8')
+        cmd = worker_command(blendfile, filepath, share, index, options)
+        if os.path.exists(changed_path(filepath, index)):
+            os.remove(changed_path(filepath, index)) # left by a failed export
+        proc = subprocess.Popen(cmd, stdout = log, stderr = subprocess.STDOUT)
+        running.append((share, proc, log, logfile, report_path(filepath, index),
+                changed_path(filepath, index), textures_path(filepath, index)))
+    return blendfile if owned else None, running
+
+# contents of a json file a worker wrote, removing it
+def load_json(filepath):
+    if not os.path.exists(filepath):
+        return None
+    f = open(filepath, encoding = 'utf-8')
+    data = json.load(f)
+    f.close()
+    os.remove(filepath)
+    return data
+
+# True once every worker has exited, wait_workers() won't block then
+def workers_done(started):
+    blendfile, running = started
+    return all(proc.poll() is not None for share, proc, *rest in running)
+
+# returns [WorkerResult] once every worker has finished
+def wait_workers(started):
+    blendfile, running = started
+    results = list()
+    for share, proc, log, logfile, reportfile, changedfile, texturefile in running:
+        returncode = proc.wait()
+        log.seek(0)
+        report = load_json(reportfile)
+        textures = load_json(texturefile)
+        changed = list()
+        if os.path.exists(changedfile):
+            f = open(changedfile, encoding = 'utf-8')
+            changed = f.read().splitlines()
+            f.close()
+            os.remove(changedfile)
+        elif returncode == 0:
+            # blender exits with 0 when the script raised, the changed
+            # list is written last so a missing one means the worker failed
+            returncode = 1
+        results.append(WorkerResult(share, returncode, log.read(), report, changed,
+                textures))
+        log.close()
+        os.remove(logfile)
+    if blendfile:
+        os.remove(blendfile)
+    return results
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog = "gameplay3d export worker")
+    parser.add_argument('--output', required = True)
+    parser.add_argument('--temp', required = True)
+    parser.add_argument('--scenes', nargs = '+', required = True)
+    parser.add_argument('--report')
+    parser.add_argument('--changed')
+    parser.add_argument('--textures')
+    for option in ('assets', 'animations', 'dedup', 'prune'):
+        parser.add_argument('--' + option, action = 'store_true')
+    return parser.parse_args(argv)
+
+# entry point inside the worker blender process
+def main():
+    from .export import export_assets
+    from mathutils import Vector
+
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    args = parse_args(argv)
+    if not hasattr(bpy.types.Scene, "gp3d_scenetype"):
+        import addon_utils
+        addon_utils.enable(__package__, default_set = False)
+
+    stats = ExportStats(args.report is not None)
+    stats.start()
+    registry.rebuild()
+    assetgen = AssetGen(args.output, args.temp, stats) if args.assets else None
+    if assetgen and args.textures:
+        assetgen.textures = TextureStage(args.output, [bpy.path.abspath('//')])
+    animgen = AnimGen(args.output) if args.animations else None
+    dedup = MeshDedup().build(bpy.data.scenes) if args.dedup else None
+    prune = None
+    if args.prune:
+        prune = AssetPrune().build(bpy.data.scenes,
+                bpy.context.window_manager.gp3d_assets.asset_list, dedup)
+
+    for name in args.scenes:
+        scene = bpy.data.scenes[name]
+        scene.cursor_location = Vector((0, 0, 0))
+        print("Exporting assets of scene {0}".format(name))
+        overrides = {'scene': scene, 'blend_data': bpy.data}
+        with stats.stage("assets", name):
+            export_assets(overrides, scene, assetgen, animgen, dedup, prune, stats)
+        sys.stdout.flush()
+
+    changed = list()
+    if assetgen:
+        changed += assetgen.changed
+        assetgen.clean_up()
+        if assetgen.textures:
+            assetgen.textures.save_jobs(args.textures)
+    if animgen:
+        changed += animgen.finish()
+    stats.stop()
+    if args.report:
+        stats.write(os.path.dirname(args.report), os.path.basename(args.report))
+    # last, the main process takes a missing list as a failure
+    if args.changed:
+        f = open(args.changed, 'w', encoding = 'utf-8')
+        f.write("".join(path + "\n" for path in changed))
+        f.close()